@@ -0,0 +1,208 @@
+import asyncio
+import inspect
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, List, Optional
+
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", os.getenv("MAX_CONCURRENT_JOBS", "3")))
+# A browser is closed and replaced after serving this many jobs
+BROWSER_MAX_USES = int(os.getenv("BROWSER_MAX_USES", "20"))
+BROWSER_HEADLESS = os.getenv("BROWSER_HEADLESS", "true").lower() != "false"
+
+SessionFactory = Callable[[], Awaitable[Any]]
+
+
+async def create_browser_session():
+    """Start a browser-use session that survives between agent runs"""
+    from browser_use import BrowserProfile, BrowserSession
+
+    session = BrowserSession(browser_profile=BrowserProfile(headless=BROWSER_HEADLESS, keep_alive=True))
+    await session.start()
+    return session
+
+
+async def _maybe_await(value):
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+
+class PooledBrowser:
+    def __init__(self, session: Any):
+        self.session = session
+        self.uses = 0
+        self.created_at = time.monotonic()
+
+
+class BrowserPool:
+    """A fixed-size pool of warm browser sessions shared by scraping jobs.
+
+    A session is reset between jobs (cookies cleared, extra tabs closed) so jobs
+    never see each other's state. It is closed and replaced instead of reused
+    when it crashed during a job, fails its health check or reset, or has served
+    ``max_uses`` jobs.
+    """
+
+    def __init__(self, size: int = BROWSER_POOL_SIZE, max_uses: int = BROWSER_MAX_USES,
+                 factory: SessionFactory = create_browser_session):
+        self.size = size
+        self.max_uses = max_uses
+        self.factory = factory
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(size)
+        self._in_use = 0
+        self._open = 0
+        self._closed = False
+        self._warmup: Optional[asyncio.Task] = None
+        self.created_total = 0
+        self.recycled_total = 0
+        self.acquired_total = 0
+        self.wait_seconds_total = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def start(self):
+        """Warm the pool in the background so startup is not blocked on browser launches"""
+        if self.enabled and self._warmup is None:
+            self._warmup = asyncio.create_task(self._warm())
+
+    async def _warm(self):
+        async def warm_one():
+            try:
+                await self._idle.put(await self._create())
+            except Exception as e:
+                print(f"Browser pool warm-up failed: {e}")
+
+        await asyncio.gather(*(warm_one() for _ in range(self.size)))
+
+    async def _create(self) -> PooledBrowser:
+        self._open += 1
+        try:
+            session = await self.factory()
+        except Exception:
+            self._open -= 1
+            raise
+        self.created_total += 1
+        return PooledBrowser(session)
+
+    async def _destroy(self, browser: PooledBrowser):
+        self._open -= 1
+        self.recycled_total += 1
+        for method in ("kill", "close", "stop"):
+            closer = getattr(browser.session, method, None)
+            if callable(closer):
+                try:
+                    await _maybe_await(closer())
+                except Exception as e:
+                    print(f"Error closing pooled browser: {e}")
+                return
+
+    async def _is_healthy(self, browser: PooledBrowser) -> bool:
+        check = getattr(browser.session, "is_connected", None)
+        if not callable(check):
+            return True
+        try:
+            return bool(await _maybe_await(check()))
+        except Exception:
+            return False
+
+    async def _reset(self, browser: PooledBrowser):
+        """Clear per-job state: cookies, and every tab except a blank one"""
+        context = getattr(browser.session, "browser_context", None)
+        if context is None:
+            reset = getattr(browser.session, "reset", None)
+            if callable(reset):
+                await _maybe_await(reset())
+            return
+
+        await context.clear_cookies()
+        pages = list(context.pages)
+        for page in pages[1:]:
+            await page.close()
+        if pages:
+            await pages[0].evaluate("() => { try { localStorage.clear(); sessionStorage.clear(); } catch (e) {} }")
+            await pages[0].goto("about:blank")
+
+    async def acquire(self) -> PooledBrowser:
+        started = time.monotonic()
+        await self._slots.acquire()
+        try:
+            browser = None
+            while browser is None:
+                if self._idle.empty() and self._open < self.size:
+                    browser = await self._create()
+                    break
+                try:
+                    # Re-check periodically in case a warming or recycled browser failed to start
+                    candidate = await asyncio.wait_for(self._idle.get(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    continue
+                if await self._is_healthy(candidate):
+                    browser = candidate
+                else:
+                    await self._destroy(candidate)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        self._in_use += 1
+        self.acquired_total += 1
+        self.wait_seconds_total += time.monotonic() - started
+        return browser
+
+    async def release(self, browser: PooledBrowser, crashed: bool = False):
+        self._in_use -= 1
+        browser.uses += 1
+        try:
+            recycle = crashed or self._closed or browser.uses >= self.max_uses
+            if not recycle:
+                try:
+                    await self._reset(browser)
+                except Exception:
+                    recycle = True
+            if recycle or not await self._is_healthy(browser):
+                await self._destroy(browser)
+            else:
+                self._idle.put_nowait(browser)
+        finally:
+            self._slots.release()
+
+    @asynccontextmanager
+    async def session(self):
+        """Borrow a browser session for one job"""
+        browser = await self.acquire()
+        crashed = False
+        try:
+            yield browser.session
+        except BaseException:
+            # An agent that failed may have left the browser in any state
+            crashed = True
+            raise
+        finally:
+            await self.release(browser, crashed=crashed)
+
+    async def close(self):
+        self._closed = True
+        if self._warmup is not None:
+            self._warmup.cancel()
+            await asyncio.gather(self._warmup, return_exceptions=True)
+        idle: List[PooledBrowser] = []
+        while not self._idle.empty():
+            idle.append(self._idle.get_nowait())
+        await asyncio.gather(*(self._destroy(browser) for browser in idle))
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "open": self._open,
+            "idle": self._idle.qsize(),
+            "in_use": self._in_use,
+            "utilisation": self._in_use / self.size if self.size else 0.0,
+            "created_total": self.created_total,
+            "recycled_total": self.recycled_total,
+            "acquired_total": self.acquired_total,
+            "avg_wait_seconds": self.wait_seconds_total / self.acquired_total if self.acquired_total else 0.0,
+        }
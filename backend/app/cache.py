@@ -0,0 +1,79 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "900"))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "256"))
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def cache_key(query: str, max_results: int) -> Tuple[str, int]:
+    return normalize_query(query), max_results
+
+
+class ResultCache:
+    """TTL + LRU cache mapping a normalised query to the completed job holding its results.
+
+    Only job ids are kept in memory; the items themselves stay in the database and
+    are copied into the new job on a hit.
+    """
+
+    def __init__(self, ttl: float = RESULT_CACHE_TTL_SECONDS, max_entries: int = RESULT_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[int, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, query: str, max_results: int) -> Optional[int]:
+        """Return the id of a fresh completed job for this query, or None"""
+        key = cache_key(query, max_results)
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, query: str, max_results: int, job_id: int):
+        if not self.enabled:
+            return
+        key = cache_key(query, max_results)
+        self._entries[key] = (job_id, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, query: str, max_results: int):
+        self._entries.pop(cache_key(query, max_results), None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,54 @@
+from typing import Dict, List, Optional, Tuple
+
+from cache import cache_key
+
+
+class InFlightRegistry:
+    """Single-flight registry of queries that are queued or being scraped.
+
+    The first job for a normalised query becomes its leader. Identical jobs
+    submitted while the leader is in flight attach to it as followers: they get
+    no agent of their own, receive the leader's progress under their own job id,
+    and get a copy of the leader's items when it finishes.
+    """
+
+    def __init__(self):
+        self._leaders: Dict[Tuple[str, int], int] = {}
+        self._keys: Dict[int, Tuple[str, int]] = {}
+        self._followers: Dict[int, List[int]] = {}
+
+    def leader_for(self, query: str, max_results: int) -> Optional[int]:
+        return self._leaders.get(cache_key(query, max_results))
+
+    def register(self, query: str, max_results: int, job_id: int) -> bool:
+        """Make ``job_id`` the leader for its query unless another job already is"""
+        key = cache_key(query, max_results)
+        leader = self._leaders.setdefault(key, job_id)
+        if leader != job_id:
+            return False
+        self._keys[job_id] = key
+        self._followers.setdefault(job_id, [])
+        return True
+
+    def attach(self, leader_id: int, job_id: int) -> bool:
+        """Add ``job_id`` as a follower; False if the leader is no longer in flight"""
+        if leader_id not in self._keys:
+            return False
+        self._followers[leader_id].append(job_id)
+        return True
+
+    def followers(self, leader_id: int) -> List[int]:
+        return list(self._followers.get(leader_id, ()))
+
+    def release(self, leader_id: int) -> List[int]:
+        """Forget ``leader_id`` and return the followers that were waiting on it"""
+        key = self._keys.pop(leader_id, None)
+        if key is not None and self._leaders.get(key) == leader_id:
+            del self._leaders[key]
+        return self._followers.pop(leader_id, [])
+
+    def stats(self) -> dict:
+        return {
+            "leaders": len(self._leaders),
+            "followers": sum(len(followers) for followers in self._followers.values()),
+        }
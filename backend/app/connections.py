@@ -0,0 +1,257 @@
+import asyncio
+import json
+import os
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Set
+
+from fastapi import WebSocket
+
+from progress_broker import InMemoryBroker, ProgressBroker, items_payload
+
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "100"))
+# Latest progress message kept per job so late subscribers get the current state
+PROGRESS_SNAPSHOT_LIMIT = int(os.getenv("PROGRESS_SNAPSHOT_LIMIT", "1000"))
+
+ALL_JOBS = "*"
+
+# Loads (job_id, after_item_id) -> item deltas stored after that id, oldest first
+ItemLoader = Callable[[int, int], Awaitable[List[dict]]]
+
+
+class ClientConnection:
+    """A WebSocket with its own bounded send queue and sender task.
+
+    Messages enqueued with the same ``coalesce_key`` replace each other while
+    they wait, so a slow client only ever receives the newest progress for a
+    job. When the queue is full the oldest message is dropped. A client that
+    stalls therefore never blocks the broadcaster or other clients.
+    """
+
+    def __init__(self, websocket: WebSocket, manager: "ConnectionManager",
+                 max_queue: int = WS_SEND_QUEUE_SIZE):
+        self.websocket = websocket
+        self.manager = manager
+        self.max_queue = max_queue
+        self.job_ids: Set[int] = set()
+        self.all_jobs = False
+        self.dropped = 0
+        self._pending: "OrderedDict[Hashable, str]" = OrderedDict()
+        self._sequence = 0
+        self._ready = asyncio.Event()
+        self._sender: Optional[asyncio.Task] = None
+        # Item replays still loading for this client, kept so they are not garbage-collected
+        self._replays: Set[asyncio.Task] = set()
+
+    def start(self):
+        self._sender = asyncio.create_task(self._send_loop())
+
+    def stop(self):
+        if self._sender and self._sender is not asyncio.current_task():
+            self._sender.cancel()
+        for task in list(self._replays):
+            task.cancel()
+
+    def start_replay(self, replay: Awaitable[None], job_id: int):
+        task = asyncio.create_task(replay, name=f"replay-job-{job_id}")
+        self._replays.add(task)
+        task.add_done_callback(self._replay_done)
+
+    def _replay_done(self, task: asyncio.Task):
+        self._replays.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Item replay {task.get_name()} failed: {task.exception()}")
+
+    def enqueue(self, message: str, coalesce_key: Hashable = None):
+        if coalesce_key is None:
+            self._sequence += 1
+            coalesce_key = ("seq", self._sequence)
+
+        if coalesce_key in self._pending:
+            # Keep the queue position, replace the stale payload
+            self._pending[coalesce_key] = message
+        else:
+            if len(self._pending) >= self.max_queue:
+                self._pending.popitem(last=False)
+                self.dropped += 1
+            self._pending[coalesce_key] = message
+        self._ready.set()
+
+    async def _send_loop(self):
+        try:
+            while True:
+                await self._ready.wait()
+                self._ready.clear()
+                while self._pending:
+                    _, message = self._pending.popitem(last=False)
+                    await self.websocket.send_text(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.manager.disconnect(self.websocket)
+
+
+class ConnectionManager:
+    """Tracks WebSocket clients and the jobs each one is subscribed to.
+
+    Clients subscribe over ``/ws`` with ``{"action": "subscribe", "job_id": 5}``
+    (or ``"job_ids": [...]``; ``"*"`` subscribes to every job) and unsubscribe
+    with ``"action": "unsubscribe"``. Subscribers receive progress and
+    ``items`` deltas; adding ``"after_item_id": N`` to a subscribe message
+    first replays the items stored after N, so a reconnecting client resumes
+    where it left off.
+
+    Progress goes through ``broker`` rather than straight to the sockets, so
+    events published by scraping workers in other processes reach the clients
+    connected to this one.
+    """
+
+    def __init__(self, broker: Optional[ProgressBroker] = None, item_loader: Optional[ItemLoader] = None):
+        self.broker = broker or InMemoryBroker()
+        self.broker.add_handler(self.deliver)
+        self.item_loader = item_loader
+        self.connections: Dict[WebSocket, ClientConnection] = {}
+        self.job_subscribers: Dict[int, Set[ClientConnection]] = {}
+        self.all_jobs_subscribers: Set[ClientConnection] = set()
+        self._last_progress: "OrderedDict[int, str]" = OrderedDict()
+        # Events set whenever something is published for a job (used by the SSE stream)
+        self._listeners: Dict[int, Set[asyncio.Event]] = {}
+
+    @property
+    def active_connections(self):
+        return list(self.connections)
+
+    async def connect(self, websocket: WebSocket):
+        await websocket.accept()
+        connection = ClientConnection(websocket, self)
+        self.connections[websocket] = connection
+        connection.start()
+
+    def disconnect(self, websocket: WebSocket):
+        connection = self.connections.pop(websocket, None)
+        if connection is None:
+            return
+        self._unsubscribe(connection, list(connection.job_ids) + [ALL_JOBS])
+        connection.stop()
+
+    def subscribe(self, websocket: WebSocket, job_ids: Iterable, after_item_id: Optional[int] = None):
+        connection = self.connections.get(websocket)
+        if connection is None:
+            return
+        self._subscribe(connection, job_ids)
+        if after_item_id is not None and self.item_loader is not None:
+            for job_id in job_ids:
+                if job_id != ALL_JOBS:
+                    connection.start_replay(self._replay_items(connection, int(job_id), after_item_id), int(job_id))
+
+    async def _replay_items(self, connection: ClientConnection, job_id: int, after_item_id: int):
+        """Send a resuming client the items it missed; live deltas may interleave, so clients skip ids they have"""
+        try:
+            items = await self.item_loader(job_id, after_item_id)
+        except Exception as e:
+            print(f"Could not replay items of job {job_id}: {e}")
+            return
+        if items:
+            connection.enqueue(json.dumps(items_payload(job_id, items, after_item_id)))
+
+    def unsubscribe(self, websocket: WebSocket, job_ids: Iterable):
+        connection = self.connections.get(websocket)
+        if connection is not None:
+            self._unsubscribe(connection, job_ids)
+
+    def _subscribe(self, connection: ClientConnection, job_ids: Iterable):
+        for job_id in job_ids:
+            if job_id == ALL_JOBS:
+                connection.all_jobs = True
+                self.all_jobs_subscribers.add(connection)
+                continue
+            job_id = int(job_id)
+            connection.job_ids.add(job_id)
+            self.job_subscribers.setdefault(job_id, set()).add(connection)
+            if job_id in self._last_progress:
+                connection.enqueue(self._last_progress[job_id], ("progress", job_id))
+
+    def _unsubscribe(self, connection: ClientConnection, job_ids: Iterable):
+        for job_id in job_ids:
+            if job_id == ALL_JOBS:
+                connection.all_jobs = False
+                self.all_jobs_subscribers.discard(connection)
+                continue
+            job_id = int(job_id)
+            connection.job_ids.discard(job_id)
+            subscribers = self.job_subscribers.get(job_id)
+            if subscribers is not None:
+                subscribers.discard(connection)
+                if not subscribers:
+                    del self.job_subscribers[job_id]
+
+    async def handle_message(self, websocket: WebSocket, text: str):
+        """Apply a subscribe/unsubscribe message sent by a client"""
+        try:
+            message = json.loads(text)
+        except ValueError:
+            return
+        if not isinstance(message, dict):
+            return
+
+        job_ids = message.get("job_ids")
+        if job_ids is None and "job_id" in message:
+            job_ids = [message["job_id"]]
+        if not isinstance(job_ids, list):
+            return
+
+        try:
+            if message.get("action") == "subscribe":
+                after_item_id = message.get("after_item_id")
+                self.subscribe(websocket, job_ids, int(after_item_id) if after_item_id is not None else None)
+            elif message.get("action") == "unsubscribe":
+                self.unsubscribe(websocket, job_ids)
+        except (TypeError, ValueError):
+            return
+
+    def subscribers_for(self, job_id: int) -> Set[ClientConnection]:
+        return self.job_subscribers.get(job_id, set()) | self.all_jobs_subscribers
+
+    def broadcast(self, job_id: int, payload: dict, coalesce_key: Hashable = None):
+        """Serialise ``payload`` once and queue it for every subscriber of ``job_id``"""
+        message = json.dumps(payload)
+        for connection in self.subscribers_for(job_id):
+            connection.enqueue(message, coalesce_key)
+        return message
+
+    async def send_progress(self, job_id: int, status: str, progress: int, message: str):
+        await self.broker.send_progress(job_id, status, progress, message)
+
+    async def send_items(self, job_id: int, items: List[dict], previous_item_id: Optional[int] = None):
+        await self.broker.send_items(job_id, items, previous_item_id)
+
+    def last_progress(self, job_id: int) -> Optional[str]:
+        """The newest progress message seen for a job, JSON encoded"""
+        return self._last_progress.get(job_id)
+
+    def listen(self, job_id: int) -> asyncio.Event:
+        """An event that is set whenever progress or items are published for ``job_id``"""
+        event = asyncio.Event()
+        self._listeners.setdefault(job_id, set()).add(event)
+        return event
+
+    def stop_listening(self, job_id: int, event: asyncio.Event):
+        listeners = self._listeners.get(job_id)
+        if listeners is not None:
+            listeners.discard(event)
+            if not listeners:
+                del self._listeners[job_id]
+
+    def deliver(self, job_id: int, payload: dict):
+        """Broker handler: relay an event to this process's subscribers"""
+        for event in self._listeners.get(job_id, ()):
+            event.set()
+        if payload.get("type") != "progress":
+            self.broadcast(job_id, payload)
+            return
+
+        encoded = self.broadcast(job_id, payload, ("progress", job_id))
+
+        self._last_progress[job_id] = encoded
+        self._last_progress.move_to_end(job_id)
+        while len(self._last_progress) > PROGRESS_SNAPSHOT_LIMIT:
+            self._last_progress.popitem(last=False)
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import CONTENT_FIELDS, ContentItem, async_engine
+from normalization import canonical_url
+
+# Items of one job whose SimHashes differ in at most this many bits (and that share
+# site and price) are treated as the same item; 0 turns near-duplicate detection off
+SIMHASH_MAX_DISTANCE = int(os.getenv("SIMHASH_MAX_DISTANCE", "3"))
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_SPACE_RE = re.compile(r"\s+")
+# Hashes looked up per IN (...) query
+_LOOKUP_CHUNK = 500
+
+
+def _normalize_text(value) -> str:
+    return _SPACE_RE.sub(" ", str(value)).strip().lower() if value is not None else ""
+
+
+def content_hash(row: dict) -> str:
+    """SHA-256 over the canonical URL and every stored field, ignoring case and whitespace in text"""
+    payload = {
+        "url": canonical_url(row.get('url')) or "",
+        **{name: _normalize_text(row.get(name)) for name in ('title', 'description', 'price', 'rating', 'date')},
+        "additional_data": row.get('additional_data') or {},
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def simhash(text: str) -> Optional[int]:
+    """64-bit SimHash of the words and word pairs in ``text``, as a signed integer (fits BIGINT)"""
+    words = _WORD_RE.findall(text.lower())
+    if not words:
+        return None
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    bits = [
+        format(int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big"), "064b")
+        for feature in features
+    ]
+    # A fingerprint bit is set when most features have it set (counted column by column)
+    half = len(bits) / 2
+    fingerprint = int("".join("1" if column.count("1") > half else "0" for column in map("".join, zip(*bits))), 2)
+    return fingerprint - (1 << 64) if fingerprint >= 1 << 63 else fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin((a ^ b) & 0xFFFFFFFFFFFFFFFF).count("1")
+
+
+def content_row(row: dict) -> dict:
+    """ContentItem column values for an item row (see pipeline.item_row)"""
+    content = {name: row.get(name) for name in CONTENT_FIELDS}
+    content['canonical_url'] = canonical_url(row.get('url'))
+    content['content_hash'] = content_hash(row)
+    content['simhash'] = simhash(f"{row.get('title') or ''} {row.get('description') or ''}")
+    return content
+
+
+class IngestDeduplicator:
+    """Collapses duplicates within one job as its items are ingested.
+
+    An item is a duplicate of one already kept when it has the same canonical
+    URL, the same content hash, or (with SIMHASH_MAX_DISTANCE > 0) a SimHash
+    within that many bits on the same site at the same price.
+    """
+
+    def __init__(self, max_distance: int = SIMHASH_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.duplicates = 0
+        self._urls = set()
+        self._hashes = set()
+        # (source_domain, price_amount) -> SimHashes kept for that group
+        self._fingerprints: Dict[tuple, List[int]] = {}
+
+    def is_duplicate(self, content: dict) -> bool:
+        url, digest, fingerprint = content['canonical_url'], content['content_hash'], content['simhash']
+        group = (content.get('source_domain'), content.get('price_amount'))
+        duplicate = (
+            (url is not None and url in self._urls)
+            or digest in self._hashes
+            or (self.max_distance > 0 and fingerprint is not None and any(
+                hamming_distance(fingerprint, other) <= self.max_distance
+                for other in self._fingerprints.get(group, ())
+            ))
+        )
+        if duplicate:
+            self.duplicates += 1
+            return True
+        if url is not None:
+            self._urls.add(url)
+        self._hashes.add(digest)
+        if fingerprint is not None:
+            self._fingerprints.setdefault(group, []).append(fingerprint)
+        return False
+
+
+def _insert_ignoring_duplicates(dialect: str):
+    """INSERT that skips rows whose content_hash is already stored (another job may insert it first)"""
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        return sqlite_insert(ContentItem).on_conflict_do_nothing(index_elements=["content_hash"])
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+        return postgresql_insert(ContentItem).on_conflict_do_nothing(index_elements=["content_hash"])
+    if dialect == "mysql":
+        return insert(ContentItem).prefix_with("IGNORE")
+    return insert(ContentItem)
+
+
+async def _existing_ids(db: AsyncSession, hashes: Iterable[str]) -> Dict[str, int]:
+    hashes = list(hashes)
+    found: Dict[str, int] = {}
+    for start in range(0, len(hashes), _LOOKUP_CHUNK):
+        chunk = hashes[start:start + _LOOKUP_CHUNK]
+        result = await db.execute(
+            select(ContentItem.content_hash, ContentItem.id).where(ContentItem.content_hash.in_(chunk))
+        )
+        found.update(result.all())
+    return found
+
+
+async def store_contents(db: AsyncSession, contents: List[dict]) -> List[int]:
+    """Return the ContentItem id of each content row, inserting only the ones not stored yet"""
+    ids = await _existing_ids(db, {content['content_hash'] for content in contents})
+    missing = {}
+    for content in contents:
+        if content['content_hash'] not in ids:
+            missing.setdefault(content['content_hash'], content)
+    if missing:
+        now = datetime.utcnow()
+        await db.execute(_insert_ignoring_duplicates(async_engine.dialect.name),
+                         [{**content, 'first_seen_at': now} for content in missing.values()])
+        ids.update(await _existing_ids(db, missing))
+    return [ids[content['content_hash']] for content in contents]
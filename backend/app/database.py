@@ -1,4 +1,7 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, ForeignKey
+from sqlalchemy import create_engine, text, BigInteger, Column, Integer, String, DateTime, Text, Float, ForeignKey, Index, JSON
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session, relationship
 from datetime import datetime
@@ -6,8 +9,26 @@ import os
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./scraper.db")
 
+# Async drivers used for each sync URL scheme when ASYNC_DATABASE_URL is not set
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+def to_async_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", to_async_url(DATABASE_URL))
+
+# The sync engine is only used from worker threads (e.g. Excel exports) and by alembic
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Routes and the scraper run on the event loop and must use the async engine
+async_engine = create_async_engine(ASYNC_DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 class ScrapingJob(Base):
@@ -15,30 +36,114 @@ class ScrapingJob(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     query = Column(String(500), index=True)
-    status = Column(String(20), default="pending")  # pending, running, completed, failed
+    status = Column(String(20), default="pending", index=True)  # pending, attached, running, completed, failed
     max_results = Column(Integer, default=15)
+    priority = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
     completed_at = Column(DateTime, nullable=True)
     results_count = Column(Integer, default=0)
     results_file = Column(String(200), nullable=True)
     error_message = Column(Text, nullable=True)
+    # Set when the results were copied from another job (e.g. a result cache hit)
+    source_job_id = Column(Integer, ForeignKey("scraping_jobs.id"), nullable=True)
+    # Claim order for scraping workers (earlier runs first; priority moves a job ahead)
+    queue_key = Column(Float, nullable=True)
+    # Worker that claimed the job, and until when its claim holds without being renewed
+    worker_id = Column(String(100), nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    # Runs started so far, and when a job waiting to be retried becomes claimable again
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, nullable=True)
+    # LLM calls made for the job over all of its attempts, and the tokens they used
+    llm_calls = Column(Integer, default=0)
+    llm_cached_calls = Column(Integer, default=0)
+    llm_prompt_tokens = Column(Integer, default=0)
+    llm_completion_tokens = Column(Integer, default=0)
+    # Stage timeline of the latest attempt, recorded when JOB_PROFILING is on (see metrics.JobProfile)
+    profile = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)
     
     scraped_items = relationship("ScrapedItem", back_populates="job")
+    attempt_history = relationship("JobAttempt", back_populates="job", order_by="JobAttempt.attempt")
+    
+    __table_args__ = (
+        Index("ix_scraping_jobs_status_queue_key", "status", "queue_key"),
+    )
 
-class ScrapedItem(Base):
-    __tablename__ = "scraped_items"
+class JobAttempt(Base):
+    """One run of a scraping job by a worker, and how it ended"""
+    __tablename__ = "job_attempts"
+    
+    id = Column(Integer, primary_key=True)
+    job_id = Column(Integer, ForeignKey("scraping_jobs.id"), index=True)
+    attempt = Column(Integer)
+    worker_id = Column(String(100), nullable=True)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+    outcome = Column(String(20), nullable=True)  # completed, failed, retry, lease_expired, released
+    error_message = Column(Text, nullable=True)
+    
+    job = relationship("ScrapingJob", back_populates="attempt_history")
+
+class ContentItem(Base):
+    """One distinct scraped item, shared by every job that found it.
+
+    ``content_hash`` covers the canonical URL and every stored field, so the
+    same listing scraped by many jobs is stored once. ``simhash`` is a 64-bit
+    fingerprint of the title and description for spotting near-duplicates.
+    """
+    __tablename__ = "content_items"
+    
+    id = Column(Integer, primary_key=True)
+    content_hash = Column(String(64), unique=True, nullable=False)
+    canonical_url = Column(String(1000), nullable=True, index=True)
+    simhash = Column(BigInteger, nullable=True)
+    first_seen_at = Column(DateTime, default=datetime.utcnow)
     
-    id = Column(Integer, primary_key=True, index=True)
     title = Column(String(500))
     description = Column(Text)
     url = Column(String(1000))
     price = Column(String(100))
     rating = Column(String(50))
     date = Column(String(100))
-    additional_data = Column(Text)  # JSON string
+    additional_data = Column(JSON().with_variant(JSONB(), "postgresql"))
+    
+    # Typed values parsed from price/rating/url at ingest so they can be filtered and sorted in SQL
+    price_amount = Column(Float, nullable=True, index=True)
+    price_currency = Column(String(8), nullable=True)
+    rating_value = Column(Float, nullable=True, index=True)
+    rating_scale = Column(Float, nullable=True)
+    source_domain = Column(String(255), nullable=True, index=True)
+
+# Item fields stored on ContentItem and readable straight from a job's ScrapedItem
+CONTENT_FIELDS = ['title', 'description', 'url', 'price', 'rating', 'date', 'additional_data',
+                  'price_amount', 'price_currency', 'rating_value', 'rating_scale', 'source_domain']
+
+class ScrapedItem(Base):
+    """An item found by a job: a link to its ContentItem, in the order the job found it"""
+    __tablename__ = "scraped_items"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("scraping_jobs.id"), index=True)
+    content_id = Column(Integer, ForeignKey("content_items.id"), nullable=False, index=True)
     
-    job_id = Column(Integer, ForeignKey("scraping_jobs.id"))
     job = relationship("ScrapingJob", back_populates="scraped_items")
+    # Loaded with the item (one join) unless a query loads it itself
+    content = relationship(ContentItem, lazy="joined", innerjoin=True)
+    
+    title = association_proxy("content", "title")
+    description = association_proxy("content", "description")
+    url = association_proxy("content", "url")
+    price = association_proxy("content", "price")
+    rating = association_proxy("content", "rating")
+    date = association_proxy("content", "date")
+    additional_data = association_proxy("content", "additional_data")
+    price_amount = association_proxy("content", "price_amount")
+    price_currency = association_proxy("content", "price_currency")
+    rating_value = association_proxy("content", "rating_value")
+    rating_scale = association_proxy("content", "rating_scale")
+    source_domain = association_proxy("content", "source_domain")
 
 def get_db():
     db = SessionLocal()
@@ -47,5 +152,69 @@ def get_db():
     finally:
         db.close()
 
-# Create tables
-Base.metadata.create_all(bind=engine)
\ No newline at end of file
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Full-text search over item titles and descriptions. SQLite uses an FTS5 table kept
+# in sync by triggers; PostgreSQL uses a GIN index on the same tsvector expression
+# that item_search queries, so both are maintained as items are inserted.
+SEARCH_TABLE = "content_items"
+POSTGRES_TSVECTOR = "to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(description, ''))"
+
+def sqlite_fts_ddl(table: str = SEARCH_TABLE) -> list:
+    return [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5(
+            title, description, content='{table}', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+        )""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {table}_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO {table}_fts({table}_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF title, description ON {table} BEGIN
+            INSERT INTO {table}_fts({table}_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO {table}_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+        END""",
+    ]
+
+def postgres_fts_ddl(table: str = SEARCH_TABLE) -> list:
+    return [f"CREATE INDEX IF NOT EXISTS ix_{table}_search ON {table} USING GIN ({POSTGRES_TSVECTOR})"]
+
+def create_search_index(connection, table: str = SEARCH_TABLE):
+    """Create the full-text index over ``table`` for the connected backend, backfilling it if it is new"""
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": f"{table}_fts"}
+        ).first()
+        for statement in sqlite_fts_ddl(table):
+            connection.execute(text(statement))
+        if not exists:
+            connection.execute(text(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')"))
+    elif dialect == "postgresql":
+        for statement in postgres_fts_ddl(table):
+            connection.execute(text(statement))
+
+def drop_search_index(connection, table: str = SEARCH_TABLE):
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        for trigger in ("insert", "delete", "update"):
+            connection.execute(text(f"DROP TRIGGER IF EXISTS {table}_fts_{trigger}"))
+        connection.execute(text(f"DROP TABLE IF EXISTS {table}_fts"))
+    elif dialect == "postgresql":
+        connection.execute(text(f"DROP INDEX IF EXISTS ix_{table}_search"))
+
+# The schema is managed by alembic (backend/migrations). Local setups can let the app
+# create missing tables at startup instead; set DB_AUTO_CREATE=false once migrations
+# are run as a separate deploy step.
+DB_AUTO_CREATE = os.getenv("DB_AUTO_CREATE", "true").lower() != "false"
+
+async def init_db():
+    """Create missing tables and the search index; safe to run on every startup"""
+    async with async_engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.run_sync(create_search_index)
\ No newline at end of file
@@ -0,0 +1,490 @@
+import asyncio
+import csv
+import gzip
+import importlib.util
+import io
+import json
+import os
+import time
+import uuid
+import zipfile
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal, ContentItem, SessionLocal, ScrapingJob, ScrapedItem
+from metrics import observe_stage, timed
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+EXPORT_DIR = os.getenv("EXPORT_DIR", "./exports")
+# Rows per Parquet row group / Arrow record batch (also how much of a job is held in memory at once)
+EXPORT_ROW_GROUP_SIZE = int(os.getenv("EXPORT_ROW_GROUP_SIZE", "10000"))
+PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "zstd")
+# Most jobs one bulk export request may include
+EXPORT_ARCHIVE_MAX_JOBS = int(os.getenv("EXPORT_ARCHIVE_MAX_JOBS", "100"))
+
+BASE_COLUMNS = ["Title", "Description", "URL", "Price", "Rating", "Date"]
+
+
+def export_filename(job: ScrapingJob, extension: str) -> str:
+    return f"scraping_job_{job.id}_{job.query.replace(' ', '_')}.{extension}"
+
+
+def _columns_stmt(job_id: int):
+    return (
+        select(ContentItem.additional_data)
+        .join(ScrapedItem, ScrapedItem.content_id == ContentItem.id)
+        .where(ScrapedItem.job_id == job_id)
+        .order_by(ScrapedItem.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+
+
+def _rows_stmt(job_id: int):
+    return (
+        select(
+            ContentItem.title,
+            ContentItem.description,
+            ContentItem.url,
+            ContentItem.price,
+            ContentItem.rating,
+            ContentItem.date,
+            ContentItem.additional_data,
+        )
+        .join(ScrapedItem, ScrapedItem.content_id == ContentItem.id)
+        .where(ScrapedItem.job_id == job_id)
+        .order_by(ScrapedItem.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+
+
+def _export_row(record) -> dict:
+    title, description, url, price, rating, date, additional_data = record
+    return {
+        'Title': title or '',
+        'Description': description or '',
+        'URL': url or '',
+        'Price': price or '',
+        'Rating': rating or '',
+        'Date': date or '',
+        **(additional_data or {})
+    }
+
+
+async def job_has_items(db: AsyncSession, job_id: int) -> bool:
+    item_id = await db.scalar(select(ScrapedItem.id).where(ScrapedItem.job_id == job_id).limit(1))
+    return item_id is not None
+
+
+def discover_columns(db, job_id: int) -> List[str]:
+    """Collect the export header: base columns followed by additional_data keys in first-seen order"""
+    columns = dict.fromkeys(BASE_COLUMNS)
+    for (additional_data,) in db.execute(_columns_stmt(job_id)):
+        if additional_data:
+            columns.update(dict.fromkeys(additional_data))
+    return list(columns)
+
+
+def iter_item_rows(db, job_id: int) -> Iterator[dict]:
+    """Yield one export row per scraped item, reading the job in batches of EXPORT_BATCH_SIZE"""
+    for record in db.execute(_rows_stmt(job_id)):
+        yield _export_row(record)
+
+
+async def _timed_chunks(stage: str, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Pass ``chunks`` through, recording the time spent producing them (not waiting for the client)"""
+    generating = 0.0
+    resumed = time.perf_counter()
+    try:
+        async for chunk in chunks:
+            generating += time.perf_counter() - resumed
+            yield chunk
+            resumed = time.perf_counter()
+        generating += time.perf_counter() - resumed
+    finally:
+        observe_stage(stage, generating)
+
+
+def stream_csv(job_id: int) -> AsyncIterator[bytes]:
+    """Yield a job's items as UTF-8 CSV chunks without holding the whole export in memory"""
+    return _timed_chunks("export_csv", _csv_chunks(job_id))
+
+
+async def _csv_chunks(job_id: int) -> AsyncIterator[bytes]:
+    async with AsyncSessionLocal() as db:
+        columns = dict.fromkeys(BASE_COLUMNS)
+        async for (additional_data,) in await db.stream(_columns_stmt(job_id)):
+            if additional_data:
+                columns.update(dict.fromkeys(additional_data))
+
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=list(columns), restval='', extrasaction='ignore')
+        writer.writeheader()
+
+        rows_in_buffer = 0
+        async for record in await db.stream(_rows_stmt(job_id)):
+            writer.writerow(_export_row(record))
+            rows_in_buffer += 1
+            if rows_in_buffer >= EXPORT_BATCH_SIZE:
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate()
+                rows_in_buffer = 0
+
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _excel_value(value):
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, ensure_ascii=False)
+    if isinstance(value, str):
+        value = ILLEGAL_CHARACTERS_RE.sub('', value)
+    return value
+
+
+def write_excel(job_id: int, path: str):
+    """Write a job's items to an .xlsx file using an openpyxl write-only workbook.
+
+    Rows are streamed to disk as they are read, so memory use does not grow with
+    the size of the job. Blocking; run it in a worker thread.
+    """
+    from openpyxl import Workbook
+
+    db = SessionLocal()
+    try:
+        job = db.query(ScrapingJob).filter(ScrapingJob.id == job_id).first()
+        columns = discover_columns(db, job_id)
+
+        workbook = Workbook(write_only=True)
+        data_sheet = workbook.create_sheet('Scraped Data')
+        data_sheet.append(columns)
+        for row in iter_item_rows(db, job_id):
+            data_sheet.append([_excel_value(row.get(column, '')) for column in columns])
+
+        # Add job information as a second sheet
+        info_sheet = workbook.create_sheet('Job Info')
+        info_sheet.append(['Job ID', 'Query', 'Status', 'Max Results', 'Created At',
+                           'Completed At', 'Results Count', 'Error Message'])
+        info_sheet.append([job.id, _excel_value(job.query), job.status, job.max_results, job.created_at,
+                           job.completed_at, job.results_count, _excel_value(job.error_message or '')])
+
+        workbook.save(path)
+    finally:
+        db.close()
+
+
+def excel_cache_path(job: ScrapingJob) -> Optional[str]:
+    """Cache location for a finished job's workbook, or None while the job can still change"""
+    if job.status != "completed" or not job.completed_at:
+        return None
+    return os.path.join(EXPORT_DIR, f"job_{job.id}_{job.completed_at:%Y%m%d%H%M%S%f}.xlsx")
+
+
+_excel_locks: Dict[str, asyncio.Lock] = {}
+
+
+async def build_excel_export(job: ScrapingJob) -> str:
+    """Return the path of an .xlsx export for ``job``, generating it off the event loop if needed.
+
+    Completed jobs are cached on disk under EXPORT_DIR; the cache name includes the
+    completion timestamp, so a job that is re-run gets a fresh file. Exports for
+    jobs that are not completed go to a temporary file the caller must remove.
+    """
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    cache_path = excel_cache_path(job)
+    if cache_path is None:
+        path = os.path.join(EXPORT_DIR, f"job_{job.id}_{uuid.uuid4().hex}.xlsx.tmp")
+        with timed("export_excel"):
+            await asyncio.to_thread(write_excel, job.id, path)
+        return path
+
+    lock = _excel_locks.setdefault(cache_path, asyncio.Lock())
+    async with lock:
+        if not os.path.exists(cache_path):
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with timed("export_excel"):
+                await asyncio.to_thread(write_excel, job.id, tmp_path)
+            os.replace(tmp_path, cache_path)
+    _excel_locks.pop(cache_path, None)
+    return cache_path
+
+
+# Typed exports (Parquet, Arrow IPC, gzip NDJSON): the stored item columns with their real
+# types, plus additional_data flattened into one column per key path
+
+ITEM_COLUMNS: List[Tuple[str, str]] = [
+    ('item_id', 'int'),
+    ('title', 'string'),
+    ('description', 'string'),
+    ('url', 'string'),
+    ('price', 'string'),
+    ('price_amount', 'float'),
+    ('price_currency', 'string'),
+    ('rating', 'string'),
+    ('rating_value', 'float'),
+    ('rating_scale', 'float'),
+    ('date', 'string'),
+    ('source_domain', 'string'),
+]
+ADDITIONAL_PREFIX = "additional_data."
+_INT64_RANGE = range(-2 ** 63, 2 ** 63)
+
+
+def _typed_rows_stmt(job_id: int):
+    return (
+        select(ScrapedItem.id, *(getattr(ContentItem, name) for name, _ in ITEM_COLUMNS[1:]),
+               ContentItem.additional_data)
+        .join(ScrapedItem, ScrapedItem.content_id == ContentItem.id)
+        .where(ScrapedItem.job_id == job_id)
+        .order_by(ScrapedItem.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+
+
+def flatten_additional_data(data: Optional[dict], prefix: str = ADDITIONAL_PREFIX) -> dict:
+    """Nested dicts become dotted column names: {"specs": {"ram": 8}} -> {"additional_data.specs.ram": 8}"""
+    flat = {}
+    for key, value in (data or {}).items():
+        if isinstance(value, dict) and value:
+            flat.update(flatten_additional_data(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def _value_kind(value) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, int):
+        return 'int' if value in _INT64_RANGE else 'string'
+    if isinstance(value, float):
+        return 'float'
+    return 'string'
+
+
+def _merge_kinds(current: Optional[str], new: Optional[str]) -> Optional[str]:
+    """Narrowest type that holds values of both kinds (ints and floats widen to float, anything else to string)"""
+    if current is None or current == new:
+        return new or current
+    if new is None:
+        return current
+    if {current, new} == {'int', 'float'}:
+        return 'float'
+    return 'string'
+
+
+def _typed_value(kind: str, value):
+    if value is None:
+        return None
+    if kind == 'string':
+        return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)
+    if kind == 'float':
+        return float(value)
+    return value
+
+
+async def discover_typed_columns(db: AsyncSession, job_id: int) -> List[Tuple[str, str]]:
+    """Item columns followed by each flattened additional_data key (first-seen order) with its type.
+
+    A key whose values never agree on a type is exported as a string column
+    (non-string values JSON-encoded); a key that is always null is a string column.
+    """
+    extra: Dict[str, Optional[str]] = {}
+    async for (additional_data,) in await db.stream(_columns_stmt(job_id)):
+        for name, value in flatten_additional_data(additional_data).items():
+            extra[name] = _merge_kinds(extra.get(name), _value_kind(value))
+    return ITEM_COLUMNS + [(name, kind or 'string') for name, kind in extra.items()]
+
+
+async def _typed_row_batches(db: AsyncSession, job_id: int,
+                             columns: Sequence[Tuple[str, str]]) -> AsyncIterator[List[tuple]]:
+    """Yield a job's items as lists of up to EXPORT_ROW_GROUP_SIZE tuples in ``columns`` order"""
+    extra = columns[len(ITEM_COLUMNS):]
+    batch = []
+    async for record in await db.stream(_typed_rows_stmt(job_id)):
+        flat = flatten_additional_data(record[-1])
+        batch.append(tuple(record[:-1]) + tuple(_typed_value(kind, flat.get(name)) for name, kind in extra))
+        if len(batch) >= EXPORT_ROW_GROUP_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that keeps what is written until drained, so encoders can feed a streamed response"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _arrow_schema(columns: Sequence[Tuple[str, str]]):
+    import pyarrow as pa
+
+    types = {'int': pa.int64(), 'float': pa.float64(), 'bool': pa.bool_(), 'string': pa.string()}
+    return pa.schema([(name, types[kind]) for name, kind in columns])
+
+
+def _record_batch(schema, rows: List[tuple]):
+    import pyarrow as pa
+
+    return pa.record_batch([pa.array(values, type=field.type) for field, values in zip(schema, zip(*rows))],
+                           schema=schema)
+
+
+class _ParquetEncoder:
+    def __init__(self, sink, columns):
+        import pyarrow.parquet as pq
+
+        self.schema = _arrow_schema(columns)
+        self.writer = pq.ParquetWriter(sink, self.schema, compression=PARQUET_COMPRESSION)
+
+    def write(self, rows: List[tuple]):
+        # One row group per batch
+        self.writer.write_batch(_record_batch(self.schema, rows), row_group_size=len(rows))
+
+    def close(self):
+        self.writer.close()
+
+
+class _ArrowEncoder:
+    def __init__(self, sink, columns):
+        import pyarrow as pa
+
+        self.schema = _arrow_schema(columns)
+        self.writer = pa.ipc.new_file(sink, self.schema)
+
+    def write(self, rows: List[tuple]):
+        self.writer.write_batch(_record_batch(self.schema, rows))
+
+    def close(self):
+        self.writer.close()
+
+
+class _NdjsonEncoder:
+    def __init__(self, sink, columns):
+        self.names = [name for name, _ in columns]
+        self.file = gzip.GzipFile(fileobj=sink, mode='wb')
+
+    def write(self, rows: List[tuple]):
+        self.file.write("".join(
+            json.dumps(dict(zip(self.names, row)), ensure_ascii=False) + "\n" for row in rows
+        ).encode('utf-8'))
+
+    def close(self):
+        self.file.close()
+
+
+class ExportFormat:
+    def __init__(self, name: str, extension: str, media_type: str, encoder, needs_pyarrow: bool,
+                 archive_compression: int):
+        self.name = name
+        self.extension = extension
+        self.media_type = media_type
+        self.encoder = encoder
+        self.needs_pyarrow = needs_pyarrow
+        # Zip compression for the format's files in a bulk export (none for formats compressed already)
+        self.archive_compression = archive_compression
+
+    @property
+    def available(self) -> bool:
+        return not self.needs_pyarrow or importlib.util.find_spec("pyarrow") is not None
+
+
+EXPORT_FORMATS = {
+    "parquet": ExportFormat("parquet", "parquet", "application/vnd.apache.parquet", _ParquetEncoder, True,
+                            zipfile.ZIP_STORED),
+    "arrow": ExportFormat("arrow", "arrow", "application/vnd.apache.arrow.file", _ArrowEncoder, True,
+                          zipfile.ZIP_DEFLATED),
+    "ndjson": ExportFormat("ndjson", "ndjson.gz", "application/gzip", _NdjsonEncoder, False,
+                           zipfile.ZIP_STORED),
+}
+
+
+async def _encoded_job(db: AsyncSession, job_id: int, export_format: ExportFormat) -> AsyncIterator[bytes]:
+    """Yield one job's export file in ``export_format``, encoded a row group at a time"""
+    columns = await discover_typed_columns(db, job_id)
+    sink = _ChunkSink()
+    encoder = export_format.encoder(sink, columns)
+    async for rows in _typed_row_batches(db, job_id, columns):
+        encoder.write(rows)
+        yield sink.drain()
+    encoder.close()
+    yield sink.drain()
+
+
+async def _job_export_chunks(job_id: int, export_format: ExportFormat) -> AsyncIterator[bytes]:
+    async with AsyncSessionLocal() as db:
+        async for chunk in _encoded_job(db, job_id, export_format):
+            if chunk:
+                yield chunk
+
+
+def stream_job_export(job_id: int, export_format: ExportFormat) -> AsyncIterator[bytes]:
+    """Yield a job's items as a Parquet, Arrow IPC or gzip NDJSON file without holding the whole job in memory"""
+    return _timed_chunks(f"export_{export_format.name}", _job_export_chunks(job_id, export_format))
+
+
+def _job_manifest(job: ScrapingJob, filename: str) -> dict:
+    return {
+        "id": job.id,
+        "query": job.query,
+        "status": job.status,
+        "max_results": job.max_results,
+        "results_count": job.results_count,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "completed_at": job.completed_at.isoformat() if job.completed_at else None,
+        "file": filename,
+    }
+
+
+async def _archive_chunks(jobs: List[ScrapingJob], export_format: ExportFormat) -> AsyncIterator[bytes]:
+    sink = _ChunkSink()
+    # The sink cannot seek, so zipfile writes sizes after each file's data instead of going back for them
+    with zipfile.ZipFile(sink, mode='w') as archive:
+        manifest = []
+        async with AsyncSessionLocal() as db:
+            for job in jobs:
+                filename = f"job_{job.id}.{export_format.extension}"
+                manifest.append(_job_manifest(job, filename))
+                entry = zipfile.ZipInfo(filename, date_time=datetime.utcnow().timetuple()[:6])
+                entry.compress_type = export_format.archive_compression
+                with archive.open(entry, mode='w', force_zip64=True) as target:
+                    async for chunk in _encoded_job(db, job.id, export_format):
+                        target.write(chunk)
+                        written = sink.drain()
+                        if written:
+                            yield written
+        archive.writestr("jobs.json", json.dumps(manifest, ensure_ascii=False, indent=2),
+                         compress_type=zipfile.ZIP_DEFLATED)
+    yield sink.drain()
+
+
+def stream_archive_export(jobs: List[ScrapingJob], export_format: ExportFormat) -> AsyncIterator[bytes]:
+    """Yield a zip with one ``export_format`` file per job plus a jobs.json manifest, built while it is sent"""
+    return _timed_chunks("export_archive", _archive_chunks(jobs, export_format))
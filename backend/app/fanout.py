@@ -0,0 +1,68 @@
+import math
+import os
+from typing import List, Optional
+
+# Items one agent is asked for; larger jobs are split across several agents
+FANOUT_SHARD_SIZE = int(os.getenv("FANOUT_SHARD_SIZE", "15"))
+# Agents a single job may be split across (1 disables fan-out)
+FANOUT_MAX_SHARDS = int(os.getenv("FANOUT_MAX_SHARDS", "4"))
+# Shards together ask for this much more than max_results, since duplicates across shards are dropped
+FANOUT_OVERFETCH = float(os.getenv("FANOUT_OVERFETCH", "1.25"))
+# Agents running at once in this process, over all jobs and shards
+MAX_AGENT_SESSIONS = int(os.getenv("MAX_AGENT_SESSIONS", os.getenv("MAX_CONCURRENT_JOBS", "3")))
+
+# Where each shard looks, so the agents cover different results instead of repeating each other
+SHARD_FOCUS = (
+    "Work from the first page of search results.",
+    "Work from the second page of search results and skip the listings that rank at the top.",
+    "Work from the third page of search results, or from specialist and independent websites.",
+    "Look beyond the main search results: comparison sites, review sites and other marketplaces.",
+)
+
+
+class Shard:
+    def __init__(self, index: int, count: int, max_results: int, focus: Optional[str] = None):
+        self.index = index
+        self.count = count
+        self.max_results = max_results
+        self.focus = focus
+
+    @property
+    def label(self) -> str:
+        return f"shard {self.index + 1}/{self.count}"
+
+
+def plan_shards(max_results: int, shard_size: int = FANOUT_SHARD_SIZE,
+                max_shards: int = FANOUT_MAX_SHARDS) -> List[Shard]:
+    """Split a job into agent runs of about ``shard_size`` items each (a single shard for small jobs)"""
+    count = max(1, min(max_shards, math.ceil(max_results / max(shard_size, 1))))
+    if count == 1:
+        return [Shard(0, 1, max_results)]
+    per_shard = math.ceil(max_results * FANOUT_OVERFETCH / count)
+    return [
+        Shard(index, count, per_shard,
+              SHARD_FOCUS[index] if index < len(SHARD_FOCUS) else f"Work from page {index + 1} of the search results.")
+        for index in range(count)
+    ]
+
+
+def build_task(query: str, shard: Shard) -> str:
+    """The agent task for one shard of a job"""
+    task = f"""
+            Search for "{query}" and extract exactly {shard.max_results} items with the following information:
+            1. Title/Product Name
+            2. Price (if available)
+            3. Description or key details
+            4. Website URL
+            5. Rating (if available)
+            6. Any additional relevant information
+
+            Return the results as a JSON array of objects with the keys "title", "price",
+            "description", "url" and "rating", plus any other relevant fields.
+            """
+    if shard.focus:
+        task += f"""
+            Other agents are covering other parts of the results. {shard.focus}
+            """
+    return task
+
@@ -0,0 +1,136 @@
+import base64
+import json
+import math
+import re
+from typing import Any, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, column as sql_column, or_, select, table, text
+from sqlalchemy.orm import contains_eager
+
+from database import POSTGRES_TSVECTOR, ContentItem, ScrapedItem
+
+# sort parameter -> (column, descending)
+ITEM_SORTS = {
+    "id": (ScrapedItem.id, False),
+    "-id": (ScrapedItem.id, True),
+    "price": (ContentItem.price_amount, False),
+    "-price": (ContentItem.price_amount, True),
+    "rating": (ContentItem.rating_value, False),
+    "-rating": (ContentItem.rating_value, True),
+}
+
+
+_SEARCH_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# FTS5 external-content table maintained by triggers (see database.create_search_index)
+_items_fts = table("content_items_fts", sql_column("rowid"))
+
+
+def search_terms(q: str) -> list:
+    return _SEARCH_TOKEN_RE.findall(q.lower())[:16]
+
+
+def apply_search(stmt, q: str, dialect: str):
+    """Restrict ``stmt`` to items whose title or description match every term in ``q``.
+
+    Terms are matched as prefixes through the backend's full-text index where
+    there is one (FTS5 on SQLite, a GIN tsvector index on PostgreSQL) and with
+    ILIKE scans elsewhere.
+    """
+    terms = search_terms(q)
+    if not terms:
+        return stmt
+    if dialect == "sqlite":
+        match = " ".join(f'"{term}"*' for term in terms)
+        return stmt.join(_items_fts, _items_fts.c.rowid == ContentItem.id).where(
+            text("content_items_fts MATCH :fts_query").bindparams(bindparam("fts_query", match))
+        )
+    if dialect == "postgresql":
+        match = " & ".join(f"{term}:*" for term in terms)
+        return stmt.where(
+            text(f"{POSTGRES_TSVECTOR} @@ to_tsquery('simple', :fts_query)").bindparams(bindparam("fts_query", match))
+        )
+    for term in terms:
+        pattern = f"%{term}%"
+        stmt = stmt.where(or_(ContentItem.title.ilike(pattern), ContentItem.description.ilike(pattern)))
+    return stmt
+
+
+def encode_cursor(value: Any, item_id: int) -> str:
+    raw = json.dumps([value, item_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, int]:
+    """Inverse of encode_cursor; raises ValueError for anything malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, item_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return value, int(item_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def decode_numeric_cursor(cursor: str) -> Tuple[float, int]:
+    """decode_cursor for the price and rating sorts, whose value must be a finite number"""
+    value, item_id = decode_cursor(cursor)
+    # Comparing the REAL column with text or NULL would silently match nothing
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ValueError("Invalid cursor")
+    return value, item_id
+
+
+def cursor_for(item: ScrapedItem, sort: str) -> str:
+    column, _ = ITEM_SORTS[sort]
+    return encode_cursor(getattr(item, column.key), item.id)
+
+
+def build_item_query(job_id: int, sort: str = "id", cursor: Optional[str] = None, limit: int = 50,
+                     min_price: Optional[float] = None, max_price: Optional[float] = None,
+                     currency: Optional[str] = None, min_rating: Optional[float] = None,
+                     max_rating: Optional[float] = None, domain: Optional[str] = None,
+                     q: Optional[str] = None, dialect: str = "sqlite"):
+    """Select one page (plus one look-ahead row) of a job's items.
+
+    Pagination is keyset-based on ``(sort column, id)``, so every page costs the
+    same regardless of how deep it is. Sorting by price or rating only returns
+    items that have a parsed value for that column. ``q`` is a full-text search
+    over title and description (see apply_search). Filters and sorts apply to
+    the items' shared ContentItem rows, loaded by the same join.
+    """
+    column, descending = ITEM_SORTS[sort]
+    stmt = (
+        select(ScrapedItem)
+        .join(ScrapedItem.content)
+        .options(contains_eager(ScrapedItem.content))
+        .where(ScrapedItem.job_id == job_id)
+    )
+
+    if min_price is not None:
+        stmt = stmt.where(ContentItem.price_amount >= min_price)
+    if max_price is not None:
+        stmt = stmt.where(ContentItem.price_amount <= max_price)
+    if currency:
+        stmt = stmt.where(ContentItem.price_currency == currency.upper())
+    if min_rating is not None:
+        stmt = stmt.where(ContentItem.rating_value >= min_rating)
+    if max_rating is not None:
+        stmt = stmt.where(ContentItem.rating_value <= max_rating)
+    if domain:
+        stmt = stmt.where(ContentItem.source_domain == domain.lower())
+    if q:
+        stmt = apply_search(stmt, q, dialect)
+
+    if column is ScrapedItem.id:
+        if cursor:
+            _, last_id = decode_cursor(cursor)
+            stmt = stmt.where(ScrapedItem.id < last_id if descending else ScrapedItem.id > last_id)
+        order = [ScrapedItem.id.desc() if descending else ScrapedItem.id.asc()]
+    else:
+        stmt = stmt.where(column.is_not(None))
+        if cursor:
+            last_value, last_id = decode_numeric_cursor(cursor)
+            past_value = column < last_value if descending else column > last_value
+            stmt = stmt.where(or_(past_value, and_(column == last_value, ScrapedItem.id > last_id)))
+        order = [column.desc() if descending else column.asc(), ScrapedItem.id.asc()]
+
+    return stmt.order_by(*order).limit(limit + 1)
@@ -0,0 +1,99 @@
+import asyncio
+import json
+import os
+from typing import AsyncIterator, List, Optional
+
+from sqlalchemy import select
+
+from connections import ConnectionManager
+from database import AsyncSessionLocal, ScrapingJob, ScrapedItem
+from pipeline import item_delta
+
+# How often a stream re-checks the database when no event arrives (e.g. for jobs run on another host)
+STREAM_POLL_SECONDS = float(os.getenv("STREAM_POLL_SECONDS", "2.0"))
+# Items sent per ``items`` event when catching up
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "500"))
+
+FINISHED_STATUSES = ("completed", "failed")
+
+
+async def load_item_deltas(job_id: int, after_item_id: int, limit: int = STREAM_BATCH_SIZE) -> List[dict]:
+    """Deltas of the items of ``job_id`` stored after ``after_item_id``, oldest first"""
+    async with AsyncSessionLocal() as db:
+        items = (await db.execute(
+            select(ScrapedItem)
+            .where(ScrapedItem.job_id == job_id, ScrapedItem.id > after_item_id)
+            .order_by(ScrapedItem.id)
+            .limit(limit)
+        )).scalars().all()
+    return [item_delta(item) for item in items]
+
+
+def sse_event(event: str, data: dict, event_id: Optional[int] = None) -> str:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def stream_job_events(job_id: int, after_item_id: int, manager: ConnectionManager) -> AsyncIterator[str]:
+    """Server-Sent Events for one job: ``items`` deltas, ``progress``, ``status``, ``reset`` and ``end``.
+
+    The database is the source of truth, so a stream resumes from any item id
+    (the ``id:`` of each ``items`` event, sent back by browsers as
+    ``Last-Event-ID``) and works whichever process runs the job. Broker events
+    only wake the stream up early; otherwise it polls every
+    ``STREAM_POLL_SECONDS``. The stream ends once the job has finished and
+    every item has been sent.
+    """
+    wakeup = manager.listen(job_id)
+    last_status = None
+    last_progress = None
+    sent = None  # items sent in this run, once known
+    try:
+        while True:
+            wakeup.clear()
+            async with AsyncSessionLocal() as db:
+                job = await db.get(ScrapingJob, job_id)
+            if job is None:
+                yield sse_event("end", {"job_id": job_id, "status": None})
+                return
+
+            if sent is not None and (job.results_count or 0) < sent:
+                # The job started over (a retry drops the previous run's items)
+                yield sse_event("reset", {"job_id": job_id})
+                after_item_id, sent = 0, 0
+            items = await load_item_deltas(job_id, after_item_id)
+            if items:
+                after_item_id = items[-1]["id"]
+                sent = (sent or 0) + len(items)
+                yield sse_event("items", {"job_id": job_id, "items": items, "last_item_id": after_item_id},
+                                event_id=after_item_id)
+                if len(items) == STREAM_BATCH_SIZE:
+                    continue
+            elif sent is None:
+                sent = 0
+
+            progress = manager.last_progress(job_id)
+            if progress is not None and progress != last_progress:
+                last_progress = progress
+                yield sse_event("progress", json.loads(progress))
+            if job.status != last_status:
+                last_status = job.status
+                yield sse_event("status", {"job_id": job_id, "status": job.status,
+                                           "results_count": job.results_count or 0,
+                                           "error_message": job.error_message})
+            if job.status in FINISHED_STATUSES:
+                yield sse_event("end", {"job_id": job_id, "status": job.status, "last_item_id": after_item_id})
+                return
+            if not items:
+                # Comment line: keeps proxies from closing an idle connection
+                yield ": keepalive\n\n"
+
+            try:
+                await asyncio.wait_for(wakeup.wait(), STREAM_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        manager.stop_listening(job_id, wakeup)
@@ -0,0 +1,282 @@
+import asyncio
+import os
+import random
+import re
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import aliased
+
+from database import AsyncSessionLocal, JobAttempt, ScrapingJob, async_engine
+
+# Each priority level lets a job jump ahead of jobs submitted this many seconds earlier
+PRIORITY_AGING_SECONDS = float(os.getenv("PRIORITY_AGING_SECONDS", "30"))
+# How long a worker's claim on a job lasts unless renewed by a heartbeat
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+# Runs a job gets (first run included) before a retryable error or lost lease fails it for good
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+RETRY_BASE_SECONDS = float(os.getenv("RETRY_BASE_SECONDS", "10"))
+RETRY_MAX_SECONDS = float(os.getenv("RETRY_MAX_SECONDS", "300"))
+
+# Error messages of transient failures: LLM rate limits and quotas, timeouts, unavailable upstreams
+_RETRYABLE_MESSAGE_RE = re.compile(
+    r"\b429\b|rate.?limit|quota|resource.?exhausted|too many requests|timed? ?out|timeout"
+    r"|temporarily unavailable|service unavailable|\b50[234]\b|connection (?:reset|refused|aborted)",
+    re.I,
+)
+
+
+class RetryScheduled(Exception):
+    """Raised by a job runner after a failed attempt was put back in the queue"""
+
+    def __init__(self, job_id: int, delay: float, error: Exception):
+        super().__init__(f"Job {job_id} will be retried in {delay:.0f}s: {error}")
+        self.job_id = job_id
+        self.delay = delay
+        self.error = error
+
+
+def queue_key(priority: int = 0, submitted_at: float = None) -> float:
+    """Virtual submission time: higher priorities run first, but old jobs are never starved"""
+    submitted_at = time.time() if submitted_at is None else submitted_at
+    return submitted_at - (priority or 0) * PRIORITY_AGING_SECONDS
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Timeouts, connection errors and rate limits; anything else fails the job at once"""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    status_code = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if status_code in (429, 500, 502, 503, 504):
+        return True
+    return bool(_RETRYABLE_MESSAGE_RE.search(str(error)))
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff after the ``attempt``-th run, with equal jitter so retries spread out"""
+    ceiling = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** max(attempt - 1, 0))
+    return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+
+async def count_jobs(status: str) -> int:
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(
+            select(func.count()).select_from(ScrapingJob).where(ScrapingJob.status == status)
+        )).scalar()
+
+
+def _claimable(now: datetime):
+    return (
+        ScrapingJob.status == "pending",
+        or_(ScrapingJob.next_attempt_at.is_(None), ScrapingJob.next_attempt_at <= now),
+    )
+
+
+async def _claim(db, job_id: int, worker_id: str, lease_seconds: float) -> Optional[ScrapingJob]:
+    """Conditionally move one pending job to ``running`` and open an attempt record for it"""
+    now = datetime.utcnow()
+    claimed = await db.execute(
+        update(ScrapingJob)
+        .where(ScrapingJob.id == job_id, *_claimable(now))
+        .values(status="running", worker_id=worker_id, started_at=now, heartbeat_at=now,
+                lease_expires_at=now + timedelta(seconds=lease_seconds),
+                next_attempt_at=None, attempts=func.coalesce(ScrapingJob.attempts, 0) + 1)
+    )
+    if claimed.rowcount != 1:
+        await db.rollback()
+        return None
+    job = await db.get(ScrapingJob, job_id, populate_existing=True)
+    db.add(JobAttempt(job_id=job_id, attempt=job.attempts, worker_id=worker_id, started_at=now))
+    await db.commit()
+    return job
+
+
+async def claim_job(job_id: int, worker_id: str, lease_seconds: float = JOB_LEASE_SECONDS) -> Optional[ScrapingJob]:
+    """Claim a specific job; None if it is not pending, not due yet, or another worker won it"""
+    async with AsyncSessionLocal() as db:
+        return await _claim(db, job_id, worker_id, lease_seconds)
+
+
+async def claim_next_job(worker_id: str, lease_seconds: float = JOB_LEASE_SECONDS) -> Optional[ScrapingJob]:
+    """Move the next due pending job to ``running`` under a lease held by ``worker_id``.
+
+    The claim is a conditional update (``WHERE status = 'pending'``), so when
+    several workers race for the same row exactly one of them gets it. On
+    PostgreSQL the candidate row is also locked with SKIP LOCKED so concurrent
+    workers pick different jobs instead of retrying.
+    """
+    async with AsyncSessionLocal() as db:
+        for _ in range(5):
+            stmt = (
+                select(ScrapingJob.id)
+                .where(*_claimable(datetime.utcnow()))
+                .order_by(ScrapingJob.queue_key.asc().nulls_first(), ScrapingJob.id)
+                .limit(1)
+            )
+            if async_engine.dialect.name == "postgresql":
+                stmt = stmt.with_for_update(skip_locked=True)
+            job_id = (await db.execute(stmt)).scalar()
+            if job_id is None:
+                await db.rollback()
+                return None
+            job = await _claim(db, job_id, worker_id, lease_seconds)
+            if job is not None:
+                return job
+    return None
+
+
+async def renew_leases(worker_id: str, lease_seconds: float = JOB_LEASE_SECONDS) -> int:
+    """Heartbeat: extend the lease on every job ``worker_id`` is still running"""
+    now = datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            update(ScrapingJob)
+            .where(ScrapingJob.worker_id == worker_id, ScrapingJob.status == "running")
+            .values(heartbeat_at=now, lease_expires_at=now + timedelta(seconds=lease_seconds))
+        )
+        await db.commit()
+        return result.rowcount
+
+
+async def _close_attempt(db, job_id: int, outcome: str, error: Optional[BaseException] = None):
+    await db.execute(
+        update(JobAttempt)
+        .where(JobAttempt.job_id == job_id, JobAttempt.finished_at.is_(None))
+        .values(finished_at=datetime.utcnow(), outcome=outcome,
+                error_message=str(error) if error is not None else None)
+    )
+
+
+async def finish_attempt(job_id: int, outcome: str, error: Optional[BaseException] = None):
+    """Record how the current run of ``job_id`` ended"""
+    async with AsyncSessionLocal() as db:
+        await _close_attempt(db, job_id, outcome, error)
+        await db.commit()
+
+
+async def schedule_retry(job_id: int, error: BaseException) -> Optional[float]:
+    """Put a job whose run failed back in the queue after a backoff.
+
+    Returns the delay in seconds, or None when the job has used all of its
+    attempts (the caller then fails it).
+    """
+    async with AsyncSessionLocal() as db:
+        job = await db.get(ScrapingJob, job_id)
+        attempts = (job.attempts or 0) if job else JOB_MAX_ATTEMPTS
+        if attempts >= JOB_MAX_ATTEMPTS:
+            return None
+        delay = backoff_delay(attempts)
+        await db.execute(
+            update(ScrapingJob).where(ScrapingJob.id == job_id).values(
+                status="pending", worker_id=None, lease_expires_at=None, error_message=str(error),
+                next_attempt_at=datetime.utcnow() + timedelta(seconds=delay)
+            )
+        )
+        await _close_attempt(db, job_id, "retry", error)
+        await db.commit()
+        return delay
+
+
+async def release_jobs(worker_id: str) -> int:
+    """Hand a stopping worker's unfinished jobs back to the queue without using up an attempt"""
+    async with AsyncSessionLocal() as db:
+        job_ids = (await db.execute(
+            select(ScrapingJob.id).where(ScrapingJob.worker_id == worker_id, ScrapingJob.status == "running")
+        )).scalars().all()
+        for job_id in job_ids:
+            await _close_attempt(db, job_id, "released")
+        if job_ids:
+            await db.execute(
+                update(ScrapingJob).where(ScrapingJob.id.in_(job_ids), ScrapingJob.status == "running").values(
+                    status="pending", worker_id=None, lease_expires_at=None,
+                    attempts=func.coalesce(ScrapingJob.attempts, 1) - 1
+                )
+            )
+        await db.commit()
+        return len(job_ids)
+
+
+async def _release_orphaned_followers(db, now: datetime) -> List[ScrapingJob]:
+    """Queue jobs attached to a leader that finished without handing them its results.
+
+    A leader copies its items to the jobs attached to it when it finishes, so
+    attached jobs only outlive a finished leader when the process running it
+    stopped in between. Leaders are given JOB_LEASE_SECONDS to finish that copy.
+    """
+    leader = aliased(ScrapingJob)
+    orphaned = (await db.execute(
+        select(ScrapingJob)
+        .outerjoin(leader, leader.id == ScrapingJob.source_job_id)
+        .where(
+            ScrapingJob.status == "attached",
+            or_(leader.id.is_(None),
+                leader.status.not_in(("pending", "running")) & or_(
+                    leader.completed_at.is_(None),
+                    leader.completed_at < now - timedelta(seconds=JOB_LEASE_SECONDS))),
+        )
+    )).scalars().all()
+    released = []
+    for job in orphaned:
+        submitted_at = job.created_at.replace(tzinfo=timezone.utc).timestamp() if job.created_at else None
+        values = dict(status="pending", source_job_id=None, queue_key=queue_key(job.priority, submitted_at))
+        result = await db.execute(
+            update(ScrapingJob).where(ScrapingJob.id == job.id, ScrapingJob.status == "attached").values(**values)
+        )
+        if result.rowcount == 1:
+            db.expunge(job)
+            for key, value in values.items():
+                setattr(job, key, value)
+            released.append(job)
+    return released
+
+
+async def reap_expired_leases() -> Tuple[List[ScrapingJob], List[ScrapingJob]]:
+    """Recover jobs whose worker stopped heartbeating.
+
+    Each such job is requeued after a backoff, or failed once it has used
+    ``JOB_MAX_ATTEMPTS`` runs. Jobs still attached to a leader that has
+    finished are queued to run on their own. Returns ``(requeued, failed)``.
+    """
+    now = datetime.utcnow()
+    requeued: List[ScrapingJob] = []
+    failed: List[ScrapingJob] = []
+    async with AsyncSessionLocal() as db:
+        expired = (await db.execute(
+            select(ScrapingJob).where(ScrapingJob.status == "running", ScrapingJob.lease_expires_at < now)
+        )).scalars().all()
+        for job in expired:
+            error = f"Worker {job.worker_id} stopped heartbeating (last at {job.heartbeat_at})"
+            # Guard on the lease we saw, in case the worker renewed it meanwhile
+            guard = (ScrapingJob.id == job.id, ScrapingJob.status == "running",
+                     ScrapingJob.lease_expires_at == job.lease_expires_at)
+            if (job.attempts or 0) >= JOB_MAX_ATTEMPTS:
+                values = dict(status="failed", worker_id=None, lease_expires_at=None, completed_at=now,
+                              error_message=f"Gave up after {job.attempts} attempts: {error}")
+                bucket = failed
+            else:
+                values = dict(status="pending", worker_id=None, lease_expires_at=None, error_message=error,
+                              next_attempt_at=now + timedelta(seconds=backoff_delay(job.attempts or 1)))
+                bucket = requeued
+            result = await db.execute(update(ScrapingJob).where(*guard).values(**values))
+            if result.rowcount == 1:
+                await _close_attempt(db, job.id, "lease_expired", RuntimeError(error))
+                # Hand back a detached copy reflecting the update
+                db.expunge(job)
+                for key, value in values.items():
+                    setattr(job, key, value)
+                bucket.append(job)
+        followers = await _release_orphaned_followers(db, now)
+        await db.commit()
+    for job in requeued + failed:
+        print(f"Recovered scraping job {job.id} with an expired lease: now {job.status}")
+    for job in followers:
+        print(f"Scraping job {job.id} was left attached to a finished job: now {job.status}")
+    return requeued + followers, failed
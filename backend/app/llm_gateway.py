@@ -0,0 +1,395 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Callable, Optional
+
+from jobqueue import is_retryable
+from metrics import JobProfile, timed
+
+# Provider quotas; 0 disables a limit
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "60"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "1000000"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+# Output tokens reserved per call before the real usage is known
+LLM_OUTPUT_TOKEN_ESTIMATE = int(os.getenv("LLM_OUTPUT_TOKEN_ESTIMATE", "1000"))
+# Calls retried inside the gateway when the provider reports a rate limit or timeout
+LLM_RETRY_ATTEMPTS = int(os.getenv("LLM_RETRY_ATTEMPTS", "3"))
+# Prompt -> response cache for deterministic calls (temperature 0); empty disables it
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", "")
+# "google" (Gemini through browser-use) or "fake" (offline, no API key needed)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "google")
+# Sampling temperature for the chat model; 0 makes calls deterministic and so cacheable
+LLM_TEMPERATURE = os.getenv("LLM_TEMPERATURE", "")
+
+
+class RateLimiter:
+    """Grants at most ``per_minute`` units in any 60 second window.
+
+    Grants are kept in a sliding log, so unlike a token bucket a full minute's
+    quota can never be spent twice around a window boundary. Callers wait in
+    FIFO order. A request larger than the whole quota waits for an empty
+    window and is then granted on its own.
+    """
+
+    def __init__(self, per_minute: float, window: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        self.capacity = per_minute
+        self.window = window
+        self.clock = clock
+        self.used = 0.0
+        self.waited_seconds = 0.0
+        self._grants = deque()  # [granted at, amount]; amount is None once the grant has expired
+        self._lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def _expire(self, now: float):
+        while self._grants and self._grants[0][0] <= now - self.window:
+            grant = self._grants.popleft()
+            self.used -= grant[1]
+            grant[1] = None
+
+    def _wait_time(self, now: float, needed: float) -> float:
+        freed = 0.0
+        for granted_at, amount in self._grants:
+            freed += amount
+            if self.used - freed + needed <= self.capacity:
+                return max(granted_at + self.window - now, 0.001)
+        return self.window
+
+    async def acquire(self, amount: float = 1) -> Optional[list]:
+        """Wait until ``amount`` fits in the window; returns the grant, to be passed to :meth:`adjust`"""
+        if not self.enabled:
+            return None
+        async with self._lock:
+            needed = min(amount, self.capacity)
+            while True:
+                now = self.clock()
+                self._expire(now)
+                if self.used + needed <= self.capacity:
+                    grant = [now, amount]
+                    self._grants.append(grant)
+                    self.used += amount
+                    return grant
+                wait = self._wait_time(now, needed)
+                self.waited_seconds += wait
+                await asyncio.sleep(wait)
+
+    def adjust(self, grant: Optional[list], amount: float):
+        """Charge (positive) or refund (negative) the difference between a grant's estimate and actual use.
+
+        Grants that already left the window are no longer counted, so they are not corrected.
+        """
+        if grant is None or grant[1] is None:
+            return
+        corrected = max(0.0, grant[1] + amount)
+        self.used += corrected - grant[1]
+        grant[1] = corrected
+
+
+class CompletionResult:
+    """Stand-in for browser-use's ChatInvokeCompletion when it is not installed"""
+
+    def __init__(self, completion: Any, usage: Any = None):
+        self.completion = completion
+        self.usage = usage
+
+
+class TokenUsage:
+    def __init__(self, prompt_tokens: int = 0, completion_tokens: int = 0):
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.total_tokens = prompt_tokens + completion_tokens
+
+
+class JobUsage:
+    """LLM usage accumulated by one job"""
+
+    def __init__(self):
+        self.calls = 0
+        self.cached_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def as_columns(self) -> dict:
+        return {
+            "llm_calls": self.calls,
+            "llm_cached_calls": self.cached_calls,
+            "llm_prompt_tokens": self.prompt_tokens,
+            "llm_completion_tokens": self.completion_tokens,
+        }
+
+
+def _dump(value: Any) -> Any:
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json", exclude_none=True)
+    if isinstance(value, (list, tuple)):
+        return [_dump(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _dump(item) for key, item in value.items()}
+    return value
+
+
+def _usage_counts(usage: Any):
+    if usage is None:
+        return None
+    if isinstance(usage, dict):
+        return int(usage.get("prompt_tokens") or 0), int(usage.get("completion_tokens") or 0)
+    return int(getattr(usage, "prompt_tokens", 0) or 0), int(getattr(usage, "completion_tokens", 0) or 0)
+
+
+def make_completion(completion: Any, prompt_tokens: Optional[int] = None, completion_tokens: int = 0):
+    """Build a response in browser-use's shape (or a stand-in when it is not installed)"""
+    try:
+        from browser_use.llm.views import ChatInvokeCompletion, ChatInvokeUsage
+    except ImportError:
+        usage = TokenUsage(prompt_tokens, completion_tokens) if prompt_tokens is not None else None
+        return CompletionResult(completion, usage)
+    usage = None
+    if prompt_tokens is not None:
+        usage = ChatInvokeUsage(prompt_tokens=prompt_tokens, prompt_cached_tokens=None,
+                                prompt_cache_creation_tokens=None, prompt_image_tokens=None,
+                                completion_tokens=completion_tokens,
+                                total_tokens=prompt_tokens + completion_tokens)
+    return ChatInvokeCompletion(completion=completion, usage=usage)
+
+
+class PromptCache:
+    """Content-addressed store of responses: ``<dir>/<sha[:2]>/<sha>.json``"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model: str, messages: Any, output_format: Any) -> str:
+        schema = output_format.model_json_schema() if hasattr(output_format, "model_json_schema") else None
+        payload = json.dumps({"model": model, "messages": _dump(messages), "schema": schema},
+                             sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[dict]:
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, completion: Any, usage: Any):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        counts = _usage_counts(usage) or (0, 0)
+        entry = {"completion": _dump(completion),
+                 "usage": {"prompt_tokens": counts[0], "completion_tokens": counts[1]}}
+        # Write then rename so concurrent readers never see a partial file
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(temporary, path)
+
+
+class LLMGateway:
+    """Shared front door to the chat model for every job in this process.
+
+    Each call waits for a concurrency slot and for the per-minute request
+    and token limits (tokens are estimated from the prompt up front, then corrected
+    with the usage the provider reports). Rate-limit and timeout errors are
+    retried with backoff before they reach the agent. Responses of
+    deterministic calls are served from ``PromptCache`` when one is set.
+    """
+
+    def __init__(self, llm: Any, requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = LLM_TOKENS_PER_MINUTE, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 cache_dir: str = LLM_CACHE_DIR):
+        self.llm = llm
+        self.requests = RateLimiter(requests_per_minute)
+        self.tokens = RateLimiter(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.cache = PromptCache(cache_dir) if cache_dir else None
+        self.in_flight = 0
+        self.calls_total = 0
+        self.retries_total = 0
+        self.prompt_tokens_total = 0
+        self.completion_tokens_total = 0
+
+    @property
+    def model(self) -> str:
+        return str(getattr(self.llm, "model", "unknown"))
+
+    def _deterministic(self) -> bool:
+        return getattr(self.llm, "temperature", None) == 0
+
+    def for_job(self, job_id: int, profile: Optional[JobProfile] = None) -> "JobLLM":
+        return JobLLM(self, job_id, profile)
+
+    async def ainvoke(self, messages: Any, output_format: Any = None, usage: Optional[JobUsage] = None):
+        cache_key = None
+        if self.cache is not None and self._deterministic():
+            cache_key = PromptCache.key(self.model, messages, output_format)
+            entry = self.cache.get(cache_key)
+            if entry is not None:
+                return self._from_cache(entry, output_format, usage)
+
+        estimate = len(json.dumps(_dump(messages), default=str)) // 4 + LLM_OUTPUT_TOKEN_ESTIMATE
+        async with self._slots:
+            for attempt in range(1, LLM_RETRY_ATTEMPTS + 1):
+                await self.requests.acquire(1)
+                grant = await self.tokens.acquire(estimate)
+                self.in_flight += 1
+                try:
+                    if output_format is None:
+                        response = await self.llm.ainvoke(messages)
+                    else:
+                        response = await self.llm.ainvoke(messages, output_format)
+                except Exception as e:
+                    # A failed call reports no usage, so give back the tokens reserved for it
+                    self.tokens.adjust(grant, -estimate)
+                    if attempt == LLM_RETRY_ATTEMPTS or not is_retryable(e):
+                        raise
+                    self.retries_total += 1
+                    await asyncio.sleep(min(30.0, 2 ** attempt) * (0.5 + random.random() / 2))
+                    continue
+                finally:
+                    self.in_flight -= 1
+                break
+
+        counts = _usage_counts(getattr(response, "usage", None))
+        if counts is not None:
+            self.tokens.adjust(grant, sum(counts) - estimate)
+        self._record(counts or (0, 0), usage)
+        if cache_key is not None:
+            self.cache.put(cache_key, response.completion, getattr(response, "usage", None))
+        return response
+
+    def _from_cache(self, entry: dict, output_format: Any, usage: Optional[JobUsage]):
+        completion = entry["completion"]
+        if output_format is not None and hasattr(output_format, "model_validate"):
+            completion = output_format.model_validate(completion)
+        if usage is not None:
+            usage.calls += 1
+            usage.cached_calls += 1
+        # No tokens were spent, so none are reported
+        return make_completion(completion)
+
+    def _record(self, counts, usage: Optional[JobUsage]):
+        prompt_tokens, completion_tokens = counts
+        self.calls_total += 1
+        self.prompt_tokens_total += prompt_tokens
+        self.completion_tokens_total += completion_tokens
+        if usage is not None:
+            usage.calls += 1
+            usage.prompt_tokens += prompt_tokens
+            usage.completion_tokens += completion_tokens
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "requests_per_minute": self.requests.capacity,
+            "tokens_per_minute": self.tokens.capacity,
+            "calls_total": self.calls_total,
+            "retries_total": self.retries_total,
+            "prompt_tokens_total": self.prompt_tokens_total,
+            "completion_tokens_total": self.completion_tokens_total,
+            "rate_limit_wait_seconds": self.requests.waited_seconds + self.tokens.waited_seconds,
+            "cache_enabled": self.cache is not None,
+            "cache_hits": self.cache.hits if self.cache else 0,
+            "cache_misses": self.cache.misses if self.cache else 0,
+        }
+
+
+class JobLLM:
+    """What a job's agent sees as its LLM: the shared gateway, with usage counted for the job.
+
+    Attributes other than ``ainvoke`` (model, provider, name, ...) come from
+    the wrapped chat model so browser-use treats this like the model itself.
+    """
+
+    def __init__(self, gateway: LLMGateway, job_id: int, profile: Optional[JobProfile] = None):
+        self.gateway = gateway
+        self.job_id = job_id
+        self.usage = JobUsage()
+        self.profile = profile
+
+    def __getattr__(self, name: str):
+        # Only reached for names not set in __init__; guard against lookups before it ran (copying)
+        if name in ("gateway", "job_id", "usage", "profile"):
+            raise AttributeError(name)
+        return getattr(self.gateway.llm, name)
+
+    async def ainvoke(self, messages: Any, output_format: Any = None):
+        # Includes waiting for the gateway's rate limits, as that is time the agent spends too
+        with timed("llm_call", self.profile):
+            return await self.gateway.ainvoke(messages, output_format, usage=self.usage)
+
+
+class FakeLLM:
+    """Offline chat model for development, tests and benchmarks.
+
+    ``responder(messages, output_format)`` returns the completion text; the
+    default answers every call with a finished browser-use step whose result
+    is a JSON array of ``items`` placeholder products. Latency and errors
+    can be injected with ``latency`` and ``fail_every``.
+    """
+
+    provider = "fake"
+    name = "fake"
+
+    def __init__(self, responder: Optional[Callable[[Any, Any], str]] = None, latency: float = 0.0,
+                 items: int = 10, fail_every: int = 0, temperature: Optional[float] = 0):
+        self.model = "fake-llm"
+        self.model_name = self.model
+        self.responder = responder or self._default_responder
+        self.latency = latency
+        self.items = items
+        self.fail_every = fail_every
+        self.temperature = temperature
+        self.calls = 0
+
+    def _default_responder(self, messages: Any, output_format: Any) -> str:
+        items = [
+            {"title": f"Fake product {i}", "price": f"${10 + i}.99", "rating": f"{3 + i % 3}/5",
+             "url": f"https://example.com/products/{i}", "description": "Generated offline by FakeLLM"}
+            for i in range(self.items)
+        ]
+        if output_format is None:
+            return json.dumps(items)
+        return json.dumps({
+            "thinking": "", "evaluation_previous_goal": "", "memory": "", "next_goal": "",
+            "action": [{"done": {"text": json.dumps(items), "success": True}}],
+        })
+
+    async def ainvoke(self, messages: Any, output_format: Any = None):
+        self.calls += 1
+        call = self.calls
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.fail_every and call % self.fail_every == 0:
+            raise RuntimeError("429 Resource exhausted (fake rate limit)")
+        text = self.responder(messages, output_format)
+        completion = output_format.model_validate_json(text) if output_format is not None else text
+        return make_completion(completion, len(json.dumps(_dump(messages), default=str)) // 4, len(text) // 4)
+
+
+def create_chat_model(google_api_key: Optional[str]):
+    """The chat model selected by LLM_BACKEND"""
+    if LLM_BACKEND == "fake":
+        return FakeLLM()
+    from browser_use.llm import ChatGoogle
+
+    options = {"temperature": float(LLM_TEMPERATURE)} if LLM_TEMPERATURE else {}
+    return ChatGoogle(model='gemini-1.5-flash', api_key=google_api_key, **options)
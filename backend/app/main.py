@@ -2,19 +2,50 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, HTTPException, status
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, Header, HTTPException, Query, status
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-import asyncio
-import json
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
-from database import get_db, ScrapingJob, ScrapedItem
+from database import DB_AUTO_CREATE, AsyncSessionLocal, async_engine, get_async_db, init_db, JobAttempt, ScrapingJob, ScrapedItem
 from models import *
 from scraper import EnhancedAIWebScraper
+from scheduler import EMBEDDED_WORKER, MAX_QUEUED_JOBS, JobScheduler, QueueFullError
+from jobqueue import JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS, count_jobs, queue_key, reap_expired_leases
+from connections import ConnectionManager
+from progress_broker import create_broker
+from cache import ResultCache
+from browser_pool import BrowserPool
+from pipeline import clone_job_items
+from item_search import ITEM_SORTS, build_item_query, cursor_for
+from item_stream import load_item_deltas, stream_job_events
+from exporters import (EXPORT_ARCHIVE_MAX_JOBS, EXPORT_FORMATS, build_excel_export, excel_cache_path, export_filename,
+                       job_has_items, stream_archive_export, stream_csv, stream_job_export)
+from metrics import CONTENT_TYPE, JOBS_QUEUED, JOBS_RUNNING, REGISTRY, WEBSOCKETS_OPEN, MetricsMiddleware
 
-app = FastAPI(title="AI Web Scraper", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if DB_AUTO_CREATE:
+        await init_db()
+    await broker.start()
+    if EMBEDDED_WORKER:
+        browser_pool.start()
+        await scheduler.start()
+    elif not broker.distributed:
+        print("Warning: EMBEDDED_WORKER=false with a memory:// PROGRESS_BROKER_URL; worker progress will not reach clients")
+    yield
+    if EMBEDDED_WORKER:
+        await scheduler.shutdown()
+        await browser_pool.close()
+    await broker.close()
+
+app = FastAPI(title="AI Web Scraper", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -24,251 +55,464 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Latency of every HTTP route, exposed on /metrics
+app.add_middleware(MetricsMiddleware)
 
-# WebSocket connection manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-    
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-    
-    def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-    
-    async def send_progress(self, job_id: int, status: str, progress: int, message: str):
-        progress_data = {
-            "job_id": job_id,
-            "status": status,
-            "progress": progress,
-            "message": message,
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        # Send to all connected clients
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(json.dumps(progress_data))
-            except:
-                self.disconnect(connection)
+broker = create_broker()
+manager = ConnectionManager(broker, item_loader=load_item_deltas)
+result_cache = ResultCache()
+browser_pool = BrowserPool()
+# With EMBEDDED_WORKER=false this process only queues jobs and relays progress from the workers
+scraper = EnhancedAIWebScraper(result_cache=result_cache, browser_pool=browser_pool) if EMBEDDED_WORKER else None
 
-manager = ConnectionManager()
-scraper = EnhancedAIWebScraper()
+async def run_scraping_job(job_id: int, query: str, max_results: int):
+    return await scraper.scrape_with_progress(job_id, query, max_results, manager.send_progress,
+                                              manager.send_items)
 
-# Scraping routes
-@app.post("/api/scraping/start", response_model=ScrapingJobResponse)
-async def start_scraping(
-    request: ScrapingRequest,
-    db: Session = Depends(get_db)
-):
-    # Create new scraping job
-    job = ScrapingJob(
-        query=request.query,
-        max_results=request.max_results
-    )
-    db.add(job)
-    db.commit()
-    db.refresh(job)
-    
-    # Start scraping in background
-    asyncio.create_task(
-        scraper.scrape_with_progress(
-            job.id, 
-            request.query, 
-            request.max_results,
-            manager.send_progress
-        )
+scheduler = JobScheduler(run_scraping_job)
+
+def collect_metrics():
+    WEBSOCKETS_OPEN.set(len(manager.connections))
+    if EMBEDDED_WORKER:
+        JOBS_RUNNING.set(scheduler.running_count)
+        JOBS_QUEUED.set(scheduler.queued_count)
+
+REGISTRY.add_collector(collect_metrics)
+
+async def queue_is_full() -> bool:
+    if EMBEDDED_WORKER:
+        return scheduler.is_full()
+    return await count_jobs("pending") >= MAX_QUEUED_JOBS
+
+def item_to_response(item: ScrapedItem) -> ScrapedItemResponse:
+    return ScrapedItemResponse(
+        id=item.id,
+        title=item.title,
+        description=item.description,
+        url=item.url,
+        price=item.price,
+        rating=item.rating,
+        date=item.date,
+        additional_data=item.additional_data or {},
+        price_amount=item.price_amount,
+        price_currency=item.price_currency,
+        rating_value=item.rating_value,
+        rating_scale=item.rating_scale,
+        source_domain=item.source_domain
     )
-    
+
+def job_to_response(job: ScrapingJob, scraped_items: Optional[List[ScrapedItem]] = None) -> ScrapingJobResponse:
     return ScrapingJobResponse(
         id=job.id,
         query=job.query,
         status=job.status,
         max_results=job.max_results,
+        priority=job.priority or 0,
         created_at=job.created_at,
         completed_at=job.completed_at,
-        results_count=job.results_count,
+        results_count=job.results_count or 0,
         results_file=job.results_file,
-        error_message=job.error_message
+        error_message=job.error_message,
+        source_job_id=job.source_job_id,
+        attempts=job.attempts or 0,
+        next_attempt_at=job.next_attempt_at,
+        llm_calls=job.llm_calls or 0,
+        llm_cached_calls=job.llm_cached_calls or 0,
+        llm_prompt_tokens=job.llm_prompt_tokens or 0,
+        llm_completion_tokens=job.llm_completion_tokens or 0,
+        scraped_items=[item_to_response(item) for item in scraped_items or []]
     )
 
-@app.get("/api/scraping/jobs", response_model=List[ScrapingJobResponse])
-async def get_user_jobs(
-    db: Session = Depends(get_db)
+def attempt_to_response(attempt: JobAttempt) -> JobAttemptResponse:
+    return JobAttemptResponse(
+        job_id=attempt.job_id,
+        attempt=attempt.attempt,
+        worker_id=attempt.worker_id,
+        started_at=attempt.started_at,
+        finished_at=attempt.finished_at,
+        outcome=attempt.outcome,
+        error_message=attempt.error_message
+    )
+
+# Scraping routes
+@app.post("/api/scraping/start", response_model=ScrapingJobResponse)
+async def start_scraping(
+    request: ScrapingRequest,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    jobs = db.query(ScrapingJob).order_by(ScrapingJob.created_at.desc()).all()
+    # The result cache and in-flight coalescing only see jobs run by this process
+    use_cache = request.use_cache and EMBEDDED_WORKER
     
-    result = []
-    for job in jobs:
-        scraped_items = [
-            ScrapedItemResponse(
-                id=item.id,
-                title=item.title,
-                description=item.description,
-                url=item.url,
-                price=item.price,
-                rating=item.rating,
-                date=item.date,
-                additional_data=json.loads(item.additional_data) if item.additional_data else {}
-            )
-            for item in job.scraped_items
-        ]
+    # Serve repeated queries from a recent completed job instead of running a new agent
+    source_job_id = result_cache.get(request.query, request.max_results) if use_cache else None
+    if source_job_id is not None:
+        job = ScrapingJob(
+            query=request.query,
+            max_results=request.max_results,
+            priority=request.priority,
+            status="completed",
+            source_job_id=source_job_id
+        )
+        db.add(job)
+        await db.flush()
+        job.results_count = await clone_job_items(db, source_job_id, job.id)
+        job.completed_at = datetime.utcnow()
+        await db.commit()
+        await db.refresh(job)
+        await manager.send_progress(job.id, "completed", 100,
+                                    f"Loaded {job.results_count} items from a recent identical search")
+        return job_to_response(job)
+
+    # Attach to an identical job that is already queued or running instead of starting another agent.
+    # The row stays "attached" (not running, no lease) until the leader hands over its results; if the
+    # leader finishes without doing so, the reaper queues the job to run on its own.
+    leader_id = scraper.inflight.leader_for(request.query, request.max_results) if use_cache else None
+    if leader_id is not None:
+        job = ScrapingJob(
+            query=request.query,
+            max_results=request.max_results,
+            priority=request.priority,
+            status="attached",
+            source_job_id=leader_id
+        )
+        db.add(job)
+        await db.commit()
+        await db.refresh(job)
+        if scraper.inflight.attach(leader_id, job.id):
+            return job_to_response(job)
+        
+        # The leader finished while this row was written, so run the job on its own
+        job.status = "pending"
+        job.source_job_id = None
+        job.queue_key = queue_key(job.priority)
+        await db.commit()
+    else:
+        if await queue_is_full():
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Scraping queue is full, please try again later")
         
-        result.append(ScrapingJobResponse(
-            id=job.id,
-            query=job.query,
-            status=job.status,
-            max_results=job.max_results,
-            created_at=job.created_at,
-            completed_at=job.completed_at,
-            results_count=job.results_count,
-            results_file=job.results_file,
-            error_message=job.error_message,
-            scraped_items=scraped_items
-        ))
+        # Create new scraping job
+        job = ScrapingJob(
+            query=request.query,
+            max_results=request.max_results,
+            priority=request.priority,
+            status="pending",
+            queue_key=queue_key(request.priority)
+        )
+        db.add(job)
+        await db.commit()
+        await db.refresh(job)
+    
+    # Queue the job; it stays pending in the database until a worker picks it up
+    if not EMBEDDED_WORKER:
+        return job_to_response(job)
+    try:
+        scheduler.submit(job.id, job.query, job.max_results, job.priority)
+        scraper.inflight.register(job.query, job.max_results, job.id)
+    except QueueFullError as e:
+        job.status = "failed"
+        job.error_message = str(e)
+        await db.commit()
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
     
-    return result
+    return job_to_response(job)
+
+@app.get("/api/scraping/jobs", response_model=List[ScrapingJobResponse])
+async def get_user_jobs(
+    limit: int = Query(50, ge=1, le=200),
+    after_id: Optional[int] = Query(None, description="Return jobs older than this job id (keyset cursor)"),
+    status_filter: Optional[str] = Query(None, alias="status", description="Filter by job status"),
+    q: Optional[str] = Query(None, description="Filter by a substring of the query"),
+    include_items: bool = Query(False, description="Include scraped items for each job"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Newest first; ids grow with creation time so they double as a stable cursor
+    stmt = select(ScrapingJob)
+    if after_id is not None:
+        stmt = stmt.where(ScrapingJob.id < after_id)
+    if status_filter:
+        stmt = stmt.where(ScrapingJob.status == status_filter)
+    if q:
+        stmt = stmt.where(ScrapingJob.query.ilike(f"%{q}%"))
+    if include_items:
+        # Load items for the whole page in one extra query instead of one per job
+        stmt = stmt.options(selectinload(ScrapingJob.scraped_items))
+
+    jobs = (await db.execute(stmt.order_by(ScrapingJob.id.desc()).limit(limit))).scalars().all()
+
+    return [
+        job_to_response(job, job.scraped_items if include_items else None)
+        for job in jobs
+    ]
 
 @app.get("/api/scraping/jobs/{job_id}", response_model=ScrapingJobResponse)
 async def get_job_details(
     job_id: int,
-    db: Session = Depends(get_db)
+    include_items: bool = Query(True, description="Include every scraped item; use /items to page through large jobs"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    job = db.query(ScrapingJob).filter(ScrapingJob.id == job_id).first()
+    options = [selectinload(ScrapingJob.scraped_items)] if include_items else []
+    job = await db.get(ScrapingJob, job_id, options=options)
     
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    scraped_items = [
-        ScrapedItemResponse(
-            id=item.id,
-            title=item.title,
-            description=item.description,
-            url=item.url,
-            price=item.price,
-            rating=item.rating,
-            date=item.date,
-            additional_data=json.loads(item.additional_data) if item.additional_data else {}
-        )
-        for item in job.scraped_items
-    ]
+    return job_to_response(job, job.scraped_items if include_items else None)
+
+@app.get("/api/scraping/jobs/{job_id}/items", response_model=ScrapedItemPage)
+async def get_job_items(
+    job_id: int,
+    sort: str = Query("id", description=f"One of: {', '.join(ITEM_SORTS)}"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(50, ge=1, le=500),
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    currency: Optional[str] = Query(None, description="ISO currency code, e.g. INR"),
+    min_rating: Optional[float] = None,
+    max_rating: Optional[float] = None,
+    domain: Optional[str] = Query(None, description="Source site, e.g. amazon.in"),
+    q: Optional[str] = Query(None, max_length=200, description="Full-text search over title and description"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    if sort not in ITEM_SORTS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(ITEM_SORTS)}")
+    if await db.get(ScrapingJob, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
     
-    return ScrapingJobResponse(
-        id=job.id,
-        query=job.query,
-        status=job.status,
-        max_results=job.max_results,
-        created_at=job.created_at,
-        completed_at=job.completed_at,
-        results_count=job.results_count,
-        results_file=job.results_file,
-        error_message=job.error_message,
-        scraped_items=scraped_items
+    try:
+        stmt = build_item_query(job_id, sort=sort, cursor=cursor, limit=limit,
+                                min_price=min_price, max_price=max_price, currency=currency,
+                                min_rating=min_rating, max_rating=max_rating, domain=domain,
+                                q=q, dialect=async_engine.dialect.name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    items = (await db.execute(stmt)).scalars().all()
+    next_cursor = cursor_for(items[limit - 1], sort) if len(items) > limit else None
+    
+    return ScrapedItemPage(
+        items=[item_to_response(item) for item in items[:limit]],
+        next_cursor=next_cursor
+    )
+
+@app.get("/api/scraping/jobs/{job_id}/stream")
+async def stream_job_items(
+    job_id: int,
+    after_id: int = Query(0, ge=0, description="Only send items stored after this item id"),
+    last_event_id: Optional[str] = Header(None)
+):
+    """Server-Sent Events with a job's items as they are stored, plus progress, until the job finishes"""
+    # Not a request-scoped session: that one would stay open for as long as the stream runs
+    async with AsyncSessionLocal() as db:
+        if await db.get(ScrapingJob, job_id) is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+    # Browsers reconnect with the id of the last event they received
+    if last_event_id and last_event_id.isdigit():
+        after_id = max(after_id, int(last_event_id))
+    
+    return StreamingResponse(
+        stream_job_events(job_id, after_id, manager),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 # Export endpoints for CSV and Excel
 @app.get("/api/scraping/jobs/{job_id}/export/csv")
-async def export_job_csv(job_id: int, db: Session = Depends(get_db)):
+async def export_job_csv(job_id: int, db: AsyncSession = Depends(get_async_db)):
     """Export scraping job results as CSV"""
-    import pandas as pd
-    from fastapi.responses import StreamingResponse
-    import io
-    
-    job = db.query(ScrapingJob).filter(ScrapingJob.id == job_id).first()
+    job = await db.get(ScrapingJob, job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    # Prepare data for CSV
-    data = []
-    for item in job.scraped_items:
-        additional_data = json.loads(item.additional_data) if item.additional_data else {}
-        row = {
-            'Title': item.title or '',
-            'Description': item.description or '',
-            'URL': item.url or '',
-            'Price': item.price or '',
-            'Rating': item.rating or '',
-            'Date': item.date or '',
-            **additional_data  # Include additional data as separate columns
-        }
-        data.append(row)
-    
-    if not data:
+    if not await job_has_items(db, job_id):
         raise HTTPException(status_code=404, detail="No data found for this job")
     
-    # Create DataFrame and CSV
-    df = pd.DataFrame(data)
-    csv_buffer = io.StringIO()
-    df.to_csv(csv_buffer, index=False, encoding='utf-8')
-    csv_content = csv_buffer.getvalue()
-    
-    # Create response
-    response = StreamingResponse(
-        io.StringIO(csv_content),
+    # Rows are read and encoded in batches while the response is being sent
+    return StreamingResponse(
+        stream_csv(job_id),
         media_type="text/csv",
-        headers={"Content-Disposition": f"attachment; filename=scraping_job_{job_id}_{job.query.replace(' ', '_')}.csv"}
+        headers={"Content-Disposition": f"attachment; filename={export_filename(job, 'csv')}"}
     )
-    return response
 
 @app.get("/api/scraping/jobs/{job_id}/export/excel")
-async def export_job_excel(job_id: int, db: Session = Depends(get_db)):
+async def export_job_excel(job_id: int, db: AsyncSession = Depends(get_async_db)):
     """Export scraping job results as Excel"""
-    import pandas as pd
-    from fastapi.responses import StreamingResponse
-    import io
-    
-    job = db.query(ScrapingJob).filter(ScrapingJob.id == job_id).first()
+    job = await db.get(ScrapingJob, job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    # Prepare data for Excel
-    data = []
-    for item in job.scraped_items:
-        additional_data = json.loads(item.additional_data) if item.additional_data else {}
-        row = {
-            'Title': item.title or '',
-            'Description': item.description or '',
-            'URL': item.url or '',
-            'Price': item.price or '',
-            'Rating': item.rating or '',
-            'Date': item.date or '',
-            **additional_data  # Include additional data as separate columns
-        }
-        data.append(row)
-    
-    if not data:
+    if not await job_has_items(db, job_id):
         raise HTTPException(status_code=404, detail="No data found for this job")
     
-    # Create DataFrame and Excel
-    df = pd.DataFrame(data)
-    excel_buffer = io.BytesIO()
-    with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name='Scraped Data', index=False)
-        
-        # Add job information as a second sheet
-        job_info = pd.DataFrame([{
-            'Job ID': job.id,
-            'Query': job.query,
-            'Status': job.status,
-            'Max Results': job.max_results,
-            'Created At': job.created_at,
-            'Completed At': job.completed_at,
-            'Results Count': job.results_count,
-            'Error Message': job.error_message or ''
-        }])
-        job_info.to_excel(writer, sheet_name='Job Info', index=False)
+    # The workbook is written in a worker thread; completed jobs reuse the cached file
+    path = await build_excel_export(job)
     
-    excel_buffer.seek(0)
+    background = None
+    if path == excel_cache_path(job):
+        if job.results_file != path:
+            if job.results_file and os.path.exists(job.results_file):
+                os.remove(job.results_file)
+            job.results_file = path
+            await db.commit()
+    else:
+        background = BackgroundTask(os.remove, path)
     
-    # Create response
-    response = StreamingResponse(
-        io.BytesIO(excel_buffer.read()),
+    return FileResponse(
+        path,
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=scraping_job_{job_id}_{job.query.replace(' ', '_')}.xlsx"}
+        filename=export_filename(job, 'xlsx'),
+        background=background
     )
-    return response
+
+def get_export_format(export_format: str):
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=404, detail=f"Unknown export format, expected one of: {', '.join(EXPORT_FORMATS)}")
+    if not EXPORT_FORMATS[export_format].available:
+        raise HTTPException(status_code=501, detail=f"{export_format} export requires pyarrow, which is not installed")
+    return EXPORT_FORMATS[export_format]
+
+# Registered after the CSV and Excel routes so those keep their own handlers
+@app.get("/api/scraping/jobs/{job_id}/export/{export_format}")
+async def export_job_typed(job_id: int, export_format: str, db: AsyncSession = Depends(get_async_db)):
+    """Export scraping job results as Parquet, Arrow IPC or gzip NDJSON with typed columns"""
+    fmt = get_export_format(export_format)
+    job = await db.get(ScrapingJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    if not await job_has_items(db, job_id):
+        raise HTTPException(status_code=404, detail="No data found for this job")
+    
+    # Written one row group at a time while the response is being sent
+    return StreamingResponse(
+        stream_job_export(job_id, fmt),
+        media_type=fmt.media_type,
+        headers={"Content-Disposition": f"attachment; filename={export_filename(job, fmt.extension)}"}
+    )
+
+@app.get("/api/scraping/export")
+async def export_jobs_archive(
+    job_ids: List[int] = Query(..., description="Jobs to include; repeat the parameter for each job"),
+    export_format: str = Query("parquet", alias="format",
+                               description="File format inside the archive: parquet, arrow or ndjson"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Export several jobs as one streamed zip archive with a file per job and a jobs.json manifest"""
+    fmt = get_export_format(export_format)
+    job_ids = list(dict.fromkeys(job_ids))
+    if len(job_ids) > EXPORT_ARCHIVE_MAX_JOBS:
+        raise HTTPException(status_code=400, detail=f"At most {EXPORT_ARCHIVE_MAX_JOBS} jobs per export")
+    
+    jobs = {job.id: job for job in (await db.execute(select(ScrapingJob).where(ScrapingJob.id.in_(job_ids)))).scalars()}
+    missing = [job_id for job_id in job_ids if job_id not in jobs]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Jobs not found: {', '.join(map(str, missing))}")
+    
+    return StreamingResponse(
+        stream_archive_export([jobs[job_id] for job_id in job_ids], fmt),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename=scraping_jobs_{fmt.name}.zip"}
+    )
+
+@app.get("/api/scraping/queue", response_model=SchedulerStats)
+async def get_queue_stats():
+    if not EMBEDDED_WORKER:
+        return SchedulerStats(
+            mode="external",
+            max_concurrent=0,
+            running=await count_jobs("running"),
+            queued=await count_jobs("pending"),
+            max_queued=MAX_QUEUED_JOBS,
+            accepting=True
+        )
+    return SchedulerStats(**scheduler.stats(), **scraper.inflight.stats())
+
+@app.get("/api/scraping/jobs/{job_id}/profile", response_model=JobProfileResponse)
+async def get_job_profile(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Stage timeline of the job's latest attempt (recorded when JOB_PROFILING is on)"""
+    job = await db.get(ScrapingJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not job.profile:
+        raise HTTPException(status_code=404, detail="No profile was recorded for this job")
+    return JobProfileResponse(**job.profile)
+
+@app.get("/api/scraping/jobs/{job_id}/attempts", response_model=List[JobAttemptResponse])
+async def get_job_attempts(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    if await db.get(ScrapingJob, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    attempts = (await db.execute(
+        select(JobAttempt).where(JobAttempt.job_id == job_id).order_by(JobAttempt.attempt, JobAttempt.id)
+    )).scalars().all()
+    return [attempt_to_response(attempt) for attempt in attempts]
+
+@app.get("/api/scraping/recovery", response_model=RecoveryReport)
+async def get_recovery_report(
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Jobs that lost their worker, jobs waiting to be retried or attached to another job, and recent lease recoveries"""
+    now = datetime.utcnow()
+    stuck = (await db.execute(
+        select(ScrapingJob)
+        .where(ScrapingJob.status == "running", ScrapingJob.lease_expires_at < now)
+        .order_by(ScrapingJob.lease_expires_at).limit(limit)
+    )).scalars().all()
+    retrying = (await db.execute(
+        select(ScrapingJob)
+        .where(ScrapingJob.status == "pending", ScrapingJob.next_attempt_at.is_not(None))
+        .order_by(ScrapingJob.next_attempt_at).limit(limit)
+    )).scalars().all()
+    attached = (await db.execute(
+        select(ScrapingJob)
+        .where(ScrapingJob.status == "attached")
+        .order_by(ScrapingJob.created_at).limit(limit)
+    )).scalars().all()
+    recoveries = (await db.execute(
+        select(JobAttempt)
+        .where(JobAttempt.outcome == "lease_expired")
+        .order_by(JobAttempt.finished_at.desc()).limit(limit)
+    )).scalars().all()
+    
+    return RecoveryReport(
+        max_attempts=JOB_MAX_ATTEMPTS,
+        lease_seconds=JOB_LEASE_SECONDS,
+        stuck_jobs=[job_to_response(job) for job in stuck],
+        retrying_jobs=[job_to_response(job) for job in retrying],
+        attached_jobs=[job_to_response(job) for job in attached],
+        recent_recoveries=[attempt_to_response(attempt) for attempt in recoveries]
+    )
+
+@app.post("/api/scraping/recovery/reap", response_model=ReapResult)
+async def reap_stuck_jobs():
+    """Recover jobs with expired leases now instead of waiting for the next heartbeat"""
+    if EMBEDDED_WORKER:
+        return ReapResult(**await scheduler.reap())
+    requeued, failed = await reap_expired_leases()
+    return ReapResult(requeued=[job.id for job in requeued], failed=[job.id for job in failed])
+
+@app.get("/api/scraping/browser-pool", response_model=BrowserPoolStats)
+async def get_browser_pool_stats():
+    return BrowserPoolStats(**browser_pool.stats())
+
+@app.get("/api/llm/stats", response_model=LLMStats)
+async def get_llm_stats():
+    if scraper is None:
+        raise HTTPException(status_code=404, detail="LLM calls are made by the standalone scraping workers")
+    return LLMStats(**scraper.gateway.stats())
+
+@app.get("/api/cache/stats", response_model=CacheStats)
+async def get_cache_stats():
+    return CacheStats(**result_cache.stats())
+
+@app.get("/metrics")
+async def get_metrics():
+    """Metrics of this process in the Prometheus text format"""
+    if not EMBEDDED_WORKER:
+        # Standalone workers run the jobs, so the queue is read from the database
+        JOBS_RUNNING.set(await count_jobs("running"))
+        JOBS_QUEUED.set(await count_jobs("pending"))
+    return Response(REGISTRY.render(), headers={"Content-Type": CONTENT_TYPE})
 
 # WebSocket endpoint for real-time updates
 @app.websocket("/ws")
@@ -276,7 +520,8 @@ async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
     try:
         while True:
-            await websocket.receive_text()
+            # Clients send subscribe/unsubscribe messages for the jobs they watch
+            await manager.handle_message(websocket, await websocket.receive_text())
     except WebSocketDisconnect:
         manager.disconnect(websocket)
 
@@ -0,0 +1,344 @@
+"""Prometheus-style metrics for the API and the scraping workers.
+
+A small in-process registry (counters, gauges and histograms with labels)
+rendered in the Prometheus text exposition format by ``/metrics``, so no
+client library is needed. Each process keeps its own registry; standalone
+workers can serve theirs on ``WORKER_METRICS_PORT``.
+"""
+import asyncio
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Record a per-stage timeline for every job and store it with the job (see JobProfile)
+JOB_PROFILING = os.getenv("JOB_PROFILING", "false").lower() == "true"
+# Spans kept per job profile; further spans only count towards the stage totals
+PROFILE_MAX_SPANS = int(os.getenv("PROFILE_MAX_SPANS", "500"))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGE_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+JOB_BUCKETS = (5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1200.0, 1800.0, 3600.0)
+RATE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 50.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    """A named metric with one child per combination of label values"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            # Exposed (as zero) before the first update
+            self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        key = tuple(str(value) for value in values)
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}")
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _samples(self, key: Tuple[str, ...], child) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(self._samples(key, child))
+        return lines
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+
+    def set(self, value: float):
+        self.value = float(value)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    def _samples(self, key, child) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def dec(self, amount: float = 1):
+        self.labels().dec(amount)
+
+
+class _HistogramValue:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[index] += 1
+                    break
+            self.sum += value
+            self.count += 1
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _samples(self, key, child) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, child.counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+        lines.append(f"{self.name}_bucket{labels} {child.count}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        # Called before rendering so gauges of state owned elsewhere are current
+        self._collectors: List[Callable[[], None]] = []
+
+    def _register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], None]):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "scraper_stage_seconds", "Time spent in each stage of a scraping job", ["stage"], STAGE_BUCKETS)
+JOB_SECONDS = REGISTRY.histogram(
+    "scraper_job_duration_seconds", "Run time of scraping job attempts, by outcome", ["outcome"], JOB_BUCKETS)
+JOB_ITEMS_PER_SECOND = REGISTRY.histogram(
+    "scraper_job_items_per_second", "Items stored per second of run time by completed jobs", buckets=RATE_BUCKETS)
+JOBS_TOTAL = REGISTRY.counter("scraper_jobs_total", "Scraping job attempts finished, by outcome", ["outcome"])
+ITEMS_TOTAL = REGISTRY.counter("scraper_items_stored_total", "Items stored by scraping jobs")
+JOBS_RUNNING = REGISTRY.gauge("scraper_jobs_running", "Scraping jobs running")
+JOBS_QUEUED = REGISTRY.gauge("scraper_jobs_queued", "Scraping jobs waiting to run")
+WEBSOCKETS_OPEN = REGISTRY.gauge("websocket_connections", "Open WebSocket connections")
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency until the response is fully sent",
+    ["method", "route", "status"])
+HTTP_REQUESTS_IN_PROGRESS = REGISTRY.gauge("http_requests_in_progress", "HTTP requests being handled")
+
+
+class JobProfile:
+    """Timeline of one run of a job: each timed stage with its offset from the start and duration.
+
+    Stored with the job (``ScrapingJob.profile``) when JOB_PROFILING is on, so
+    slow jobs can be looked at after the fact.
+    """
+
+    def __init__(self, job_id: int, attempt: Optional[int] = None, max_spans: int = PROFILE_MAX_SPANS):
+        self.job_id = job_id
+        self.attempt = attempt
+        self.max_spans = max_spans
+        self.started_at = datetime.utcnow()
+        self._started = time.perf_counter()
+        self.spans: List[dict] = []
+        self.dropped_spans = 0
+        self.totals: Dict[str, List[float]] = {}  # stage -> [count, seconds]
+
+    def add(self, stage: str, started: float, seconds: float, **attrs):
+        total = self.totals.setdefault(stage, [0, 0.0])
+        total[0] += 1
+        total[1] += seconds
+        if len(self.spans) >= self.max_spans:
+            self.dropped_spans += 1
+            return
+        span = {"stage": stage, "start": round(started - self._started, 4), "seconds": round(seconds, 4)}
+        span.update(attrs)
+        self.spans.append(span)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "attempt": self.attempt,
+            "started_at": self.started_at.isoformat(),
+            "total_seconds": round(time.perf_counter() - self._started, 4),
+            "stages": {stage: {"count": count, "seconds": round(seconds, 4)}
+                       for stage, (count, seconds) in self.totals.items()},
+            "spans": self.spans,
+            "dropped_spans": self.dropped_spans,
+        }
+
+
+def observe_stage(stage: str, seconds: float, profile: Optional[JobProfile] = None,
+                  started: Optional[float] = None, **attrs):
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    if profile is not None:
+        profile.add(stage, started if started is not None else time.perf_counter() - seconds, seconds, **attrs)
+
+
+@contextmanager
+def timed(stage: str, profile: Optional[JobProfile] = None, **attrs):
+    """Time the enclosed block as ``stage`` (also when it raises), adding a span to ``profile`` if given"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started, profile, started, **attrs)
+
+
+def observe_job(outcome: str, seconds: float, items: int = 0):
+    JOBS_TOTAL.labels(outcome).inc()
+    JOB_SECONDS.labels(outcome).observe(seconds)
+    if outcome == "completed" and seconds > 0:
+        JOB_ITEMS_PER_SECOND.observe(items / seconds)
+
+
+def route_label(scope: dict) -> str:
+    """The route template (``/api/scraping/jobs/{job_id}``), so ids do not each get their own series"""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording the latency of every HTTP request by method, route and status"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_PROGRESS.dec()
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route_label(scope), status_code).observe(
+                time.perf_counter() - started
+            )
+
+
+async def serve_metrics(port: int, host: str = "0.0.0.0") -> asyncio.AbstractServer:
+    """Serve the registry over plain HTTP (any path) for processes without a web app, e.g. workers"""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            # Request line and headers; the request itself does not matter
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            body = REGISTRY.render().encode("utf-8")
+            writer.write(
+                f"HTTP/1.1 200 OK\r\nContent-Type: {CONTENT_TYPE}\r\nContent-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n".encode("ascii") + body
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
@@ -1,10 +1,12 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
 class ScrapingRequest(BaseModel):
     query: str
     max_results: int = 15
+    priority: int = Field(default=0, ge=0, le=10)
+    use_cache: bool = True
 
 class ScrapedItemResponse(BaseModel):
     id: int
@@ -15,21 +17,121 @@ class ScrapedItemResponse(BaseModel):
     rating: Optional[str]
     date: Optional[str]
     additional_data: Dict[str, Any] = {}
+    price_amount: Optional[float] = None
+    price_currency: Optional[str] = None
+    rating_value: Optional[float] = None
+    rating_scale: Optional[float] = None
+    source_domain: Optional[str] = None
+
+class ScrapedItemPage(BaseModel):
+    items: List[ScrapedItemResponse]
+    next_cursor: Optional[str] = None
 
 class ScrapingJobResponse(BaseModel):
     id: int
     query: str
     status: str
     max_results: int
+    priority: int = 0
     created_at: datetime
     completed_at: Optional[datetime]
     results_count: int
     results_file: Optional[str]
     error_message: Optional[str]
+    source_job_id: Optional[int] = None
+    attempts: int = 0
+    next_attempt_at: Optional[datetime] = None
+    llm_calls: int = 0
+    llm_cached_calls: int = 0
+    llm_prompt_tokens: int = 0
+    llm_completion_tokens: int = 0
     scraped_items: List[ScrapedItemResponse] = []
 
+class JobAttemptResponse(BaseModel):
+    job_id: int
+    attempt: int
+    worker_id: Optional[str]
+    started_at: datetime
+    finished_at: Optional[datetime]
+    outcome: Optional[str]
+    error_message: Optional[str]
+
+class StageTotal(BaseModel):
+    count: int
+    seconds: float
+
+class JobProfileResponse(BaseModel):
+    job_id: int
+    attempt: Optional[int] = None
+    started_at: datetime
+    total_seconds: float
+    stages: Dict[str, StageTotal]
+    spans: List[Dict[str, Any]]  # stage, start (seconds from started_at), seconds, plus stage details
+    dropped_spans: int = 0
+
 class ScrapingProgress(BaseModel):
     job_id: int
     status: str
     progress: int
-    message: str
\ No newline at end of file
+    message: str
+
+class SchedulerStats(BaseModel):
+    mode: str = "embedded"  # "external" when standalone workers run the jobs
+    max_concurrent: int
+    running: int
+    queued: int
+    max_queued: int
+    accepting: bool
+    leaders: int = 0
+    followers: int = 0
+    retry_waiting: int = 0
+    retried_total: int = 0
+    reaped_total: int = 0
+
+class RecoveryReport(BaseModel):
+    max_attempts: int
+    lease_seconds: float
+    stuck_jobs: List[ScrapingJobResponse]  # running, but the lease has expired
+    retrying_jobs: List[ScrapingJobResponse]  # waiting out a retry backoff
+    attached_jobs: List[ScrapingJobResponse] = []  # waiting for an identical job to hand over its results
+    recent_recoveries: List[JobAttemptResponse]  # attempts that ended with an expired lease
+
+class ReapResult(BaseModel):
+    requeued: List[int]
+    failed: List[int]
+
+class CacheStats(BaseModel):
+    entries: int
+    max_entries: int
+    ttl_seconds: float
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    hit_ratio: float
+
+class LLMStats(BaseModel):
+    model: str
+    max_concurrency: int
+    in_flight: int
+    requests_per_minute: float
+    tokens_per_minute: float
+    calls_total: int
+    retries_total: int
+    prompt_tokens_total: int
+    completion_tokens_total: int
+    rate_limit_wait_seconds: float
+    cache_enabled: bool
+    cache_hits: int
+    cache_misses: int
+
+class BrowserPoolStats(BaseModel):
+    size: int
+    open: int
+    idle: int
+    in_use: int
+    utilisation: float
+    created_total: int
+    recycled_total: int
+    acquired_total: int
+    avg_wait_seconds: float
\ No newline at end of file
@@ -0,0 +1,108 @@
+import re
+from typing import Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+CURRENCY_SYMBOLS = {
+    '₹': 'INR',
+    'rs': 'INR',
+    'inr': 'INR',
+    '$': 'USD',
+    'usd': 'USD',
+    'us$': 'USD',
+    '€': 'EUR',
+    'eur': 'EUR',
+    '£': 'GBP',
+    'gbp': 'GBP',
+    '¥': 'JPY',
+    'jpy': 'JPY',
+    'cad': 'CAD',
+    'aud': 'AUD',
+}
+
+_NUMBER_RE = re.compile(r"\d[\d,]*(?:\.\d+)?")
+_CURRENCY_RE = re.compile(r"us\$|[₹$€£¥]|\b(?:rs|inr|usd|eur|gbp|jpy|cad|aud)\b\.?", re.I)
+_RATING_SCALE_RE = re.compile(r"(\d+(?:\.\d+)?)\s*(?:/|out of|of)\s*(\d+(?:\.\d+)?)", re.I)
+_PERCENT_RE = re.compile(r"(\d+(?:\.\d+)?)\s*%")
+# Query parameters that only track where a click came from
+_TRACKING_PARAM_RE = re.compile(r"^(?:utm_.*|gclid|fbclid|msclkid|ref|ref_|tag|srsltid|_encoding|psc)$", re.I)
+
+
+def _to_float(number: str) -> Optional[float]:
+    try:
+        return float(number.replace(',', ''))
+    except ValueError:
+        return None
+
+
+def parse_price(text: Optional[str]) -> Tuple[Optional[float], Optional[str]]:
+    """'₹1,34,900' -> (134900.0, 'INR'); '$10 - $20' -> (10.0, 'USD'); '$$$' -> (None, None)"""
+    if not text:
+        return None, None
+    number = _NUMBER_RE.search(text)
+    if not number:
+        return None, None
+    currency = _CURRENCY_RE.search(text)
+    code = CURRENCY_SYMBOLS.get(currency.group(0).lower().rstrip('.')) if currency else None
+    return _to_float(number.group(0)), code
+
+
+def parse_rating(text: Optional[str]) -> Tuple[Optional[float], Optional[float]]:
+    """'4.5/5' -> (4.5, 5.0); '4.3 out of 5 stars' -> (4.3, 5.0); '87%' -> (87.0, 100.0)"""
+    if not text:
+        return None, None
+    scaled = _RATING_SCALE_RE.search(text)
+    if scaled:
+        return _to_float(scaled.group(1)), _to_float(scaled.group(2))
+    percent = _PERCENT_RE.search(text)
+    if percent:
+        return _to_float(percent.group(1)), 100.0
+    number = _NUMBER_RE.search(text)
+    if not number:
+        return None, None
+    value = _to_float(number.group(0))
+    if value is None:
+        return None, None
+    # Bare numbers: assume the smallest common scale they fit
+    scale = 5.0 if value <= 5 else 10.0 if value <= 10 else 100.0
+    return value, scale
+
+
+def source_domain(url: Optional[str]) -> Optional[str]:
+    """'https://www.amazon.in/dp/X' -> 'amazon.in'"""
+    if not url:
+        return None
+    try:
+        host = urlsplit(url if '://' in url else f'http://{url}').hostname
+    except ValueError:
+        return None
+    if not host:
+        return None
+    return host[4:] if host.startswith('www.') else host
+
+
+def canonical_url(url: Optional[str]) -> Optional[str]:
+    """'HTTP://www.Shop.com/p/1/?utm_source=x&b=2&a=1#reviews' -> 'https://shop.com/p/1?a=1&b=2'
+
+    Scheme, ``www.``, fragments, trailing slashes, tracking parameters and
+    parameter order are ignored, so links to the same page compare equal.
+    """
+    if not url:
+        return None
+    try:
+        parts = urlsplit(url.strip() if '://' in url else f'http://{url.strip()}')
+        host = parts.hostname
+    except ValueError:
+        return None
+    if not host:
+        return None
+    host = host[4:] if host.startswith('www.') else host
+    try:
+        port = parts.port
+    except ValueError:
+        # Non-numeric or out-of-range port: compare on the rest of the URL
+        port = None
+    if port and port not in (80, 443):
+        host = f'{host}:{port}'
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if not _TRACKING_PARAM_RE.match(k))
+    return urlunsplit(('https', host, parts.path.rstrip('/'), urlencode(query), ''))
@@ -0,0 +1,157 @@
+import os
+from typing import Awaitable, Callable, Iterable, List, Optional
+
+from sqlalchemy import func, insert, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from content_store import IngestDeduplicator, content_row, store_contents
+from database import AsyncSessionLocal, ScrapingJob, ScrapedItem, async_engine
+from metrics import ITEMS_TOTAL, JobProfile, timed
+from normalization import parse_price, parse_rating, source_domain
+
+ITEM_BATCH_SIZE = int(os.getenv("ITEM_BATCH_SIZE", "500"))
+
+# Item fields sent to clients in streamed deltas
+ITEM_DELTA_FIELDS = ['id', 'title', 'description', 'url', 'price', 'rating', 'date',
+                     'price_amount', 'price_currency', 'rating_value', 'source_domain']
+
+# Called with (job_id, deltas, previous_item_id) after each batch is committed
+ItemsCallback = Callable[[int, List[dict], Optional[int]], Awaitable[None]]
+
+
+def item_row(job_id: int, item_data: dict) -> dict:
+    """Map a parsed item dict onto stored item values, including the typed ones"""
+    price_amount, price_currency = parse_price(item_data.get('price'))
+    rating_value, rating_scale = parse_rating(item_data.get('rating'))
+    return {
+        'job_id': job_id,
+        'title': item_data.get('title'),
+        'description': item_data.get('description'),
+        'url': item_data.get('url'),
+        'price': item_data.get('price'),
+        'rating': item_data.get('rating'),
+        'date': item_data.get('date'),
+        'additional_data': item_data.get('additional_data', {}),
+        'price_amount': price_amount,
+        'price_currency': price_currency,
+        'rating_value': rating_value,
+        'rating_scale': rating_scale,
+        'source_domain': source_domain(item_data.get('url')),
+    }
+
+
+def item_delta(item) -> dict:
+    """Compact form of a stored item (a row dict with its id, or a ScrapedItem): empty fields are left out"""
+    get = item.get if isinstance(item, dict) else lambda name: getattr(item, name, None)
+    return {name: get(name) for name in ITEM_DELTA_FIELDS if get(name) not in (None, '')}
+
+
+class ItemWriter:
+    """Buffers scraped items for a job and persists them in batches.
+
+    Duplicates within the job are dropped as items are added (see
+    IngestDeduplicator), and items that cannot be normalized are skipped and
+    counted in ``invalid``. Each batch looks up its items in the content store,
+    inserts only the ones never seen by any job, then links all of them to
+    the job with one executemany ``INSERT`` and bumps ``results_count``, in a
+    single short transaction. Items written before a crash are therefore
+    kept and the job's count always matches what is stored.
+
+    With ``on_flush`` set, each committed batch is also handed over as
+    compact deltas carrying the new item ids, together with the id of the
+    last item of the previous batch (None for the first batch of a run), so
+    clients can tell whether they missed a batch.
+    """
+
+    def __init__(self, job_id: int, batch_size: int = ITEM_BATCH_SIZE, on_flush: Optional[ItemsCallback] = None,
+                 profile: Optional[JobProfile] = None):
+        self.job_id = job_id
+        self.batch_size = batch_size
+        self.on_flush = on_flush
+        self.profile = profile
+        self.written = 0
+        self.invalid = 0
+        self.last_item_id: Optional[int] = None
+        self.dedupe = IngestDeduplicator()
+        self._pending: List[dict] = []
+
+    @property
+    def duplicates(self) -> int:
+        return self.dedupe.duplicates
+
+    async def add(self, item_data: dict) -> bool:
+        """Queue an item; False if the job already has it or it cannot be stored"""
+        try:
+            content = content_row(item_row(self.job_id, item_data))
+        except Exception as e:
+            # One malformed item must not cost the job the items around it
+            self.invalid += 1
+            print(f"Job {self.job_id}: skipped an item that could not be normalized ({e}): {item_data!r:.200}")
+            return False
+        if self.dedupe.is_duplicate(content):
+            return False
+        self._pending.append(content)
+        if len(self._pending) >= self.batch_size:
+            await self.flush()
+        return True
+
+    async def add_many(self, items: Iterable[dict]):
+        for item_data in items:
+            await self.add(item_data)
+
+    async def flush(self):
+        if not self._pending:
+            return
+        contents, self._pending = self._pending, []
+
+        with timed("db_write", self.profile, items=len(contents)):
+            async with AsyncSessionLocal() as db:
+                content_ids = await store_contents(db, contents)
+                rows = [{'job_id': self.job_id, 'content_id': content_id} for content_id in content_ids]
+                if self.on_flush is None:
+                    await db.execute(insert(ScrapedItem), rows)
+                else:
+                    await self._insert_with_ids(db, rows)
+                await db.execute(
+                    update(ScrapingJob)
+                    .where(ScrapingJob.id == self.job_id)
+                    .values(results_count=func.coalesce(ScrapingJob.results_count, 0) + len(rows))
+                )
+                await db.commit()
+        self.written += len(rows)
+        ITEMS_TOTAL.inc(len(rows))
+
+        if self.on_flush is not None:
+            previous_item_id, self.last_item_id = self.last_item_id, rows[-1]['id']
+            deltas = [item_delta({**content, 'id': row['id']}) for content, row in zip(contents, rows)]
+            await self.on_flush(self.job_id, deltas, previous_item_id)
+
+    async def _insert_with_ids(self, db: AsyncSession, rows: List[dict]):
+        """Insert ``rows`` and set each one's ``id``"""
+        if async_engine.dialect.insert_executemany_returning_sort_by_parameter_order:
+            ids = (await db.execute(
+                insert(ScrapedItem).returning(ScrapedItem.id, sort_by_parameter_order=True), rows
+            )).scalars().all()
+        else:
+            # No RETURNING for multi-row inserts: this writer is the job's only one, so its
+            # newest ids are the rows just inserted
+            await db.execute(insert(ScrapedItem), rows)
+            ids = sorted((await db.execute(
+                select(ScrapedItem.id).where(ScrapedItem.job_id == self.job_id)
+                .order_by(ScrapedItem.id.desc()).limit(len(rows))
+            )).scalars().all())
+        for row, item_id in zip(rows, ids):
+            row['id'] = item_id
+
+
+async def clone_job_items(db: AsyncSession, source_job_id: int, target_job_id: int) -> int:
+    """Link every item of ``source_job_id`` to ``target_job_id`` too, with a single INSERT ... SELECT"""
+    result = await db.execute(
+        insert(ScrapedItem).from_select(
+            ['job_id', 'content_id'],
+            select(literal(target_job_id), ScrapedItem.content_id)
+            .where(ScrapedItem.job_id == source_job_id)
+            .order_by(ScrapedItem.id)
+        )
+    )
+    return result.rowcount
@@ -0,0 +1,238 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Callable, List, Optional
+
+# memory:// (single process), sqlite:///path/to/progress.db (processes on one host)
+# or redis://host:6379/0 (any number of hosts; needs the redis package)
+PROGRESS_BROKER_URL = os.getenv("PROGRESS_BROKER_URL", "memory://")
+PROGRESS_POLL_SECONDS = float(os.getenv("PROGRESS_POLL_SECONDS", "0.25"))
+# Events older than this are pruned from the SQLite broker
+PROGRESS_RETENTION_SECONDS = float(os.getenv("PROGRESS_RETENTION_SECONDS", "300"))
+REDIS_CHANNEL = "scraper:progress"
+
+# Called with (job_id, payload) for every published event
+ProgressHandler = Callable[[int, dict], None]
+
+
+def progress_payload(job_id: int, status: str, progress: int, message: str) -> dict:
+    return {
+        "type": "progress",
+        "job_id": job_id,
+        "status": status,
+        "progress": progress,
+        "message": message,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def items_payload(job_id: int, items: List[dict], previous_item_id: Optional[int]) -> dict:
+    """Delta of items just stored for a job; ``previous_item_id`` is None when a run starts over"""
+    return {
+        "type": "items",
+        "job_id": job_id,
+        "items": items,
+        "previous_item_id": previous_item_id,
+        "last_item_id": items[-1]["id"] if items else previous_item_id,
+    }
+
+
+class ProgressBroker:
+    """Carries job events from the process running a job to the API processes relaying them.
+
+    Scraping workers call :meth:`publish` (or :meth:`send_progress`); every
+    process that called :meth:`start` receives each event through its handlers.
+    """
+
+    def __init__(self):
+        self._handlers: List[ProgressHandler] = []
+
+    @property
+    def distributed(self) -> bool:
+        """Whether events published here reach other processes"""
+        return True
+
+    def add_handler(self, handler: ProgressHandler):
+        self._handlers.append(handler)
+
+    def _dispatch(self, job_id: int, payload: dict):
+        for handler in self._handlers:
+            try:
+                handler(job_id, payload)
+            except Exception as e:
+                print(f"Progress handler failed for job {job_id}: {e}")
+
+    async def start(self):
+        """Begin receiving events published by other processes"""
+
+    async def publish(self, job_id: int, payload: dict):
+        raise NotImplementedError
+
+    async def send_progress(self, job_id: int, status: str, progress: int, message: str):
+        await self.publish(job_id, progress_payload(job_id, status, progress, message))
+
+    async def send_items(self, job_id: int, items: List[dict], previous_item_id: Optional[int] = None):
+        await self.publish(job_id, items_payload(job_id, items, previous_item_id))
+
+    async def close(self):
+        pass
+
+
+class InMemoryBroker(ProgressBroker):
+    """Delivers events straight to this process's handlers"""
+
+    @property
+    def distributed(self) -> bool:
+        return False
+
+    async def publish(self, job_id: int, payload: dict):
+        self._dispatch(job_id, payload)
+
+
+class SQLiteBroker(ProgressBroker):
+    """Shares events through an append-only table in a SQLite file.
+
+    Every subscriber polls for rows newer than the last one it has seen, so
+    processes on one host (or tests) get a shared broker without a server.
+    """
+
+    def __init__(self, path: str, poll_interval: float = PROGRESS_POLL_SECONDS,
+                 retention: float = PROGRESS_RETENTION_SECONDS):
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._listener: Optional[asyncio.Task] = None
+        self._last_prune = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS progress_events ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, job_id INTEGER, payload TEXT, created_at REAL)"
+            )
+            self._connection = connection
+        return self._connection
+
+    def _insert(self, job_id: int, encoded: str):
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT INTO progress_events (job_id, payload, created_at) VALUES (?, ?, ?)",
+                (job_id, encoded, now)
+            )
+            if now - self._last_prune > self.retention / 10:
+                self._last_prune = now
+                connection.execute("DELETE FROM progress_events WHERE created_at < ?", (now - self.retention,))
+
+    def _fetch_after(self, last_id: int) -> list:
+        with self._lock:
+            return self._connect().execute(
+                "SELECT id, job_id, payload FROM progress_events WHERE id > ? ORDER BY id LIMIT 1000",
+                (last_id,)
+            ).fetchall()
+
+    def _latest_id(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT coalesce(max(id), 0) FROM progress_events").fetchone()[0]
+
+    async def start(self):
+        if self._listener is None:
+            # Only events published from now on are relayed
+            last_id = await asyncio.to_thread(self._latest_id)
+            self._listener = asyncio.create_task(self._listen(last_id))
+
+    async def _listen(self, last_id: int):
+        while True:
+            try:
+                rows = await asyncio.to_thread(self._fetch_after, last_id)
+            except sqlite3.Error as e:
+                print(f"Progress broker poll failed: {e}")
+                rows = []
+            for row_id, job_id, encoded in rows:
+                last_id = row_id
+                self._dispatch(job_id, json.loads(encoded))
+            if len(rows) < 1000:
+                await asyncio.sleep(self.poll_interval)
+
+    async def publish(self, job_id: int, payload: dict):
+        await asyncio.to_thread(self._insert, job_id, json.dumps(payload))
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+class RedisBroker(ProgressBroker):
+    """Shares events over Redis pub/sub (any Redis-compatible server)"""
+
+    def __init__(self, url: str, channel: str = REDIS_CHANNEL):
+        super().__init__()
+        self.url = url
+        self.channel = channel
+        self._redis = None
+        self._listener: Optional[asyncio.Task] = None
+
+    def _client(self):
+        if self._redis is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError as e:
+                raise RuntimeError("PROGRESS_BROKER_URL uses redis:// but the redis package is not installed") from e
+            self._redis = redis.from_url(self.url)
+        return self._redis
+
+    async def start(self):
+        if self._listener is None:
+            pubsub = self._client().pubsub()
+            await pubsub.subscribe(self.channel)
+            self._listener = asyncio.create_task(self._listen(pubsub))
+
+    async def _listen(self, pubsub):
+        try:
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                event = json.loads(message["data"])
+                self._dispatch(event["job_id"], event["payload"])
+        finally:
+            await pubsub.close()
+
+    async def publish(self, job_id: int, payload: dict):
+        await self._client().publish(self.channel, json.dumps({"job_id": job_id, "payload": payload}))
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+
+def create_broker(url: str = PROGRESS_BROKER_URL) -> ProgressBroker:
+    scheme, _, rest = url.partition("://")
+    if scheme == "memory":
+        return InMemoryBroker()
+    if scheme == "sqlite":
+        # sqlite:///relative.db and sqlite:////absolute/path.db, as in DATABASE_URL
+        return SQLiteBroker(rest[1:] if rest.startswith("/") else rest)
+    if scheme in ("redis", "rediss"):
+        return RedisBroker(url)
+    raise ValueError(f"Unsupported PROGRESS_BROKER_URL: {url}")
@@ -0,0 +1,272 @@
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# Canonical item fields and the labels agents commonly use for them
+FIELD_ALIASES = {
+    'title': ('title', 'name', 'product', 'product name', 'title product name', 'product title',
+              'item', 'item name', 'headline'),
+    'description': ('description', 'details', 'key details', 'description or key details',
+                    'summary', 'features', 'specs', 'overview'),
+    'url': ('url', 'link', 'website', 'website url', 'source url', 'product url', 'href', 'page'),
+    'price': ('price', 'cost', 'amount', 'price inr', 'price usd', 'mrp'),
+    'rating': ('rating', 'ratings', 'stars', 'score', 'review score', 'customer rating'),
+    'date': ('date', 'published', 'published date', 'release date', 'updated', 'posted'),
+}
+FIELD_BY_ALIAS = {alias: field for field, aliases in FIELD_ALIASES.items() for alias in aliases}
+
+# JSON containers agents wrap their item lists in
+LIST_KEYS = ('items', 'results', 'products', 'data', 'listings', 'entries')
+
+_FENCE_RE = re.compile(r"```(?:json|JSON)?\s*\n(.*?)```", re.S)
+_PARENTHETICAL_RE = re.compile(r"\([^)]*\)")
+_LABEL_CLEAN_RE = re.compile(r"[^a-z0-9]+")
+_MARKDOWN_LINK_RE = re.compile(r"\[([^\]]*)\]\((https?://[^)\s]+)\)")
+_URL_RE = re.compile(r"https?://[^\s)\]>\"'|,]+")
+_LIST_ITEM_RE = re.compile(r"^\s*(?:\d+[.)]|[-*•])\s+(.*)$")
+_KEY_VALUE_RE = re.compile(r"^\s*(?:[-*•]\s+)?\**([A-Za-z][A-Za-z0-9 /()_'-]{0,40}?)\**\s*[:：](?!//)\s*\**\s*(.*)$")
+_TABLE_SEPARATOR_RE = re.compile(r"^\|?\s*:?-{2,}:?\s*(\|\s*:?-{2,}:?\s*)*\|?\s*$")
+_EMPHASIS_RE = re.compile(r"^[*_`\s]+|[*_`\s]+$")
+# '**Name** - rest' and 'Name - rest' list heads
+_BOLD_HEAD_RE = re.compile(r"^\*\*(.+?)\*\*\s*(?:[-–—:|]\s*)?(.*)$")
+_DASH_HEAD_RE = re.compile(r"^(.+?)\s+[-–—|]\s+(.*)$")
+_PRICE_LIKE_RE = re.compile(r"^(?:[$€£¥₹]|rs\.?|inr|usd|eur|gbp)?\s*\d[\d,.]*\s*(?:[$€£¥₹]|inr|usd|eur|gbp|/-)?$", re.I)
+
+
+def normalize_label(label: str) -> str:
+    """'**Price (if available)**' -> 'price'"""
+    return " ".join(_LABEL_CLEAN_RE.sub(" ", _PARENTHETICAL_RE.sub(" ", label.lower())).split())
+
+
+def _clean_text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        value = str(value)
+    value = _EMPHASIS_RE.sub("", value)
+    return value or None
+
+
+def normalize_item(raw: Dict[str, Any]) -> Optional[dict]:
+    """Map an item dict with arbitrary labels onto ScrapedItem fields.
+
+    Unknown labels go to ``additional_data``. Returns None when the item has
+    neither a title nor a URL.
+    """
+    item: Dict[str, Any] = {}
+    additional: Dict[str, Any] = {}
+
+    for key, value in raw.items():
+        label = normalize_label(str(key))
+        if not label:
+            # Row numbers and other unlabeled columns
+            continue
+        field = FIELD_BY_ALIAS.get(label)
+        if field is None or field in item:
+            if field is None and label == 'additional data' and isinstance(value, dict):
+                additional.update(value)
+            elif value not in (None, '', [], {}):
+                additional[label.replace(' ', '_')] = value
+            continue
+
+        if field == 'url' or field == 'title':
+            text = _clean_text(value)
+            if text:
+                link = _MARKDOWN_LINK_RE.search(text)
+                if link:
+                    if field == 'title':
+                        text = link.group(1) or text
+                        item.setdefault('url', link.group(2))
+                    else:
+                        text = link.group(2)
+                elif field == 'url':
+                    found = _URL_RE.search(text)
+                    text = found.group(0) if found else text
+            item[field] = text
+        else:
+            item[field] = _clean_text(value)
+
+    if not item.get('url'):
+        # Fall back to the first URL mentioned anywhere in the item
+        for value in raw.values():
+            if isinstance(value, str):
+                found = _URL_RE.search(value)
+                if found:
+                    item['url'] = found.group(0)
+                    break
+
+    if not item.get('title') and not item.get('url'):
+        return None
+    item['additional_data'] = additional
+    return item
+
+
+def _item_list(value: dict) -> Optional[list]:
+    """The list under a LIST_KEYS container, looking through nested ones like {"data": {"items": [...]}}"""
+    for key in LIST_KEYS:
+        nested = value.get(key)
+        if isinstance(nested, list):
+            return nested
+        if isinstance(nested, dict):
+            found = _item_list(nested)
+            if found is not None:
+                return found
+    return None
+
+
+def _items_from_json(value: Any) -> Iterator[dict]:
+    if isinstance(value, list):
+        for entry in value:
+            if isinstance(entry, dict):
+                yield entry
+    elif isinstance(value, dict):
+        items = _item_list(value)
+        if items is not None:
+            yield from _items_from_json(items)
+            return
+        yield value
+
+
+def _parse_json(text: str) -> Optional[List[dict]]:
+    try:
+        return list(_items_from_json(json.loads(text)))
+    except ValueError:
+        return None
+
+
+def _scan_json_objects(text: str) -> Iterator[dict]:
+    """Decode every top-level JSON object embedded in free text, skipping anything malformed"""
+    decoder = json.JSONDecoder()
+    position = text.find('{')
+    while position != -1:
+        try:
+            value, end = decoder.raw_decode(text, position)
+        except ValueError:
+            position = text.find('{', position + 1)
+            continue
+        yield from _items_from_json(value)
+        position = text.find('{', end)
+
+
+def _split_table_row(line: str) -> List[str]:
+    line = line.strip()
+    if line.startswith('|'):
+        line = line[1:]
+    if line.endswith('|'):
+        line = line[:-1]
+    return [cell.strip() for cell in line.split('|')]
+
+
+def _parse_markdown_tables(lines: List[str]) -> Iterator[dict]:
+    index = 0
+    count = len(lines)
+    while index < count - 1:
+        line = lines[index]
+        if '|' in line and _TABLE_SEPARATOR_RE.match(lines[index + 1].strip()):
+            header = _split_table_row(line)
+            index += 2
+            while index < count and '|' in lines[index]:
+                cells = _split_table_row(lines[index])
+                yield dict(zip(header, cells))
+                index += 1
+        else:
+            index += 1
+
+
+def _split_head(text: str) -> Dict[str, Any]:
+    """'**iPhone 15** - ₹79,900' -> title and price; anything else after the name becomes the description"""
+    bold = _BOLD_HEAD_RE.match(text)
+    if bold:
+        title, rest = bold.group(1), bold.group(2).strip()
+    else:
+        dash = _DASH_HEAD_RE.match(text)
+        if not dash or not _PRICE_LIKE_RE.match(_EMPHASIS_RE.sub("", dash.group(2))):
+            return {'title': text}
+        title, rest = dash.group(1), dash.group(2).strip()
+
+    head: Dict[str, Any] = {'title': title}
+    if not rest:
+        return head
+    key_value = _KEY_VALUE_RE.match(rest)
+    if key_value and normalize_label(key_value.group(1)) in FIELD_BY_ALIAS:
+        head[key_value.group(1)] = key_value.group(2)
+    elif _PRICE_LIKE_RE.match(_EMPHASIS_RE.sub("", rest)):
+        head['price'] = rest
+    else:
+        head['description'] = rest
+    return head
+
+
+def _parse_list(lines: List[str]) -> Iterator[dict]:
+    """Numbered or bulleted blocks of 'Label: value' lines"""
+    current: Optional[Dict[str, Any]] = None
+    for line in lines:
+        if not line.strip():
+            continue
+        list_item = _LIST_ITEM_RE.match(line)
+        key_value = _KEY_VALUE_RE.match(line)
+        is_field = key_value is not None and normalize_label(key_value.group(1)) in FIELD_BY_ALIAS
+
+        # An unindented list marker starts a new item unless it is just another field of the current one
+        if list_item and not line[:1].isspace() and not (is_field and current):
+            if current:
+                yield current
+            current = {}
+            head = _KEY_VALUE_RE.match(list_item.group(1))
+            if head and normalize_label(head.group(1)) in FIELD_BY_ALIAS:
+                current[head.group(1)] = head.group(2)
+            else:
+                current.update(_split_head(list_item.group(1)))
+            continue
+
+        if current is None:
+            continue
+        if key_value:
+            current.setdefault(key_value.group(1), key_value.group(2))
+        elif 'description' not in current:
+            current['description'] = line.strip()
+    if current:
+        yield current
+
+
+def _normalized(raw_items: Iterable[dict]) -> Iterator[dict]:
+    for raw in raw_items:
+        item = normalize_item(raw)
+        if item is not None:
+            yield item
+
+
+def parse_agent_output(text: Optional[str]) -> Iterator[dict]:
+    """Turn an agent's final result into normalised item dicts.
+
+    Strategies are tried from strictest to most tolerant, and the first one
+    that yields items wins: whole-text JSON (optionally in a ```json fence),
+    JSON objects embedded in prose (truncated arrays included), markdown
+    tables, then numbered/bulleted lists of ``Label: value`` lines. Items are
+    produced lazily so callers can persist them while parsing continues.
+    """
+    if not text:
+        return
+    text = text.strip()
+
+    candidates = [text] + [match.group(1) for match in _FENCE_RE.finditer(text)]
+    for candidate in candidates:
+        raw_items = _parse_json(candidate.strip())
+        if raw_items:
+            yield from _normalized(raw_items)
+            return
+
+    found = False
+    for item in _normalized(_scan_json_objects(text)):
+        found = True
+        yield item
+    if found:
+        return
+
+    lines = text.splitlines()
+    for strategy in (_parse_markdown_tables, _parse_list):
+        for item in _normalized(strategy(lines)):
+            found = True
+            yield item
+        if found:
+            return
@@ -0,0 +1,242 @@
+import asyncio
+import itertools
+import os
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import select, update
+
+from database import AsyncSessionLocal, ScrapingJob
+from jobqueue import (JOB_LEASE_SECONDS, RetryScheduled, claim_job, default_worker_id, queue_key,
+                      reap_expired_leases, release_jobs, renew_leases)
+
+MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", "3"))
+MAX_QUEUED_JOBS = int(os.getenv("MAX_QUEUED_JOBS", "1000"))
+SHUTDOWN_GRACE_SECONDS = float(os.getenv("SHUTDOWN_GRACE_SECONDS", "30"))
+# Run jobs inside the API process; set to false when standalone workers (worker.py) run them
+EMBEDDED_WORKER = os.getenv("EMBEDDED_WORKER", "true").lower() != "false"
+# How long a job waits before it is queued again when claiming it failed (e.g. the database was busy)
+CLAIM_RETRY_SECONDS = float(os.getenv("CLAIM_RETRY_SECONDS", "1.0"))
+
+JobRunner = Callable[[int, str, int], Awaitable[object]]
+
+
+class QueueFullError(Exception):
+    """Raised when the scheduler cannot accept more jobs"""
+
+
+class JobScheduler:
+    """Bounded worker pool that runs scraping jobs from a persistent priority queue.
+
+    Jobs are stored as ``pending`` rows in the ``scraping_jobs`` table before they
+    are queued here, so anything still waiting when the process stops is picked up
+    again by :meth:`start`. Ordering uses a virtual submission time of
+    ``submitted_at - priority * PRIORITY_AGING_SECONDS``: higher priorities run
+    first, but old low-priority jobs are never starved by a stream of new ones.
+
+    A job is claimed in the database before it runs, under a lease that a
+    heartbeat renews, so a job left ``running`` by a crashed process is reaped
+    and retried once its lease expires. Runs that raise RetryScheduled are
+    queued again after their backoff.
+    """
+
+    def __init__(self, runner: JobRunner, max_concurrent: int = MAX_CONCURRENT_JOBS,
+                 max_queued: int = MAX_QUEUED_JOBS, lease_seconds: float = JOB_LEASE_SECONDS):
+        self.runner = runner
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.lease_seconds = lease_seconds
+        self.worker_id = default_worker_id()
+        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._sequence = itertools.count()
+        self._workers: List[asyncio.Task] = []
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._active: Dict[int, asyncio.Task] = {}
+        self._queued_ids = set()
+        # Jobs waiting out a retry backoff before they are queued again
+        self._delayed: Dict[int, asyncio.TimerHandle] = {}
+        self._accepting = False
+        self.retried_total = 0
+        self.reaped_total = 0
+
+    @property
+    def running_count(self) -> int:
+        return len(self._active)
+
+    @property
+    def queued_count(self) -> int:
+        return len(self._queued_ids) + len(self._delayed)
+
+    def is_full(self) -> bool:
+        return self.queued_count >= self.max_queued
+
+    async def start(self):
+        """Start the worker pool and re-queue jobs left over from a previous run"""
+        if self._accepting:
+            return
+        self._accepting = True
+        await self._recover_pending_jobs()
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"scrape-worker-{i}")
+            for i in range(self.max_concurrent)
+        ]
+        self._heartbeat = asyncio.create_task(self._heartbeat_loop(), name="scrape-heartbeat")
+
+    def submit(self, job_id: int, query: str, max_results: int, priority: int = 0,
+               submitted_at: float = None):
+        """Queue a job that has already been persisted with status ``pending``"""
+        if not self._accepting:
+            raise QueueFullError("Scheduler is not accepting new jobs")
+        if job_id in self._queued_ids or job_id in self._active or job_id in self._delayed:
+            return
+        if self.is_full():
+            raise QueueFullError("Scraping queue is full, please try again later")
+
+        self._enqueue(job_id, query, max_results, queue_key(priority, submitted_at))
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "running": self.running_count,
+            "queued": self.queued_count,
+            "max_queued": self.max_queued,
+            "accepting": self._accepting,
+            "retry_waiting": len(self._delayed),
+            "retried_total": self.retried_total,
+            "reaped_total": self.reaped_total,
+        }
+
+    async def shutdown(self, timeout: float = SHUTDOWN_GRACE_SECONDS):
+        """Stop taking work and give running jobs ``timeout`` seconds to finish.
+
+        Queued jobs stay ``pending`` in the database. Jobs still running after the
+        grace period are cancelled and handed back to the queue for the next start.
+        """
+        self._accepting = False
+        for handle in self._delayed.values():
+            handle.cancel()
+        self._delayed.clear()
+
+        # Workers only wait on their job tasks, so cancelling them leaves jobs running
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        active = list(self._active.values())
+        if active:
+            _, still_running = await asyncio.wait(active, timeout=timeout)
+            for task in still_running:
+                task.cancel()
+            await asyncio.gather(*still_running, return_exceptions=True)
+
+        # Leases are renewed until every job has finished or been cancelled
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            await asyncio.gather(self._heartbeat, return_exceptions=True)
+            self._heartbeat = None
+        await release_jobs(self.worker_id)
+
+    def _enqueue(self, job_id: int, query: str, max_results: int, sort_key: float, delay: float = 0):
+        if delay > 0:
+            self._delayed[job_id] = asyncio.get_running_loop().call_later(
+                delay, self._enqueue_due, job_id, query, max_results, sort_key
+            )
+            return
+        self._queued_ids.add(job_id)
+        self.queue.put_nowait((sort_key, next(self._sequence), job_id, query, max_results))
+
+    def _enqueue_due(self, job_id: int, query: str, max_results: int, sort_key: float):
+        self._delayed.pop(job_id, None)
+        if self._accepting:
+            self._enqueue(job_id, query, max_results, sort_key)
+
+    def _enqueue_job(self, job: ScrapingJob):
+        """Queue a pending job row, honouring its queue position and retry backoff"""
+        if job.id in self._queued_ids or job.id in self._active or job.id in self._delayed:
+            return
+        sort_key = job.queue_key
+        if sort_key is None:
+            # created_at is stored as naive UTC
+            submitted_at = job.created_at.replace(tzinfo=timezone.utc).timestamp() if job.created_at else None
+            sort_key = queue_key(job.priority, submitted_at)
+        delay = (job.next_attempt_at - datetime.utcnow()).total_seconds() if job.next_attempt_at else 0
+        self._enqueue(job.id, job.query, job.max_results, sort_key, delay)
+
+    async def _worker(self):
+        while True:
+            sort_key, _, job_id, query, max_results = await self.queue.get()
+            self._queued_ids.discard(job_id)
+            try:
+                # Skips jobs that were cancelled, or claimed by a standalone worker meanwhile
+                try:
+                    claimed = await claim_job(job_id, self.worker_id, self.lease_seconds)
+                except Exception as e:
+                    # The job is still pending in the database; keep it queued and this worker alive
+                    print(f"Claiming scraping job {job_id} failed, retrying in {CLAIM_RETRY_SECONDS:g}s: {e}")
+                    self._enqueue(job_id, query, max_results, sort_key, CLAIM_RETRY_SECONDS)
+                    continue
+                if claimed is None:
+                    continue
+                task = asyncio.create_task(self.runner(job_id, query, max_results),
+                                           name=f"scrape-job-{job_id}")
+                self._active[job_id] = task
+                task.add_done_callback(lambda t, job_id=job_id: self._on_job_done(job_id, t))
+                await asyncio.wait({task})
+                if not task.cancelled() and isinstance(task.exception(), RetryScheduled):
+                    self.retried_total += 1
+                    self._enqueue(job_id, query, max_results, sort_key, task.exception().delay)
+            finally:
+                self.queue.task_done()
+
+    def _on_job_done(self, job_id: int, task: asyncio.Task):
+        self._active.pop(job_id, None)
+        if task.cancelled() or task.exception() is None:
+            return
+        if isinstance(task.exception(), RetryScheduled):
+            print(task.exception())
+        else:
+            print(f"Scraping job {job_id} failed: {task.exception()}")
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await renew_leases(self.worker_id, self.lease_seconds)
+                await self.reap()
+            except Exception as e:
+                print(f"Scheduler heartbeat failed: {e}")
+
+    async def reap(self) -> dict:
+        """Recover jobs whose lease expired (their process died) and queue the ones being retried"""
+        requeued, failed = await reap_expired_leases()
+        self.reaped_total += len(requeued) + len(failed)
+        if self._accepting:
+            for job in requeued:
+                self._enqueue_job(job)
+        return {"requeued": [job.id for job in requeued], "failed": [job.id for job in failed]}
+
+    async def _recover_pending_jobs(self):
+        async with AsyncSessionLocal() as db:
+            # Running jobs without a lease were coalesced onto another job by an earlier version
+            # (followers are "attached" now) and belonged to a process that is gone, so run them
+            # again. Leased jobs and attached followers are left to the reaper.
+            await db.execute(
+                update(ScrapingJob)
+                .where(ScrapingJob.status == "running", ScrapingJob.lease_expires_at.is_(None))
+                .values(status="pending", worker_id=None)
+            )
+            await db.commit()
+        await self.reap()
+
+        async with AsyncSessionLocal() as db:
+            pending = (await db.execute(
+                select(ScrapingJob)
+                .where(ScrapingJob.status == "pending")
+                .order_by(ScrapingJob.created_at, ScrapingJob.id)
+            )).scalars().all()
+
+        for job in pending:
+            self._enqueue_job(job)
+        if pending:
+            print(f"Recovered {len(pending)} pending scraping jobs")
@@ -1,13 +1,21 @@
 import asyncio
 import json
 import os
+import time
 from typing import Optional
 from datetime import datetime
-from browser_use.llm import ChatGoogle
-from browser_use import Agent, Controller
 from models import ScrapingJobResponse
-from database import get_db, ScrapingJob, ScrapedItem
-from sqlalchemy.orm import Session
+from database import AsyncSessionLocal, ScrapingJob, ScrapedItem
+from sqlalchemy import delete, func, select, update
+from pipeline import ItemWriter, clone_job_items
+from jobqueue import RetryScheduled, finish_attempt, is_retryable, schedule_retry
+from coalescing import InFlightRegistry
+from browser_pool import BrowserPool
+from result_parser import parse_agent_output
+from cache import ResultCache
+from fanout import MAX_AGENT_SESSIONS, build_task, plan_shards
+from llm_gateway import LLM_BACKEND, JobLLM, JobUsage, LLMGateway, create_chat_model
+from metrics import JOB_PROFILING, JobProfile, observe_job, observe_stage, timed
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -15,79 +23,230 @@ load_dotenv()
 
 # Your enhanced scraper class
 class EnhancedAIWebScraper:
-    def __init__(self):
-        # Get Google API key from environment
-        google_api_key = os.getenv("GOOGLE_API_KEY")
-        if not google_api_key:
+    def __init__(self, result_cache: Optional[ResultCache] = None, browser_pool: Optional[BrowserPool] = None,
+                 gateway: Optional[LLMGateway] = None, agent_class=None):
+        self.result_cache = result_cache
+        self.browser_pool = browser_pool
+        self.inflight = InFlightRegistry()
+        # browser_use.Agent unless another class with the same interface is given (benchmarks use a fake one)
+        self.agent_class = agent_class
+        
+        # Get Google API key from environment (not needed when a gateway is passed in)
+        self.google_api_key = os.getenv("GOOGLE_API_KEY")
+        if not self.google_api_key and LLM_BACKEND != "fake" and gateway is None:
             raise ValueError("GOOGLE_API_KEY environment variable is required")
         
-        self.llm = ChatGoogle(model='gemini-1.5-flash', api_key=google_api_key)
+        self._gateway = gateway
+        # Shared by every job and shard, so fan-out never runs more agents than the scheduler would
+        self.agent_slots = asyncio.Semaphore(MAX_AGENT_SESSIONS)
+    
+    @property
+    def gateway(self) -> LLMGateway:
+        """Rate-limited, caching front for the chat model, built on first use so importing
+        the app does not load browser_use"""
+        if self._gateway is None:
+            self._gateway = LLMGateway(create_chat_model(self.google_api_key))
+        return self._gateway
+    
+    async def _record_llm_usage(self, job_id: int, llm: JobLLM):
+        """Add the LLM usage counted since the last call to the job's totals (kept across attempts)"""
+        usage, llm.usage = llm.usage, JobUsage()
+        if not usage.calls:
+            return
+        await self._update_job(job_id, **{
+            name: func.coalesce(getattr(ScrapingJob, name), 0) + value
+            for name, value in usage.as_columns().items()
+        })
     
-    async def scrape_with_progress(self, job_id: int, query: str, max_results: int, progress_callback=None):
-        """Enhanced scraper with progress tracking"""
+    async def _update_job(self, job_id: int, **values):
+        """Apply ``values`` to a job row in its own short-lived session"""
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(ScrapingJob).where(ScrapingJob.id == job_id).values(**values))
+            await db.commit()
+
+    async def _report(self, job_id: int, progress_callback, status: str, progress: int, message: str):
+        """Send progress for a job and every job coalesced onto it"""
+        if progress_callback:
+            for target_id in [job_id] + self.inflight.followers(job_id):
+                await progress_callback(target_id, status, progress, message)
+
+    async def _attached_followers(self, db, job_id: int, follower_ids) -> list:
+        """Followers still attached to ``job_id``: the ones this process tracks plus any in the database
+        (attached by a process that has since stopped, before the job was recovered here)"""
+        attached = (await db.execute(
+            select(ScrapingJob.id).where(ScrapingJob.status == "attached", ScrapingJob.source_job_id == job_id)
+        )).scalars().all()
+        return list(dict.fromkeys([*follower_ids, *attached]))
+
+    async def _complete_followers(self, job_id: int, follower_ids, progress_callback):
+        async with AsyncSessionLocal() as db:
+            follower_ids = await self._attached_followers(db, job_id, follower_ids)
+            for follower_id in follower_ids:
+                count = await clone_job_items(db, job_id, follower_id)
+                await db.execute(
+                    update(ScrapingJob).where(ScrapingJob.id == follower_id).values(
+                        status="completed", completed_at=datetime.utcnow(), results_count=count
+                    )
+                )
+            await db.commit()
+        if progress_callback:
+            for follower_id in follower_ids:
+                await progress_callback(follower_id, "completed", 100, "Results shared from an identical search")
+
+    async def _fail_followers(self, job_id: int, follower_ids, error: Exception, progress_callback):
+        async with AsyncSessionLocal() as db:
+            follower_ids = await self._attached_followers(db, job_id, follower_ids)
+            if not follower_ids:
+                return
+            await db.execute(
+                update(ScrapingJob).where(ScrapingJob.id.in_(follower_ids)).values(
+                    status="failed", error_message=str(error), completed_at=datetime.utcnow()
+                )
+            )
+            await db.commit()
+        if progress_callback:
+            for follower_id in follower_ids:
+                await progress_callback(follower_id, "failed", 0, f"Error: {str(error)}")
+
+    async def _run_agent(self, task: str, llm: JobLLM):
+        """Run a browser-use agent for ``task`` and return its final result"""
+        Agent = self.agent_class
+        if Agent is None:
+            from browser_use import Agent
         
-        # Update job status to running
-        db = next(get_db())
-        job = db.query(ScrapingJob).filter(ScrapingJob.id == job_id).first()
-        job.status = "running"
-        db.commit()
+        async with self.agent_slots:
+            if self.browser_pool is None or not self.browser_pool.enabled:
+                # Use the browser-use agent without complex output schemas; it launches
+                # its own browser, so browser startup is part of the agent run here
+                agent = Agent(task=task, llm=llm)
+                with timed("agent_run", llm.profile):
+                    history = await agent.run()
+                return history.final_result()
+            
+            # Borrow a warm browser instead of launching a new one for every job
+            started = time.perf_counter()
+            async with self.browser_pool.session() as browser_session:
+                observe_stage("browser_startup", time.perf_counter() - started, llm.profile, started)
+                agent = Agent(task=task, llm=llm, browser_session=browser_session)
+                with timed("agent_run", llm.profile):
+                    history = await agent.run()
+                return history.final_result()
+    
+    async def _run_shards(self, job_id: int, query: str, max_results: int, shards, llm: JobLLM,
+                          writer: ItemWriter, progress_callback) -> list:
+        """Run one agent per shard concurrently and store their items as each one finishes.
         
-        if progress_callback:
-            await progress_callback(job_id, "running", 10, "Starting web scraping...")
+        Items the job already has (same URL or content, see ItemWriter) are skipped,
+        and agents still running are cancelled once ``max_results`` items are
+        stored. Failed shards are tolerated as long as another one produced
+        items; if none did, the first error is raised.
+        """
+        stored = []
+        errors = []
+        tasks = [
+            asyncio.create_task(self._run_agent(build_task(query, shard), llm),
+                                name=f"scrape-job-{job_id}-shard-{shard.index}")
+            for shard in shards
+        ]
+        finished = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                error = None
+                try:
+                    result = await next_done
+                except Exception as e:
+                    errors.append(e)
+                    error, result = e, None
+                finished += 1
+                
+                with timed("parse", llm.profile):
+                    parsed = list(parse_agent_output(result)) if result is not None else []
+                added = 0
+                for item_data in parsed:
+                    if len(stored) >= max_results:
+                        break
+                    if await writer.add(item_data):
+                        stored.append(item_data)
+                        added += 1
+                await writer.flush()
+                
+                outcome = f"failed ({error})" if error is not None else f"{added} new items"
+                await self._report(job_id, progress_callback, "running", 10 + 85 * finished // len(shards),
+                                   f"Agent {finished}/{len(shards)} finished: {outcome}, {len(stored)} items so far")
+                if len(stored) >= max_results:
+                    break
+        finally:
+            pending = [task for task in tasks if not task.done()]
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
         
+        if writer.duplicates:
+            print(f"Job {job_id}: skipped {writer.duplicates} duplicate items from {len(shards)} agents")
+        if not stored and errors:
+            raise errors[0]
+        return stored
+
+    def _finish_attempt_metrics(self, outcome: str, started: float, items: int,
+                                profile: Optional[JobProfile]) -> dict:
+        """Record a finished attempt in the job metrics; returns the profile column to store, if any"""
+        observe_job(outcome, time.perf_counter() - started, items)
+        return {"profile": profile.to_dict()} if profile is not None else {}
+
+    async def scrape_with_progress(self, job_id: int, query: str, max_results: int, progress_callback=None,
+                                   items_callback=None):
+        """Enhanced scraper with progress tracking; ``items_callback`` receives each batch of stored items"""
+        started = time.perf_counter()
+        
+        # Lead identical jobs submitted while this one runs (no-op if it already leads)
+        self.inflight.register(query, max_results, job_id)
+        
+        # Update job status to running, dropping partial results from an interrupted earlier run
+        async with AsyncSessionLocal() as db:
+            created_at, attempts = (await db.execute(
+                select(ScrapingJob.created_at, ScrapingJob.attempts).where(ScrapingJob.id == job_id)
+            )).first() or (None, None)
+            profile = JobProfile(job_id, attempts) if JOB_PROFILING else None
+            if created_at is not None and (attempts or 0) <= 1:
+                # Retries wait out a deliberate backoff instead, which is not counted as queueing
+                observe_stage("queue_wait", max(0.0, (datetime.utcnow() - created_at).total_seconds()), profile)
+            await db.execute(delete(ScrapedItem).where(ScrapedItem.job_id == job_id))
+            await db.execute(
+                update(ScrapingJob).where(ScrapingJob.id == job_id).values(
+                    status="running", started_at=datetime.utcnow(), results_count=0
+                )
+            )
+            await db.commit()
+        
+        retrying = False
+        llm = self.gateway.for_job(job_id, profile)
+        writer = None
         try:
-            # Create a more specific task for structured data extraction
-            task = f"""
-            Search for "{query}" and extract exactly {max_results} items with the following information:
-            1. Title/Product Name
-            2. Price (if available)
-            3. Description or key details
-            4. Website URL
-            5. Rating (if available)
-            6. Any additional relevant information
-            
-            Please return the results in a structured format that I can parse.
-            """
-            
-            # Use the browser-use agent without complex output schemas
-            agent = Agent(task=task, llm=self.llm)
-            
-            if progress_callback:
-                await progress_callback(job_id, "running", 30, "AI agent is searching and extracting data...")
-            
-            # Run the scraper
-            history = await agent.run()
-            result = history.final_result()
-            
-            if progress_callback:
-                await progress_callback(job_id, "running", 70, "Processing extracted data...")
-            
-            print(f"Agent result: {result}")  # Debug logging
+            shards = plan_shards(max_results)
+            if len(shards) == 1:
+                message = "AI agent is searching and extracting data..."
+            else:
+                message = f"Searching with {len(shards)} AI agents in parallel..."
+            await self._report(job_id, progress_callback, "running", 10, message)
             
-            # Create sample structured data for demonstration
-            # In a real scenario, you would parse the agent's result more sophisticatedly
-            scraped_items = self.create_sample_data(query, max_results)
+            # Items are written as each agent finishes, skipping URLs another agent already found;
+            # no database session is held while the agents work
+            writer = ItemWriter(job_id, on_flush=items_callback, profile=profile)
+            scraped_items = await self._run_shards(job_id, query, max_results, shards, llm, writer,
+                                                   progress_callback)
+            await self._record_llm_usage(job_id, llm)
             
-            if scraped_items and len(scraped_items) > 0:
-                # Save to database
-                for item_data in scraped_items:
-                    scraped_item = ScrapedItem(
-                        job_id=job_id,
-                        title=item_data.get('title'),
-                        description=item_data.get('description'),
-                        url=item_data.get('url'),
-                        price=item_data.get('price'),
-                        rating=item_data.get('rating'),
-                        date=item_data.get('date'),
-                        additional_data=json.dumps(item_data.get('additional_data', {}))
-                    )
-                    db.add(scraped_item)
+            if scraped_items:
+                await self._update_job(job_id, status="completed", completed_at=datetime.utcnow(),
+                                       lease_expires_at=None, error_message=None,
+                                       **self._finish_attempt_metrics("completed", started, len(scraped_items),
+                                                                      profile))
+                await finish_attempt(job_id, "completed")
+                if self.result_cache:
+                    self.result_cache.put(query, max_results, job_id)
                 
-                # Update job
-                job.status = "completed"
-                job.completed_at = datetime.utcnow()
-                job.results_count = len(scraped_items)
-                db.commit()
+                # Later identical requests now hit the result cache; hand results to those that waited
+                await self._complete_followers(job_id, self.inflight.release(job_id), progress_callback)
                 
                 if progress_callback:
                     await progress_callback(job_id, "completed", 100, f"Successfully extracted {len(scraped_items)} items!")
@@ -102,95 +261,33 @@ class EnhancedAIWebScraper:
                 raise Exception("No data could be extracted from the search results.")
                 
         except Exception as e:
+            await self._record_llm_usage(job_id, llm)
+            items = writer.written if writer is not None else 0
+            
+            # Transient errors (timeouts, rate limits) put the job back in the queue with a backoff
+            delay = await schedule_retry(job_id, e) if is_retryable(e) else None
+            if delay is not None:
+                retrying = True
+                profile_values = self._finish_attempt_metrics("retry", started, items, profile)
+                if profile_values:
+                    await self._update_job(job_id, **profile_values)
+                await self._report(job_id, progress_callback, "pending", 0,
+                                   f"Temporary error: {e}. Retrying in {delay:.0f}s")
+                raise RetryScheduled(job_id, delay, e) from e
+            
             # Update job with error
-            job.status = "failed"
-            job.error_message = str(e)
-            job.completed_at = datetime.utcnow()
-            db.commit()
+            await self._update_job(job_id, status="failed", error_message=str(e), completed_at=datetime.utcnow(),
+                                   lease_expires_at=None,
+                                   **self._finish_attempt_metrics("failed", started, items, profile))
+            await finish_attempt(job_id, "failed", e)
+            await self._fail_followers(job_id, self.inflight.release(job_id), e, progress_callback)
             
             if progress_callback:
                 await progress_callback(job_id, "failed", 0, f"Error: {str(e)}")
             
             raise e
         finally:
-            db.close()
-
-    def create_sample_data(self, query: str, max_results: int):
-        """Create sample structured data based on the query"""
-        from datetime import datetime
-        import random
-        
-        # Sample data based on common search queries
-        if "iphone" in query.lower():
-            base_items = [
-                {
-                    'title': 'iPhone 15 128GB - Midnight',
-                    'description': 'Latest iPhone 15 with 48MP camera, USB-C, and Dynamic Island. Available in multiple colors.',
-                    'url': 'https://www.apple.com/iphone-15/',
-                    'price': '₹79,900',
-                    'rating': '4.5/5',
-                    'date': datetime.now().isoformat(),
-                    'additional_data': {'color': 'Midnight', 'storage': '128GB', 'availability': 'In Stock'}
-                },
-                {
-                    'title': 'iPhone 15 Plus 256GB - Blue',
-                    'description': 'iPhone 15 Plus with larger 6.7-inch display, longer battery life, and advanced camera system.',
-                    'url': 'https://www.apple.com/iphone-15-plus/',
-                    'price': '₹89,900',
-                    'rating': '4.4/5',
-                    'date': datetime.now().isoformat(),
-                    'additional_data': {'color': 'Blue', 'storage': '256GB', 'availability': 'In Stock'}
-                },
-                {
-                    'title': 'iPhone 15 Pro 128GB - Natural Titanium',
-                    'description': 'Pro model with titanium design, advanced camera system, and powerful A17 Pro chip.',
-                    'url': 'https://www.apple.com/iphone-15-pro/',
-                    'price': '₹1,34,900',
-                    'rating': '4.6/5',
-                    'date': datetime.now().isoformat(),
-                    'additional_data': {'color': 'Natural Titanium', 'storage': '128GB', 'availability': 'Limited Stock'}
-                },
-                {
-                    'title': 'iPhone 15 Pro Max 256GB - Black Titanium',
-                    'description': 'Largest iPhone with Pro Max features, titanium build, and professional camera capabilities.',
-                    'url': 'https://www.apple.com/iphone-15-pro-max/',
-                    'price': '₹1,59,900',
-                    'rating': '4.7/5',
-                    'date': datetime.now().isoformat(),
-                    'additional_data': {'color': 'Black Titanium', 'storage': '256GB', 'availability': 'Pre-order'}
-                },
-                {
-                    'title': 'iPhone 15 512GB - Yellow (Amazon)',
-                    'description': 'iPhone 15 with maximum storage, available with exclusive Amazon offers and fast delivery.',
-                    'url': 'https://amazon.in/iphone-15-yellow',
-                    'price': '₹99,900',
-                    'rating': '4.3/5',
-                    'date': datetime.now().isoformat(),
-                    'additional_data': {'color': 'Yellow', 'storage': '512GB', 'platform': 'Amazon', 'discount': '5% off'}
-                }
-            ]
-        else:
-            # Generic sample data for other queries
-            base_items = [
-                {
-                    'title': f'Search Result 1 for {query}',
-                    'description': f'Detailed information about {query} from a reliable source with comprehensive details.',
-                    'url': f'https://example1.com/{query.replace(" ", "-")}',
-                    'price': '₹' + str(random.randint(1000, 50000)),
-                    'rating': f'{random.uniform(3.5, 5.0):.1f}/5',
-                    'date': datetime.now().isoformat(),
-                    'additional_data': {'source': 'Example Site 1', 'category': 'General'}
-                },
-                {
-                    'title': f'Search Result 2 for {query}',
-                    'description': f'Alternative option for {query} with different features and competitive pricing.',
-                    'url': f'https://example2.com/{query.replace(" ", "-")}',
-                    'price': '₹' + str(random.randint(1000, 50000)),
-                    'rating': f'{random.uniform(3.5, 5.0):.1f}/5',
-                    'date': datetime.now().isoformat(),
-                    'additional_data': {'source': 'Example Site 2', 'category': 'General'}
-                }
-            ]
-        
-        # Return the requested number of items
-        return base_items[:max_results]
\ No newline at end of file
+            # Followers of a cancelled job stay running and are recovered with it on restart;
+            # followers of a job being retried stay attached and get the retry's results
+            if not retrying:
+                self.inflight.release(job_id)
@@ -0,0 +1,194 @@
+"""Standalone scraping worker for multi-process deployments.
+
+Run one or more of these (``python start_worker.py`` from ``backend/``) next to
+API processes started with ``EMBEDDED_WORKER=false``. Workers claim pending jobs
+from the database and publish progress through ``PROGRESS_BROKER_URL``, which
+the API processes relay to their WebSocket clients.
+"""
+import asyncio
+import os
+import signal
+import sys
+from typing import Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from browser_pool import BrowserPool
+from database import DB_AUTO_CREATE, init_db
+from jobqueue import (JOB_LEASE_SECONDS, RetryScheduled, claim_next_job, default_worker_id,
+                      reap_expired_leases, release_jobs, renew_leases)
+from metrics import JOBS_RUNNING, REGISTRY, serve_metrics
+from progress_broker import create_broker
+from scheduler import MAX_CONCURRENT_JOBS, SHUTDOWN_GRACE_SECONDS, JobRunner
+from scraper import EnhancedAIWebScraper
+
+# How long an idle worker waits before looking for pending jobs again
+WORKER_POLL_SECONDS = float(os.getenv("WORKER_POLL_SECONDS", "1.0"))
+# Port serving this worker's metrics (stage timings, job latency) in the Prometheus format; 0 disables
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "0"))
+
+
+class JobWorker:
+    """Runs up to ``concurrency`` jobs at a time, claimed from the shared database queue.
+
+    Claimed jobs carry a lease that the worker renews (heartbeats) every third
+    of ``lease_seconds``. If the worker dies, its leases expire and the next
+    worker to heartbeat reaps those jobs: they are retried after a backoff, or
+    failed once they have used ``JOB_MAX_ATTEMPTS`` runs. Jobs whose runner
+    raised RetryScheduled are already back in the queue with a delay.
+    """
+
+    def __init__(self, runner: JobRunner, worker_id: Optional[str] = None,
+                 concurrency: int = MAX_CONCURRENT_JOBS, poll_interval: float = WORKER_POLL_SECONDS,
+                 lease_seconds: float = JOB_LEASE_SECONDS):
+        self.runner = runner
+        self.worker_id = worker_id or default_worker_id()
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self._claimers: List[asyncio.Task] = []
+        self._lease_task: Optional[asyncio.Task] = None
+        self._active: Dict[int, asyncio.Task] = {}
+        self._accepting = False
+        self.completed_total = 0
+        self.failed_total = 0
+        self.retried_total = 0
+        self.reaped_total = 0
+
+    async def start(self):
+        if self._accepting:
+            return
+        self._accepting = True
+        await self._reap()
+        self._claimers = [
+            asyncio.create_task(self._claim_loop(), name=f"{self.worker_id}-claim-{i}")
+            for i in range(self.concurrency)
+        ]
+        self._lease_task = asyncio.create_task(self._lease_loop(), name=f"{self.worker_id}-lease")
+
+    async def _claim_loop(self):
+        while True:
+            try:
+                job = await claim_next_job(self.worker_id, self.lease_seconds)
+            except Exception as e:
+                # e.g. "database is locked" with several workers on one SQLite file; keep polling
+                print(f"Claiming a job failed for {self.worker_id}: {e}")
+                await asyncio.sleep(self.poll_interval)
+                continue
+            if job is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            task = asyncio.create_task(self.runner(job.id, job.query, job.max_results),
+                                       name=f"scrape-job-{job.id}")
+            self._active[job.id] = task
+            task.add_done_callback(lambda t, job_id=job.id: self._on_job_done(job_id, t))
+            # Cancelling this loop on shutdown leaves the job running
+            await asyncio.wait({task})
+
+    def _on_job_done(self, job_id: int, task: asyncio.Task):
+        self._active.pop(job_id, None)
+        if task.cancelled():
+            return
+        if isinstance(task.exception(), RetryScheduled):
+            self.retried_total += 1
+            print(task.exception())
+        elif task.exception() is not None:
+            self.failed_total += 1
+            print(f"Scraping job {job_id} failed: {task.exception()}")
+        else:
+            self.completed_total += 1
+
+    async def _lease_loop(self):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await renew_leases(self.worker_id, self.lease_seconds)
+                await self._reap()
+            except Exception as e:
+                print(f"Lease renewal failed for {self.worker_id}: {e}")
+
+    async def _reap(self):
+        requeued, failed = await reap_expired_leases()
+        self.reaped_total += len(requeued) + len(failed)
+
+    def stats(self) -> dict:
+        return {
+            "worker_id": self.worker_id,
+            "concurrency": self.concurrency,
+            "running": len(self._active),
+            "completed_total": self.completed_total,
+            "failed_total": self.failed_total,
+            "retried_total": self.retried_total,
+            "reaped_total": self.reaped_total,
+            "accepting": self._accepting,
+        }
+
+    async def shutdown(self, timeout: float = SHUTDOWN_GRACE_SECONDS):
+        """Stop claiming, give running jobs ``timeout`` seconds, then hand the rest back to the queue"""
+        self._accepting = False
+        for claimer in self._claimers:
+            claimer.cancel()
+        await asyncio.gather(*self._claimers, return_exceptions=True)
+        self._claimers = []
+
+        active = list(self._active.values())
+        if active:
+            _, still_running = await asyncio.wait(active, timeout=timeout)
+            for task in still_running:
+                task.cancel()
+            await asyncio.gather(*still_running, return_exceptions=True)
+
+        # Leases are renewed until every job has finished or been cancelled
+        if self._lease_task is not None:
+            self._lease_task.cancel()
+            await asyncio.gather(self._lease_task, return_exceptions=True)
+            self._lease_task = None
+        released = await release_jobs(self.worker_id)
+        if released:
+            print(f"Returned {released} unfinished jobs to the queue")
+
+
+async def main():
+    if DB_AUTO_CREATE:
+        await init_db()
+    broker = create_broker()
+    if not broker.distributed:
+        print("Warning: PROGRESS_BROKER_URL is memory://, so progress from this worker will not reach the API")
+
+    browser_pool = BrowserPool()
+    scraper = EnhancedAIWebScraper(browser_pool=browser_pool)
+
+    async def run_scraping_job(job_id: int, query: str, max_results: int):
+        return await scraper.scrape_with_progress(job_id, query, max_results, broker.send_progress,
+                                                  broker.send_items)
+
+    worker = JobWorker(run_scraping_job)
+    REGISTRY.add_collector(lambda: JOBS_RUNNING.set(worker.stats()["running"]))
+    metrics_server = await serve_metrics(WORKER_METRICS_PORT) if WORKER_METRICS_PORT else None
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stopping.set)
+        except NotImplementedError:
+            # Windows: rely on KeyboardInterrupt
+            pass
+
+    browser_pool.start()
+    await worker.start()
+    print(f"Scraping worker {worker.worker_id} started with {worker.concurrency} slots")
+    try:
+        await stopping.wait()
+    finally:
+        print(f"Stopping scraping worker {worker.worker_id}")
+        await worker.shutdown()
+        await browser_pool.close()
+        await broker.close()
+        if metrics_server is not None:
+            metrics_server.close()
+            await metrics_server.wait_closed()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
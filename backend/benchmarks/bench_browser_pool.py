@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Per-job latency with and without the warm browser pool.
+
+Usage:
+    python benchmarks/bench_browser_pool.py [--jobs 30] [--concurrency 3]
+        [--startup-ms 1500] [--work-ms 200] [--real]
+
+By default browsers are simulated: starting one sleeps for --startup-ms and a
+job holds it for --work-ms. With --real, actual browser-use sessions are
+launched (requires browser-use and a local Chromium) and each job opens a page.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "app"))
+
+from browser_pool import BrowserPool, create_browser_session  # noqa: E402
+
+
+class SimulatedBrowser:
+    def __init__(self, startup_seconds: float):
+        self.startup_seconds = startup_seconds
+
+    async def start(self):
+        await asyncio.sleep(self.startup_seconds)
+
+    async def kill(self):
+        await asyncio.sleep(0)
+
+
+def make_factory(args):
+    if args.real:
+        return create_browser_session
+
+    async def factory():
+        browser = SimulatedBrowser(args.startup_ms / 1000)
+        await browser.start()
+        return browser
+
+    return factory
+
+
+async def do_work(session, args):
+    if args.real:
+        page = await session.get_current_page()
+        await page.goto("about:blank")
+    await asyncio.sleep(args.work_ms / 1000)
+
+
+async def run_without_pool(args):
+    factory = make_factory(args)
+    limit = asyncio.Semaphore(args.concurrency)
+
+    async def job():
+        started = time.perf_counter()
+        async with limit:
+            session = await factory()
+            try:
+                await do_work(session, args)
+            finally:
+                await session.kill()
+            return time.perf_counter() - started
+
+    return await asyncio.gather(*(job() for _ in range(args.jobs)))
+
+
+async def run_with_pool(args):
+    pool = BrowserPool(size=args.concurrency, factory=make_factory(args))
+    pool.start()
+    await pool._warmup
+
+    async def job():
+        started = time.perf_counter()
+        async with pool.session() as session:
+            await do_work(session, args)
+        return time.perf_counter() - started
+
+    try:
+        latencies = await asyncio.gather(*(job() for _ in range(args.jobs)))
+    finally:
+        stats = pool.stats()
+        await pool.close()
+    return latencies, stats
+
+
+def summarize(name, latencies):
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(f"{name:<14} mean={statistics.mean(ordered) * 1000:8.1f}ms "
+          f"p50={statistics.median(ordered) * 1000:8.1f}ms p99={p99 * 1000:8.1f}ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=30)
+    parser.add_argument("--concurrency", type=int, default=3)
+    parser.add_argument("--startup-ms", type=float, default=1500)
+    parser.add_argument("--work-ms", type=float, default=200)
+    parser.add_argument("--real", action="store_true", help="launch real browser-use sessions")
+    args = parser.parse_args()
+
+    summarize("without pool", await run_without_pool(args))
+    latencies, stats = await run_with_pool(args)
+    summarize("with pool", latencies)
+    print(f"pool: created={stats['created_total']} recycled={stats['recycled_total']} "
+          f"avg_wait={stats['avg_wait_seconds'] * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
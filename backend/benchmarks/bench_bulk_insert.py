@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Compare per-object ORM inserts against the batched ItemWriter pipeline.
+
+Usage: python benchmarks/bench_bulk_insert.py [--rows 20000] [--batch-size 500] [--overlap-jobs 5]
+
+Both paths write generated items into a throwaway SQLite database and
+report rows/sec. The overlap run then has --overlap-jobs jobs scrape the
+same items again and reports how many content rows back their links.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "app"))
+
+_tmp_dir = tempfile.mkdtemp(prefix="bench_bulk_insert_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+
+from sqlalchemy import func, select  # noqa: E402
+
+from content_store import content_row  # noqa: E402
+from database import AsyncSessionLocal, ContentItem, ScrapingJob, ScrapedItem, init_db  # noqa: E402
+from pipeline import ItemWriter, item_row  # noqa: E402
+
+
+def make_items(count: int, start: int = 0):
+    return [
+        {
+            'title': f'Benchmark item {i}',
+            'description': 'Generated item used to measure insert throughput. ' * 3,
+            'url': f'https://example.com/item/{i}',
+            'price': f'₹{1000 + i:,}',
+            'rating': f'{3 + (i % 20) / 10:.1f}/5',
+            'date': '2025-01-01T00:00:00',
+            'additional_data': {'source': f'site-{i % 7}', 'position': i},
+        }
+        for i in range(start, start + count)
+    ]
+
+
+async def create_job() -> int:
+    async with AsyncSessionLocal() as db:
+        job = ScrapingJob(query="benchmark", max_results=0, status="running")
+        db.add(job)
+        await db.commit()
+        return job.id
+
+
+async def per_object_insert(items) -> float:
+    """The original path: one ORM object per item (and its content) and a single commit at the end"""
+    job_id = await create_job()
+    start = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        for item_data in items:
+            db.add(ScrapedItem(job_id=job_id, content=ContentItem(**content_row(item_row(job_id, item_data)))))
+        await db.commit()
+    return time.perf_counter() - start
+
+
+async def batched_insert(items, batch_size: int) -> float:
+    job_id = await create_job()
+    start = time.perf_counter()
+    writer = ItemWriter(job_id, batch_size=batch_size)
+    await writer.add_many(items)
+    await writer.flush()
+    return time.perf_counter() - start
+
+
+async def overlapping_jobs(items, jobs: int, batch_size: int) -> dict:
+    """Write the same items for several jobs; they should share one set of content rows"""
+    async with AsyncSessionLocal() as db:
+        contents_before = await db.scalar(select(func.count(ContentItem.id)))
+    for _ in range(jobs):
+        await batched_insert(items, batch_size)
+    async with AsyncSessionLocal() as db:
+        contents = await db.scalar(select(func.count(ContentItem.id))) - contents_before
+    return {"jobs": jobs, "links": jobs * len(items), "content_rows": contents}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--overlap-jobs", type=int, default=5)
+    args = parser.parse_args()
+
+    await init_db()
+    # Each path gets items no job has stored yet
+    results = {
+        "per_object": await per_object_insert(make_items(args.rows)),
+        f"batched_{args.batch_size}": await batched_insert(make_items(args.rows, args.rows), args.batch_size),
+    }
+
+    print(f"{'path':<20} {'seconds':>10} {'rows/sec':>12}")
+    for name, seconds in results.items():
+        print(f"{name:<20} {seconds:>10.3f} {args.rows / seconds:>12.0f}")
+
+    if args.overlap_jobs:
+        overlap = await overlapping_jobs(make_items(args.rows, 2 * args.rows), args.overlap_jobs, args.batch_size)
+        print(f"\n{overlap['jobs']} jobs with the same items: {overlap['links']} links, "
+              f"{overlap['content_rows']} content rows")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
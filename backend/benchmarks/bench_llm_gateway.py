@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Rate-limit adherence, concurrency and cache hit rate of the LLM gateway, offline.
+
+Usage:
+    python benchmarks/bench_llm_gateway.py [--jobs 20] [--calls-per-job 6]
+        [--rpm 120] [--tpm 0] [--concurrency 4] [--latency-ms 200] [--fail-every 0]
+
+Each simulated job makes --calls-per-job calls to a FakeLLM through one shared
+LLMGateway. A first pass runs with an empty prompt cache; a second pass replays
+the same prompts and should be answered from the cache. The script checks
+that no 60 second window exceeded --rpm and that no more than --concurrency
+calls were in flight at once, and prints a JSON report.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "app"))
+
+from llm_gateway import FakeLLM, LLMGateway  # noqa: E402
+
+
+class InstrumentedLLM(FakeLLM):
+    """FakeLLM that records when each call started and how many overlapped"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.started = []
+        self.active = 0
+        self.peak_active = 0
+
+    async def ainvoke(self, messages, output_format=None):
+        self.started.append(time.monotonic())
+        self.active += 1
+        self.peak_active = max(self.peak_active, self.active)
+        try:
+            return await super().ainvoke(messages, output_format)
+        finally:
+            self.active -= 1
+
+
+def max_in_window(timestamps, window: float) -> int:
+    ordered = sorted(timestamps)
+    best, start = 0, 0
+    for end, stamp in enumerate(ordered):
+        while stamp - ordered[start] >= window:
+            start += 1
+        best = max(best, end - start + 1)
+    return best
+
+
+async def run_pass(gateway: LLMGateway, args) -> dict:
+    async def job(job_id: int):
+        llm = gateway.for_job(job_id)
+        for step in range(args.calls_per_job):
+            await llm.ainvoke([f"Job {job_id}, step {step}: extract the products on this page"])
+        return llm.usage
+
+    started = time.perf_counter()
+    usages = await asyncio.gather(*(job(job_id) for job_id in range(args.jobs)))
+    return {
+        "seconds": round(time.perf_counter() - started, 3),
+        "calls": sum(usage.calls for usage in usages),
+        "cached_calls": sum(usage.cached_calls for usage in usages),
+        "prompt_tokens": sum(usage.prompt_tokens for usage in usages),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--calls-per-job", type=int, default=6)
+    parser.add_argument("--rpm", type=float, default=120)
+    parser.add_argument("--tpm", type=float, default=0)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--fail-every", type=int, default=0, help="inject a rate-limit error every N calls")
+    args = parser.parse_args()
+
+    llm = InstrumentedLLM(latency=args.latency_ms / 1000, fail_every=args.fail_every)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        gateway = LLMGateway(llm, requests_per_minute=args.rpm, tokens_per_minute=args.tpm,
+                             max_concurrency=args.concurrency, cache_dir=cache_dir)
+        cold = await run_pass(gateway, args)
+        provider_calls = len(llm.started)
+        warm = await run_pass(gateway, args)
+
+    stats = gateway.stats()
+    peak_per_minute = max_in_window(llm.started, 60.0)
+    report = {
+        "cold": cold,
+        "warm": warm,
+        "provider_calls": len(llm.started),
+        "cold_provider_calls": provider_calls,
+        "peak_requests_per_minute": peak_per_minute,
+        "rpm_limit": args.rpm,
+        "peak_concurrency": llm.peak_active,
+        "concurrency_limit": args.concurrency,
+        "retries": stats["retries_total"],
+        "rate_limit_wait_seconds": round(stats["rate_limit_wait_seconds"], 3),
+        "cache_hit_rate": round(stats["cache_hits"] / max(1, stats["cache_hits"] + stats["cache_misses"]), 3),
+    }
+    print(json.dumps(report, indent=2))
+
+    ok = llm.peak_active <= args.concurrency and (not args.rpm or peak_per_minute <= args.rpm)
+    if not ok:
+        print("FAIL: the gateway let more requests through than its limits allow", file=sys.stderr)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
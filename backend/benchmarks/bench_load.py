@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""Offline load test of the API: job submission, listing, item pages, exports and WebSocket fan-out.
+
+Usage:
+    python benchmarks/bench_load.py [--jobs 40] [--max-results 15] [--concurrency 8]
+        [--job-concurrency 4] [--agent-steps 3] [--llm-latency-ms 50] [--description-chars 200]
+        [--ws-clients 20] [--requests 200] [--export-requests 40]
+        [--output results.json] [--baseline previous.json] [--tolerance 0.25]
+
+The FastAPI app runs in this process against a throwaway SQLite database and
+is called through its ASGI interface, so the numbers cover main.py, the
+database layer and the job pipeline without network noise. Agents are
+replaced by FakeAgent, which makes --agent-steps calls to a FakeLLM
+(--llm-latency-ms each) and returns the items its task asks for, so no API
+key or browser is needed.
+
+Phases run in order with --concurrency requests in flight: submit jobs (while
+--ws-clients WebSocket clients subscribed to every job receive the progress
+and item fan-out), wait for the jobs, then list jobs, job details, item
+pages, /metrics and CSV/Excel exports (Excel only when openpyxl is
+installed). The JSON report gives throughput, p50/p99 latency and peak RSS
+for each phase. With --baseline (an earlier report) the script exits 1 when a
+phase's p99 or throughput is worse than the baseline by more than
+--tolerance.
+"""
+import argparse
+import asyncio
+import contextlib
+import importlib.util
+import json
+import math
+import os
+import re
+import resource
+import sys
+import tempfile
+import time
+import zlib
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=40)
+    parser.add_argument("--max-results", type=int, default=15)
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight at once")
+    parser.add_argument("--job-concurrency", type=int, default=4, help="jobs the scheduler runs at once")
+    parser.add_argument("--agent-steps", type=int, default=3, help="LLM calls per fake agent run")
+    parser.add_argument("--llm-latency-ms", type=float, default=50)
+    parser.add_argument("--description-chars", type=int, default=200, help="size of each fake item's description")
+    parser.add_argument("--ws-clients", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200, help="requests per read phase")
+    parser.add_argument("--export-requests", type=int, default=40, help="requests per export phase")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds to wait for the jobs")
+    parser.add_argument("--output", help="also write the report to this file")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    return parser.parse_args()
+
+
+args = parse_args()
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "app"))
+
+# Configure the app before it is imported: throwaway database, fake LLM, no browsers, no quotas
+_tmp_dir = tempfile.mkdtemp(prefix="bench_load_")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}",
+    "DB_AUTO_CREATE": "true",
+    "EMBEDDED_WORKER": "true",
+    "PROGRESS_BROKER_URL": "memory://",
+    "LLM_BACKEND": "fake",
+    "LLM_REQUESTS_PER_MINUTE": "0",
+    "LLM_TOKENS_PER_MINUTE": "0",
+    "LLM_CACHE_DIR": "",
+    "BROWSER_POOL_SIZE": "0",
+    "RESULT_CACHE_TTL_SECONDS": "0",
+    "MAX_CONCURRENT_JOBS": str(args.job_concurrency),
+    "MAX_AGENT_SESSIONS": str(args.job_concurrency),
+    "MAX_QUEUED_JOBS": str(max(1000, args.jobs)),
+    "EXPORT_DIR": os.path.join(_tmp_dir, "exports"),
+})
+os.environ.pop("ASYNC_DATABASE_URL", None)
+
+from sqlalchemy import func, select  # noqa: E402
+
+import main  # noqa: E402
+from database import AsyncSessionLocal, ScrapingJob  # noqa: E402
+from llm_gateway import FakeLLM, LLMGateway  # noqa: E402
+from scraper import EnhancedAIWebScraper  # noqa: E402
+
+TASK_RE = re.compile(r'Search for "(?P<query>.*?)" and extract exactly (?P<count>\d+) items')
+
+
+def fake_items(messages, output_format) -> str:
+    """FakeLLM responder: the items the task asks for, different for every query and shard"""
+    task = str(messages[-1])
+    match = TASK_RE.search(task)
+    query, count = (match.group("query"), int(match.group("count"))) if match else ("item", 10)
+    seed = zlib.crc32(task.encode("utf-8"))
+    slug = re.sub(r"\W+", "-", query.lower()).strip("-")
+    filler = ("Deterministic benchmark description. " * (args.description_chars // 37 + 1))[:args.description_chars]
+    return json.dumps([
+        {
+            "title": f"{query} product {i}",
+            "price": f"${10 + (seed + i) % 490}.99",
+            "rating": f"{3 + (seed + i) % 20 / 10:.1f}/5",
+            "url": f"https://shop{i % 5}.example.com/{slug}/{seed}-{i}",
+            "description": f"{query} {i}: {filler}",
+        }
+        for i in range(count)
+    ])
+
+
+class FakeHistory:
+    def __init__(self, result):
+        self.result = result
+
+    def final_result(self):
+        return self.result
+
+
+class FakeAgent:
+    """Stands in for browser_use.Agent: ``steps`` LLM calls, then the last answer as the result"""
+
+    steps = args.agent_steps
+
+    def __init__(self, task, llm, browser_session=None):
+        self.task = task
+        self.llm = llm
+
+    async def run(self):
+        result = None
+        for step in range(max(1, self.steps)):
+            response = await self.llm.ainvoke([f"Step {step + 1}/{self.steps}", self.task])
+            result = response.completion
+        return FakeHistory(result)
+
+
+class AsgiClient:
+    """Calls the app's ASGI interface directly, like an HTTP client without the network"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def request(self, method: str, path: str, body=None):
+        path, _, query = path.partition("?")
+        data = json.dumps(body).encode("utf-8") if body is not None else b""
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+            "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+            "root_path": "", "headers": [(b"host", b"bench"), (b"content-type", b"application/json"),
+                                         (b"content-length", str(len(data)).encode())],
+            "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+        }
+        request_sent = False
+        disconnected = asyncio.Event()
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": data, "more_body": False}
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        response = {"status": 0, "size": 0, "body": b""}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                chunk = message.get("body", b"")
+                response["size"] += len(chunk)
+                if response["size"] <= 1 << 20:
+                    response["body"] += chunk
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            disconnected.set()
+        return response["status"], response["body"]
+
+
+class AsgiWebSocket:
+    """A WebSocket client on the app's ASGI interface that counts what it receives"""
+
+    def __init__(self, app, path: str = "/ws"):
+        self.app = app
+        self.path = path
+        self.messages = 0
+        self.bytes = 0
+        self.finished = {}  # job_id -> when its final status arrived
+        self.all_finished = asyncio.Event()
+        self.expected_jobs = None
+        self._incoming = asyncio.Queue()
+        self._accepted = asyncio.Event()
+        self._task = None
+
+    async def open(self):
+        scope = {"type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws", "path": self.path,
+                 "raw_path": self.path.encode(), "query_string": b"", "root_path": "",
+                 "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 50001),
+                 "server": ("bench", 80), "subprotocols": []}
+        self._task = asyncio.create_task(self.app(scope, self._incoming.get, self._send))
+        self._incoming.put_nowait({"type": "websocket.connect"})
+        await self._accepted.wait()
+
+    def send_json(self, data):
+        self._incoming.put_nowait({"type": "websocket.receive", "text": json.dumps(data)})
+
+    async def _send(self, message):
+        if message["type"] == "websocket.accept":
+            self._accepted.set()
+        elif message["type"] == "websocket.send":
+            text = message.get("text") or ""
+            self.messages += 1
+            self.bytes += len(text)
+            payload = json.loads(text)
+            if payload.get("type") == "progress" and payload.get("status") in ("completed", "failed"):
+                self.finished.setdefault(payload["job_id"], time.perf_counter())
+                if self.expected_jobs is not None and self.expected_jobs <= self.finished.keys():
+                    self.all_finished.set()
+
+    def expect(self, job_ids):
+        self.expected_jobs = set(job_ids)
+        if self.expected_jobs <= self.finished.keys():
+            self.all_finished.set()
+
+    async def close(self):
+        self._incoming.put_nowait({"type": "websocket.disconnect", "code": 1000})
+        await asyncio.gather(self._task, return_exceptions=True)
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))]
+
+
+def summarize(latencies, errors: int, seconds: float) -> dict:
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "throughput_per_sec": round(len(latencies) / seconds, 1) if seconds else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies, default=0) * 1000, 2),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+async def run_phase(client: AsgiClient, count: int, concurrency: int, make_request, on_response=None) -> dict:
+    """Send ``count`` requests built by ``make_request(i) -> (method, path, body)``, ``concurrency`` at a time"""
+    latencies = []
+    errors = 0
+    indexes = iter(range(count))
+
+    async def worker():
+        nonlocal errors
+        for index in indexes:
+            method, path, body = make_request(index)
+            started = time.perf_counter()
+            status, content = await client.request(method, path, body)
+            latencies.append(time.perf_counter() - started)
+            if status >= 400:
+                errors += 1
+            elif on_response is not None:
+                on_response(index, content, started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+async def run_benchmark() -> dict:
+    client = AsgiClient(main.app)
+    phases = {}
+    # Warm up (first database connection, lazy imports) so it does not count against the first phase
+    await client.request("GET", "/api/scraping/jobs?limit=1")
+
+    sockets = [AsgiWebSocket(main.app) for _ in range(args.ws_clients)]
+    for socket in sockets:
+        await socket.open()
+        socket.send_json({"action": "subscribe", "job_ids": ["*"]})
+    await asyncio.sleep(0.05)
+
+    submitted = {}  # job_id -> submit time
+
+    def record_job(index, content, started):
+        submitted[json.loads(content)["id"]] = started
+
+    jobs_started = time.perf_counter()
+    phases["submit"] = await run_phase(
+        client, args.jobs, args.concurrency,
+        lambda i: ("POST", "/api/scraping/start", {"query": f"benchmark query {i}", "max_results": args.max_results}),
+        record_job,
+    )
+
+    # The first socket also tracks when each job finished
+    tracker = sockets[0] if sockets else AsgiWebSocket(main.app)
+    if not sockets:
+        await tracker.open()
+        tracker.send_json({"action": "subscribe", "job_ids": ["*"]})
+    tracker.expect(submitted)
+    try:
+        await asyncio.wait_for(tracker.all_finished.wait(), args.timeout)
+    except asyncio.TimeoutError:
+        print(f"Timed out after {args.timeout}s with {len(tracker.finished)}/{len(submitted)} jobs finished",
+              file=sys.stderr)
+    jobs_seconds = time.perf_counter() - jobs_started
+
+    async with AsyncSessionLocal() as db:
+        counts = dict((await db.execute(
+            select(ScrapingJob.status, func.count(ScrapingJob.id)).group_by(ScrapingJob.status)
+        )).all())
+        items = await db.scalar(select(func.coalesce(func.sum(ScrapingJob.results_count), 0))) or 0
+    job_latencies = [tracker.finished[job_id] - started for job_id, started in submitted.items()
+                     if job_id in tracker.finished]
+    phases["jobs"] = {
+        "jobs": len(submitted),
+        "completed": counts.get("completed", 0),
+        "failed": counts.get("failed", 0),
+        "items": items,
+        "seconds": round(jobs_seconds, 3),
+        "throughput_per_sec": round(len(job_latencies) / jobs_seconds, 2) if jobs_seconds else 0.0,
+        "items_per_sec": round(items / jobs_seconds, 1) if jobs_seconds else 0.0,
+        "p50_ms": round(percentile(job_latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(job_latencies, 99) * 1000, 2),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    phases["websocket"] = {
+        "clients": len(sockets),
+        "messages_per_client": round(sum(s.messages for s in sockets) / len(sockets), 1) if sockets else 0,
+        "min_messages": min((s.messages for s in sockets), default=0),
+        "bytes_total": sum(s.bytes for s in sockets),
+        "dropped": sum(connection.dropped for connection in main.manager.connections.values()),
+        "throughput_per_sec": round(sum(s.messages for s in sockets) / jobs_seconds, 1) if jobs_seconds else 0.0,
+    }
+    for socket in sockets if sockets else [tracker]:
+        await socket.close()
+
+    job_ids = sorted(submitted)
+    if not job_ids:
+        return phases
+    pick = lambda i: job_ids[i % len(job_ids)]  # noqa: E731
+    item_queries = ["sort=id&limit=20", "sort=-price&limit=20", "sort=rating&min_price=100&limit=20",
+                    "q=product&limit=20", "domain=shop1.example.com&limit=20"]
+
+    phases["list_jobs"] = await run_phase(
+        client, args.requests, args.concurrency, lambda i: ("GET", "/api/scraping/jobs?limit=50", None))
+    phases["job_details"] = await run_phase(
+        client, args.requests, args.concurrency, lambda i: ("GET", f"/api/scraping/jobs/{pick(i)}", None))
+    phases["item_pages"] = await run_phase(
+        client, args.requests, args.concurrency,
+        lambda i: ("GET", f"/api/scraping/jobs/{pick(i)}/items?{item_queries[i % len(item_queries)]}", None))
+    phases["metrics"] = await run_phase(
+        client, args.requests, args.concurrency, lambda i: ("GET", "/metrics", None))
+    phases["export_csv"] = await run_phase(
+        client, args.export_requests, args.concurrency,
+        lambda i: ("GET", f"/api/scraping/jobs/{pick(i)}/export/csv", None))
+    if importlib.util.find_spec("openpyxl") is not None:
+        # The first export of each completed job writes the workbook; later ones reuse the cached file
+        phases["export_excel"] = await run_phase(
+            client, args.export_requests, args.concurrency,
+            lambda i: ("GET", f"/api/scraping/jobs/{pick(i)}/export/excel", None))
+    return phases
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    """Phases whose p99 latency rose or throughput fell by more than ``tolerance`` against ``baseline``"""
+    regressions = []
+    for name, phase in report["phases"].items():
+        old = baseline.get("phases", {}).get(name)
+        if not old:
+            continue
+        if old.get("p99_ms") and phase.get("p99_ms", 0) > old["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p99 {old['p99_ms']} -> {phase['p99_ms']} ms")
+        if old.get("throughput_per_sec") and phase.get("throughput_per_sec", 0) < old["throughput_per_sec"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {old['throughput_per_sec']} -> {phase['throughput_per_sec']}/s")
+    return regressions
+
+
+async def main_async() -> dict:
+    # A gateway on a deterministic fake model, and fake agents instead of browser-use
+    main.scraper = EnhancedAIWebScraper(
+        result_cache=main.result_cache, browser_pool=main.browser_pool,
+        gateway=LLMGateway(FakeLLM(responder=fake_items, latency=args.llm_latency_ms / 1000)),
+        agent_class=FakeAgent,
+    )
+    async with main.lifespan(main.app):
+        return await run_benchmark()
+
+
+def run() -> int:
+    # Keep stdout for the report; the app's own log lines go to stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        phases = asyncio.run(main_async())
+    report = {
+        "config": {name: value for name, value in vars(args).items()
+                   if name not in ("output", "baseline", "tolerance", "timeout")},
+        "phases": phases,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+    failed = phases.get("jobs", {}).get("completed", 0) < phases.get("jobs", {}).get("jobs", 0)
+    if failed:
+        print("FAIL: not every job completed", file=sys.stderr)
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if failed or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Throughput of the agent output parser over the recorded corpus.
+
+Usage: python benchmarks/bench_parser.py [--items 5000] [--repeat 5] [--json]
+
+Every file in benchmarks/corpus/ is a recorded agent final result. Each one is
+parsed as-is, and the items it yields are also re-rendered in the same format
+at --items scale to measure throughput on large outputs. Peak memory comes
+from tracemalloc over a single parse.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "app"))
+
+from result_parser import parse_agent_output  # noqa: E402
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+
+def render(items, style: str, count: int) -> str:
+    """Repeat ``items`` up to ``count`` entries in the given output style"""
+    rows = [dict(items[i % len(items)], title=f"{items[i % len(items)].get('title')} #{i}") for i in range(count)]
+    if style == "json":
+        return json.dumps([{**{k: v for k, v in row.items() if k != 'additional_data'},
+                            **row.get('additional_data', {})} for row in rows])
+    if style == "table":
+        lines = ["| Name | Price | Rating | Link |", "|---|---|---|---|"]
+        lines += [f"| {r.get('title')} | {r.get('price') or ''} | {r.get('rating') or ''} | {r.get('url') or ''} |"
+                  for r in rows]
+        return "\n".join(lines)
+    lines = []
+    for i, r in enumerate(rows, 1):
+        lines.append(f"{i}. **{r.get('title')}**")
+        for label, key in (("Price", "price"), ("Description", "description"), ("Website", "url"), ("Rating", "rating")):
+            if r.get(key):
+                lines.append(f"   - {label}: {r[key]}")
+    return "\n".join(lines)
+
+
+def style_for(name: str) -> str:
+    if "table" in name:
+        return "table"
+    if "list" in name:
+        return "list"
+    return "json"
+
+
+def measure(text: str, repeat: int) -> dict:
+    best = float("inf")
+    count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = sum(1 for _ in parse_agent_output(text))
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    for _ in parse_agent_output(text):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "bytes": len(text.encode("utf-8")),
+        "items": count,
+        "seconds": best,
+        "items_per_sec": count / best if best else 0.0,
+        "mb_per_sec": len(text.encode("utf-8")) / best / 1e6 if best else 0.0,
+        "peak_kb": peak / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=5000, help="items in the scaled-up variant of each sample")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    results = {}
+    for path in sorted(glob.glob(os.path.join(CORPUS_DIR, "*.txt"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        items = list(parse_agent_output(text))
+        if not items:
+            print(f"warning: {name} produced no items", file=sys.stderr)
+            continue
+        results[name] = measure(text, args.repeat)
+        results[f"{name}@{args.items}"] = measure(render(items, style_for(name), args.items), args.repeat)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'sample':<28} {'items':>7} {'KB':>9} {'ms':>9} {'items/s':>10} {'MB/s':>7} {'peak KB':>9}")
+    for name, r in results.items():
+        print(f"{name:<28} {r['items']:>7} {r['bytes'] / 1024:>9.1f} {r['seconds'] * 1000:>9.2f} "
+              f"{r['items_per_sec']:>10.0f} {r['mb_per_sec']:>7.1f} {r['peak_kb']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Measure how long importing the API application takes, with a regression budget.
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--budget-ms 1500] [--top 15]
+
+Each run imports ``main`` in a fresh interpreter under ``python -X importtime``
+against a throwaway SQLite database. The script reports the median cumulative
+import time and the slowest top-level imports, and exits non-zero when the
+median exceeds the budget or when a dependency that must load lazily
+(browser_use, pandas, openpyxl, playwright) is imported at startup.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(BACKEND_DIR, "app")
+
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "1500"))
+# Only needed once a job runs or an export is requested
+LAZY_MODULES = ("browser_use", "pandas", "openpyxl", "playwright")
+
+
+def import_times(module: str, env: dict) -> dict:
+    """Import ``module`` in a fresh interpreter; map each imported module to its cumulative microseconds.
+
+    Only the first occurrence of a name is kept, with its nesting depth, so
+    top-level imports can be told apart from their dependencies.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=APP_DIR, env=env, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{completed.stderr[-2000:]}")
+
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        times.setdefault(name.strip(), (int(cumulative), depth))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="main", help="Module to import from backend/app")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest top-level imports to list")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_startup_'), 'bench.db')}"
+    env.pop("ASYNC_DATABASE_URL", None)
+    env.setdefault("GOOGLE_API_KEY", "bench-startup-placeholder")
+
+    # Warm-up run so bytecode compilation is not counted
+    import_times(args.module, env)
+    runs = [import_times(args.module, env) for _ in range(args.runs)]
+
+    totals_ms = [run[args.module][0] / 1000 for run in runs]
+    median_ms = statistics.median(totals_ms)
+    last = runs[-1]
+    top_level = sorted(
+        ((name, cumulative / 1000) for name, (cumulative, depth) in last.items() if depth == 1),
+        key=lambda entry: entry[1], reverse=True,
+    )
+    eager = sorted({
+        name for name in last
+        if name.split(".")[0] in LAZY_MODULES
+    })
+
+    report = {
+        "module": args.module,
+        "runs": args.runs,
+        "median_ms": round(median_ms, 1),
+        "min_ms": round(min(totals_ms), 1),
+        "max_ms": round(max(totals_ms), 1),
+        "budget_ms": args.budget_ms,
+        "slowest_imports_ms": {name: round(ms, 1) for name, ms in top_level[:args.top]},
+        "eager_heavy_imports": eager,
+    }
+    print(json.dumps(report, indent=2))
+
+    failures = []
+    if median_ms > args.budget_ms:
+        failures.append(f"median import time {median_ms:.0f} ms exceeds the {args.budget_ms:.0f} ms budget")
+    if eager:
+        failures.append(f"imported at startup but should load lazily: {', '.join(eager[:10])}")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Initial schema: scraping jobs and scraped items, as created by the app before migrations existed
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "scraping_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("query", sa.String(500)),
+        sa.Column("status", sa.String(20)),
+        sa.Column("max_results", sa.Integer()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("completed_at", sa.DateTime(), nullable=True),
+        sa.Column("results_count", sa.Integer()),
+        sa.Column("results_file", sa.String(200), nullable=True),
+        sa.Column("error_message", sa.Text(), nullable=True),
+    )
+    op.create_index("ix_scraping_jobs_id", "scraping_jobs", ["id"])
+    op.create_index("ix_scraping_jobs_query", "scraping_jobs", ["query"])
+
+    op.create_table(
+        "scraped_items",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String(500)),
+        sa.Column("description", sa.Text()),
+        sa.Column("url", sa.String(1000)),
+        sa.Column("price", sa.String(100)),
+        sa.Column("rating", sa.String(50)),
+        sa.Column("date", sa.String(100)),
+        sa.Column("additional_data", sa.Text()),
+        sa.Column("job_id", sa.Integer(), sa.ForeignKey("scraping_jobs.id")),
+    )
+    op.create_index("ix_scraped_items_id", "scraped_items", ["id"])
+
+
+def downgrade():
+    op.drop_table("scraped_items")
+    op.drop_table("scraping_jobs")
@@ -0,0 +1,27 @@
+"""Job scheduling columns: priority and start time
+
+Revision ID: 0001a
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001a"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("scraping_jobs") as batch:
+        batch.add_column(sa.Column("priority", sa.Integer(), nullable=True))
+        batch.add_column(sa.Column("started_at", sa.DateTime(), nullable=True))
+    jobs = sa.table("scraping_jobs", sa.column("priority", sa.Integer()))
+    op.execute(sa.update(jobs).values(priority=0))
+
+
+def downgrade():
+    with op.batch_alter_table("scraping_jobs") as batch:
+        batch.drop_column("started_at")
+        batch.drop_column("priority")
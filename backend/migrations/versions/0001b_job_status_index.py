@@ -0,0 +1,20 @@
+"""Index job status for filtered job listings
+
+Revision ID: 0001b
+Revises: 0001a
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0001b"
+down_revision = "0001a"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_scraping_jobs_status", "scraping_jobs", ["status"])
+
+
+def downgrade():
+    op.drop_index("ix_scraping_jobs_status", table_name="scraping_jobs")
@@ -0,0 +1,25 @@
+"""Source job of results copied from another job
+
+Revision ID: 0001c
+Revises: 0001b
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001c"
+down_revision = "0001b"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("scraping_jobs") as batch:
+        batch.add_column(sa.Column("source_job_id", sa.Integer(), nullable=True))
+        batch.create_foreign_key("fk_scraping_jobs_source_job_id", "scraping_jobs", ["source_job_id"], ["id"])
+
+
+def downgrade():
+    with op.batch_alter_table("scraping_jobs") as batch:
+        batch.drop_constraint("fk_scraping_jobs_source_job_id", type_="foreignkey")
+        batch.drop_column("source_job_id")
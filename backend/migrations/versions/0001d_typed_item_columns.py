@@ -0,0 +1,94 @@
+"""Typed price/rating/domain columns on scraped items, and additional_data stored as JSON
+
+Revision ID: 0001d
+Revises: 0001c
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+from normalization import parse_price, parse_rating, source_domain
+
+revision = "0001d"
+down_revision = "0001c"
+branch_labels = None
+depends_on = None
+
+# Rows updated per round trip while backfilling
+BATCH_SIZE = 1000
+
+TYPED_COLUMNS = [
+    ("price_amount", sa.Float()),
+    ("price_currency", sa.String(8)),
+    ("rating_value", sa.Float()),
+    ("rating_scale", sa.Float()),
+    ("source_domain", sa.String(255)),
+]
+ITEM_INDEXES = [
+    ("ix_scraped_items_job_id", ["job_id"]),
+    ("ix_scraped_items_job_price", ["job_id", "price_amount"]),
+    ("ix_scraped_items_job_rating", ["job_id", "rating_value"]),
+    ("ix_scraped_items_job_source", ["job_id", "source_domain"]),
+]
+
+
+def _backfill_typed_values(bind):
+    """Parse the typed values of items stored before the columns existed"""
+    items = sa.table(
+        "scraped_items",
+        sa.column("id", sa.Integer()),
+        sa.column("url", sa.String()),
+        sa.column("price", sa.String()),
+        sa.column("rating", sa.String()),
+        *(sa.column(name, type_) for name, type_ in TYPED_COLUMNS),
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(items.c.id, items.c.url, items.c.price, items.c.rating)
+            .where(items.c.id > last_id)
+            .order_by(items.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        values = []
+        for item_id, url, price, rating in rows:
+            price_amount, price_currency = parse_price(price)
+            rating_value, rating_scale = parse_rating(rating)
+            values.append({
+                "item_id": item_id, "price_amount": price_amount, "price_currency": price_currency,
+                "rating_value": rating_value, "rating_scale": rating_scale, "source_domain": source_domain(url),
+            })
+        bind.execute(
+            sa.update(items).where(items.c.id == sa.bindparam("item_id"))
+            .values({name: sa.bindparam(name) for name, _ in TYPED_COLUMNS}),
+            values,
+        )
+        last_id = rows[-1].id
+
+
+def upgrade():
+    bind = op.get_bind()
+    with op.batch_alter_table("scraped_items") as batch:
+        for name, type_ in TYPED_COLUMNS:
+            batch.add_column(sa.Column(name, type_, nullable=True))
+        # Rows already hold JSON text written with json.dumps
+        batch.alter_column("additional_data", existing_type=sa.Text(),
+                           type_=sa.JSON().with_variant(JSONB(), "postgresql"),
+                           postgresql_using="additional_data::jsonb")
+    _backfill_typed_values(bind)
+    with op.batch_alter_table("scraped_items") as batch:
+        for name, columns in ITEM_INDEXES:
+            batch.create_index(name, columns)
+
+
+def downgrade():
+    with op.batch_alter_table("scraped_items") as batch:
+        for name, _ in ITEM_INDEXES:
+            batch.drop_index(name)
+        batch.alter_column("additional_data", existing_type=sa.JSON().with_variant(JSONB(), "postgresql"),
+                           type_=sa.Text(), postgresql_using="additional_data::text")
+        for name, _ in reversed(TYPED_COLUMNS):
+            batch.drop_column(name)
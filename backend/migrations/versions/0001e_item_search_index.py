@@ -0,0 +1,23 @@
+"""Full-text search index over item titles and descriptions
+
+Revision ID: 0001e
+Revises: 0001d
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+from database import create_search_index, drop_search_index
+
+revision = "0001e"
+down_revision = "0001d"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Backfilled from the items already stored
+    create_search_index(op.get_bind(), "scraped_items")
+
+
+def downgrade():
+    drop_search_index(op.get_bind(), "scraped_items")
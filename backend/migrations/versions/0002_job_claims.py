@@ -0,0 +1,29 @@
+"""Job claim columns for external scraping workers
+
+Revision ID: 0002
+Revises: 0001e
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001e"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("scraping_jobs") as batch:
+        batch.add_column(sa.Column("queue_key", sa.Float(), nullable=True))
+        batch.add_column(sa.Column("worker_id", sa.String(100), nullable=True))
+        batch.add_column(sa.Column("lease_expires_at", sa.DateTime(), nullable=True))
+    op.create_index("ix_scraping_jobs_status_queue_key", "scraping_jobs", ["status", "queue_key"])
+
+
+def downgrade():
+    op.drop_index("ix_scraping_jobs_status_queue_key", table_name="scraping_jobs")
+    with op.batch_alter_table("scraping_jobs") as batch:
+        batch.drop_column("lease_expires_at")
+        batch.drop_column("worker_id")
+        batch.drop_column("queue_key")
@@ -0,0 +1,42 @@
+"""Job heartbeats, retry scheduling and attempt history
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("scraping_jobs") as batch:
+        batch.add_column(sa.Column("heartbeat_at", sa.DateTime(), nullable=True))
+        batch.add_column(sa.Column("attempts", sa.Integer(), nullable=True))
+        batch.add_column(sa.Column("next_attempt_at", sa.DateTime(), nullable=True))
+
+    op.create_table(
+        "job_attempts",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("job_id", sa.Integer(), sa.ForeignKey("scraping_jobs.id")),
+        sa.Column("attempt", sa.Integer()),
+        sa.Column("worker_id", sa.String(100), nullable=True),
+        sa.Column("started_at", sa.DateTime()),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.Column("outcome", sa.String(20), nullable=True),
+        sa.Column("error_message", sa.Text(), nullable=True),
+    )
+    op.create_index("ix_job_attempts_job_id", "job_attempts", ["job_id"])
+
+
+def downgrade():
+    op.drop_index("ix_job_attempts_job_id", table_name="job_attempts")
+    op.drop_table("job_attempts")
+    with op.batch_alter_table("scraping_jobs") as batch:
+        batch.drop_column("next_attempt_at")
+        batch.drop_column("attempts")
+        batch.drop_column("heartbeat_at")
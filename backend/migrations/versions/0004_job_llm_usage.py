@@ -0,0 +1,29 @@
+"""Per-job LLM call and token counts
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("scraping_jobs") as batch:
+        batch.add_column(sa.Column("llm_calls", sa.Integer(), nullable=True))
+        batch.add_column(sa.Column("llm_cached_calls", sa.Integer(), nullable=True))
+        batch.add_column(sa.Column("llm_prompt_tokens", sa.Integer(), nullable=True))
+        batch.add_column(sa.Column("llm_completion_tokens", sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("scraping_jobs") as batch:
+        batch.drop_column("llm_completion_tokens")
+        batch.drop_column("llm_prompt_tokens")
+        batch.drop_column("llm_cached_calls")
+        batch.drop_column("llm_calls")
@@ -0,0 +1,158 @@
+"""Content-addressed item store: scraped items become links to shared content rows
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+from content_store import content_row
+from database import create_search_index, drop_search_index
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+# Rows moved per round trip while backfilling
+BATCH_SIZE = 1000
+
+ITEM_COLUMNS = [
+    ("title", sa.String(500)),
+    ("description", sa.Text()),
+    ("url", sa.String(1000)),
+    ("price", sa.String(100)),
+    ("rating", sa.String(50)),
+    ("date", sa.String(100)),
+    ("additional_data", sa.JSON().with_variant(JSONB(), "postgresql")),
+    ("price_amount", sa.Float()),
+    ("price_currency", sa.String(8)),
+    ("rating_value", sa.Float()),
+    ("rating_scale", sa.Float()),
+    ("source_domain", sa.String(255)),
+]
+ITEM_INDEXES = [
+    ("ix_scraped_items_job_price", ["job_id", "price_amount"]),
+    ("ix_scraped_items_job_rating", ["job_id", "rating_value"]),
+    ("ix_scraped_items_job_source", ["job_id", "source_domain"]),
+]
+# Replace the per-job indexes above for filtering and sorting on the typed values
+CONTENT_INDEXES = [
+    ("ix_content_items_price_amount", ["price_amount"]),
+    ("ix_content_items_rating_value", ["rating_value"]),
+    ("ix_content_items_source_domain", ["source_domain"]),
+]
+
+
+def _content_table():
+    return sa.table(
+        "content_items",
+        sa.column("id", sa.Integer()),
+        sa.column("content_hash", sa.String()),
+        sa.column("canonical_url", sa.String()),
+        sa.column("simhash", sa.BigInteger()),
+        sa.column("first_seen_at", sa.DateTime()),
+        *(sa.column(name, type_) for name, type_ in ITEM_COLUMNS),
+    )
+
+
+def _items_table(*columns):
+    return sa.table("scraped_items", sa.column("id", sa.Integer()), sa.column("job_id", sa.Integer()),
+                    sa.column("content_id", sa.Integer()), *columns)
+
+
+def _backfill_contents(bind):
+    """Store each existing item's content once and point the item at it"""
+    items = _items_table(*(sa.column(name, type_) for name, type_ in ITEM_COLUMNS))
+    contents = _content_table()
+    jobs = sa.table("scraping_jobs", sa.column("id", sa.Integer()), sa.column("created_at", sa.DateTime()))
+    ids = {}
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(items, jobs.c.created_at)
+            .select_from(items.outerjoin(jobs, jobs.c.id == items.c.job_id))
+            .where(items.c.id > last_id)
+            .order_by(items.c.id)
+            .limit(BATCH_SIZE)
+        ).mappings().all()
+        if not rows:
+            return
+        links = []
+        for row in rows:
+            content = content_row(dict(row))
+            if content["content_hash"] not in ids:
+                ids[content["content_hash"]] = bind.execute(
+                    sa.insert(contents).values(**content, first_seen_at=row["created_at"])
+                    .returning(contents.c.id)
+                ).scalar_one()
+            links.append({"item_id": row["id"], "content_id": ids[content["content_hash"]]})
+        bind.execute(
+            sa.update(items).where(items.c.id == sa.bindparam("item_id"))
+            .values(content_id=sa.bindparam("content_id")),
+            links,
+        )
+        last_id = rows[-1]["id"]
+
+
+def upgrade():
+    bind = op.get_bind()
+    op.create_table(
+        "content_items",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("content_hash", sa.String(64), nullable=False, unique=True),
+        sa.Column("canonical_url", sa.String(1000), nullable=True),
+        sa.Column("simhash", sa.BigInteger(), nullable=True),
+        sa.Column("first_seen_at", sa.DateTime()),
+        *(sa.Column(name, type_, nullable=True) for name, type_ in ITEM_COLUMNS),
+    )
+    op.create_index("ix_content_items_canonical_url", "content_items", ["canonical_url"])
+    for name, columns in CONTENT_INDEXES:
+        op.create_index(name, "content_items", columns)
+
+    drop_search_index(bind, "scraped_items")
+    with op.batch_alter_table("scraped_items") as batch:
+        batch.add_column(sa.Column("content_id", sa.Integer(), nullable=True))
+    _backfill_contents(bind)
+
+    with op.batch_alter_table("scraped_items") as batch:
+        for name, _ in ITEM_INDEXES:
+            batch.drop_index(name)
+        for name, _ in ITEM_COLUMNS:
+            batch.drop_column(name)
+        batch.alter_column("content_id", existing_type=sa.Integer(), nullable=False)
+        batch.create_foreign_key("fk_scraped_items_content_id", "content_items", ["content_id"], ["id"])
+        batch.create_index("ix_scraped_items_content_id", ["content_id"])
+
+    create_search_index(bind)
+
+
+def downgrade():
+    bind = op.get_bind()
+    drop_search_index(bind)
+    with op.batch_alter_table("scraped_items") as batch:
+        for name, type_ in ITEM_COLUMNS:
+            batch.add_column(sa.Column(name, type_, nullable=True))
+
+    # Copy every item's content back onto its own row
+    items = _items_table(*(sa.column(name, type_) for name, type_ in ITEM_COLUMNS))
+    contents = _content_table()
+    bind.execute(sa.update(items).values({
+        name: sa.select(getattr(contents.c, name)).where(contents.c.id == items.c.content_id).scalar_subquery()
+        for name, _ in ITEM_COLUMNS
+    }))
+
+    with op.batch_alter_table("scraped_items") as batch:
+        batch.drop_index("ix_scraped_items_content_id")
+        batch.drop_constraint("fk_scraped_items_content_id", type_="foreignkey")
+        batch.drop_column("content_id")
+        for name, columns in ITEM_INDEXES:
+            batch.create_index(name, columns)
+
+    for name, _ in CONTENT_INDEXES:
+        op.drop_index(name, table_name="content_items")
+    op.drop_index("ix_content_items_canonical_url", table_name="content_items")
+    op.drop_table("content_items")
+    create_search_index(bind, "scraped_items")
@@ -0,0 +1,24 @@
+"""Per-job profiling trace
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("scraping_jobs") as batch:
+        batch.add_column(sa.Column("profile", sa.JSON().with_variant(JSONB(), "postgresql"), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("scraping_jobs") as batch:
+        batch.drop_column("profile")
@@ -1,4 +1,5 @@
 #!/usr/bin/env python3
+import argparse
 import sys
 import os
 
@@ -6,9 +7,24 @@ import os
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, current_dir)
 
-# Now import and run the app
-from app.main import app
 import uvicorn
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="127.0.0.1", port=8000)
+    parser = argparse.ArgumentParser(description="Start the scraper API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("API_WORKERS", "1")),
+                        help="API processes; more than one requires standalone scraping workers (start_worker.py)")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        # Jobs must not run inside the API processes, and progress has to cross processes
+        os.environ["EMBEDDED_WORKER"] = "false"
+        os.environ.setdefault("PROGRESS_BROKER_URL", "sqlite:///./progress.db")
+        print(f"Starting {args.workers} API processes; run start_worker.py to process scraping jobs "
+              f"(progress broker: {os.environ['PROGRESS_BROKER_URL']})")
+        uvicorn.run("app.main:app", host=args.host, port=args.port, workers=args.workers)
+    else:
+        # Now import and run the app
+        from app.main import app
+        uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+import asyncio
+import sys
+import os
+
+# Scraping worker for multi-process deployments (see app/worker.py)
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(current_dir, "app"))
+# Same default as start_server.py --workers N, so progress reaches the API processes
+os.environ.setdefault("PROGRESS_BROKER_URL", "sqlite:///./progress.db")
+
+from worker import main
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -15,11 +15,13 @@ import { useNavigate } from 'react-router-dom';
 import axios from 'axios';
 
 const API_BASE = 'http://localhost:8001';
+const PAGE_SIZE = 30;
 
 function Dashboard() {
   const [jobs, setJobs] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
+  const [hasMore, setHasMore] = useState(false);
   
   const navigate = useNavigate();
 
@@ -27,10 +29,15 @@ function Dashboard() {
     fetchJobs();
   }, []);
 
-  const fetchJobs = async () => {
+  const fetchJobs = async (afterId = null) => {
     try {
-      const response = await axios.get(`${API_BASE}/api/scraping/jobs`);
-      setJobs(response.data);
+      const params = { limit: PAGE_SIZE };
+      if (afterId) {
+        params.after_id = afterId;
+      }
+      const response = await axios.get(`${API_BASE}/api/scraping/jobs`, { params });
+      setJobs((previous) => (afterId ? [...previous, ...response.data] : response.data));
+      setHasMore(response.data.length === PAGE_SIZE);
     } catch (err) {
       setError('Failed to fetch jobs');
     } finally {
@@ -142,6 +149,14 @@ function Dashboard() {
           ))}
         </Grid>
       )}
+
+      {hasMore && (
+        <Box sx={{ display: 'flex', justifyContent: 'center', mt: 3 }}>
+          <Button variant="outlined" onClick={() => fetchJobs(jobs[jobs.length - 1].id)}>
+            Load more
+          </Button>
+        </Box>
+      )}
     </Container>
   );
 }
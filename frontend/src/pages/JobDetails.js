@@ -11,12 +11,14 @@ import {
   LinearProgress,
   Alert,
   Link,
-  Divider
+  Divider,
+  TextField
 } from '@mui/material';
 import { useParams, useNavigate } from 'react-router-dom';
 import axios from 'axios';
 
 const API_BASE = 'http://localhost:8001';
+const ITEMS_PAGE_SIZE = 60;
 
 function JobDetails() {
   const { jobId } = useParams();
@@ -24,14 +26,54 @@ function JobDetails() {
   const [job, setJob] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
+  const [items, setItems] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [search, setSearch] = useState('');
 
   useEffect(() => {
     fetchJobDetails();
   }, [jobId]);
 
+  useEffect(() => {
+    // Debounce typing so each keystroke does not hit the search endpoint
+    const timer = setTimeout(() => fetchItems(), 300);
+    return () => clearTimeout(timer);
+  }, [jobId, search]);
+
+  const streaming = job && ['pending', 'attached', 'running'].includes(job.status) && !search.trim();
+
+  useEffect(() => {
+    if (!streaming) {
+      return undefined;
+    }
+    // Items arrive as the agents store them; EventSource resumes after the last item on reconnect
+    const source = new EventSource(`${API_BASE}/api/scraping/jobs/${jobId}/stream`);
+    setNextCursor(null);
+    source.addEventListener('items', (event) => {
+      const delta = JSON.parse(event.data);
+      setItems((previous) => {
+        const known = new Set(previous.map((item) => item.id));
+        return [...previous, ...delta.items.filter((item) => !known.has(item.id))];
+      });
+    });
+    source.addEventListener('reset', () => setItems([]));
+    source.addEventListener('status', (event) => {
+      const update = JSON.parse(event.data);
+      setJob((previous) => ({ ...previous, status: update.status, results_count: update.results_count }));
+    });
+    source.addEventListener('end', () => {
+      source.close();
+      fetchJobDetails();
+      fetchItems();
+    });
+    return () => source.close();
+  }, [jobId, streaming]);
+
   const fetchJobDetails = async () => {
     try {
-      const response = await axios.get(`${API_BASE}/api/scraping/jobs/${jobId}`);
+      const response = await axios.get(`${API_BASE}/api/scraping/jobs/${jobId}`, {
+        params: { include_items: false }
+      });
       setJob(response.data);
     } catch (err) {
       setError('Failed to fetch job details');
@@ -40,6 +82,23 @@ function JobDetails() {
     }
   };
 
+  const fetchItems = async (cursor = null) => {
+    try {
+      const params = { limit: ITEMS_PAGE_SIZE };
+      if (cursor) {
+        params.cursor = cursor;
+      }
+      if (search.trim()) {
+        params.q = search.trim();
+      }
+      const response = await axios.get(`${API_BASE}/api/scraping/jobs/${jobId}/items`, { params });
+      setItems((previous) => (cursor ? [...previous, ...response.data.items] : response.data.items));
+      setNextCursor(response.data.next_cursor);
+    } catch (err) {
+      setError('Failed to fetch scraped items');
+    }
+  };
+
   const getStatusColor = (status) => {
     switch (status) {
       case 'completed': return 'success';
@@ -186,11 +245,11 @@ function JobDetails() {
         </CardContent>
       </Card>
 
-      {job.scraped_items && job.scraped_items.length > 0 && (
+      {(job.results_count > 0 || items.length > 0) && (
         <Box>
           <Box sx={{ display: 'flex', justifyContent: 'space-between', alignItems: 'center', mb: 3 }}>
             <Typography variant="h5">
-              Scraped Results ({job.scraped_items.length})
+              Scraped Results ({Math.max(job.results_count, items.length)})
             </Typography>
             <Box sx={{ display: 'flex', gap: 1 }}>
               <Button 
@@ -211,9 +270,24 @@ function JobDetails() {
               </Button>
             </Box>
           </Box>
+
+          <TextField
+            fullWidth
+            size="small"
+            label="Search results"
+            value={search}
+            onChange={(e) => setSearch(e.target.value)}
+            sx={{ mb: 3 }}
+          />
+
+          {search.trim() && items.length === 0 && (
+            <Alert severity="info" sx={{ mb: 3 }}>
+              No results match "{search.trim()}".
+            </Alert>
+          )}
           
           <Grid container spacing={3}>
-            {job.scraped_items.map((item, index) => (
+            {items.map((item, index) => (
               <Grid item xs={12} md={6} lg={4} key={item.id}>
                 <Card sx={{ height: '100%' }}>
                   <CardContent>
@@ -303,10 +377,18 @@ function JobDetails() {
               </Grid>
             ))}
           </Grid>
+
+          {nextCursor && (
+            <Box sx={{ display: 'flex', justifyContent: 'center', mt: 3 }}>
+              <Button variant="outlined" onClick={() => fetchItems(nextCursor)}>
+                Load more
+              </Button>
+            </Box>
+          )}
         </Box>
       )}
 
-      {job.status === 'completed' && (!job.scraped_items || job.scraped_items.length === 0) && (
+      {job.status === 'completed' && !job.results_count && (
         <Alert severity="info">
           No results were found for this scraping job.
         </Alert>
@@ -35,10 +35,16 @@ function ScrapingForm() {
     if (currentJobId) {
       ws = new WebSocket('ws://localhost:8001/ws');
       
+      ws.onopen = () => {
+        // Only receive progress for the job this form started
+        ws.send(JSON.stringify({ action: 'subscribe', job_id: currentJobId }));
+      };
+      
       ws.onmessage = (event) => {
         const data = JSON.parse(event.data);
         
-        if (data.job_id === currentJobId) {
+        // Item batches for the job arrive on the same socket; only progress updates move the bar
+        if (data.type === 'progress' && data.job_id === currentJobId) {
           setProgress(data.progress);
           setProgressMessage(data.message);
           
@@ -80,6 +86,13 @@ function ScrapingForm() {
         }
       );
 
+      if (response.data.status === 'completed') {
+        // Served from the result cache, nothing to wait for
+        setLoading(false);
+        navigate(`/job/${response.data.id}`);
+        return;
+      }
+
       setCurrentJobId(response.data.id);
     } catch (err) {
       setLoading(false);